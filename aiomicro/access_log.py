@@ -0,0 +1,170 @@
+"""access log written by a background thread"""
+import atexit
+import json
+import logging
+import queue
+import random
+import threading
+import time
+
+
+log = logging.getLogger(__package__)
+
+BATCH = 256  # most records written per wake-up of the writer thread
+QUEUE_SIZE = 10000  # most records waiting; more are dropped (and counted)
+
+COUNTERS = dict(dropped=0)
+_QUEUE = queue.SimpleQueue()  # bounded by __call__ (see AccessLog Note 2)
+_STOP = object()
+_LOCK = threading.Lock()
+_THREAD = None
+
+
+def _write():
+    """ writer thread: log queued records in batches until _STOP
+
+        If the thread ends for any reason, _THREAD is cleared, so the next
+        record starts a new thread instead of waiting in the queue.
+    """
+    global _THREAD  # pylint: disable=global-statement
+    try:
+        while True:
+            try:
+                if not _write_batch():
+                    return
+            except Exception:  # pylint: disable=broad-except
+                log.exception("access log writer failed")
+    finally:
+        with _LOCK:
+            if _THREAD is threading.current_thread():
+                _THREAD = None
+
+
+def _write_batch():
+    """log a batch of queued records, returning False at _STOP"""
+    batch = [_QUEUE.get()]
+    try:
+        while len(batch) < BATCH:
+            batch.append(_QUEUE.get_nowait())
+    except queue.Empty:
+        pass
+    for item in batch:
+        if item is _STOP:
+            return False
+        if isinstance(item, threading.Event):
+            item.set()  # flush
+            continue
+        access_log, fields = item
+        try:
+            access_log.logger.info(access_log.format(*fields))
+        except Exception:  # pylint: disable=broad-except
+            log.exception("unable to write access log")
+    return True
+
+
+def _start():
+    global _THREAD  # pylint: disable=global-statement
+    with _LOCK:
+        if _THREAD is None or not _THREAD.is_alive():
+            _THREAD = threading.Thread(
+                target=_write, name="access-log", daemon=True)
+            _THREAD.start()
+
+
+def flush(timeout=None):
+    """wait until the records queued so far are written"""
+    if _THREAD is None or not _THREAD.is_alive():
+        return
+    done = threading.Event()
+    _QUEUE.put(done)
+    done.wait(timeout)
+
+
+@atexit.register
+def stop(timeout=1.0):
+    """write queued records and stop the writer thread"""
+    global _THREAD  # pylint: disable=global-statement
+    thread = _THREAD
+    if thread is not None and thread.is_alive():
+        _QUEUE.put(_STOP)
+        thread.join(timeout)
+    _THREAD = None
+
+
+class AccessLog:
+    """ one line per request, formatted and written off the event loop
+
+        Parameters:
+            fmt    - "text" or "json"
+            logger - logger written to (default is the package logger)
+
+        Notes:
+            1. A call only queues the record; a daemon thread formats and
+               writes queued records in batches (flushed at exit). If the
+               thread has died, the call starts a new one.
+            2. If QUEUE_SIZE records are waiting (the log can't keep up),
+               the record is dropped, and counted in COUNTERS["dropped"].
+            3. A method with silent=true is only logged for a status of 500
+               or more. A method's sample rate is the fraction of successful
+               requests logged; requests with a status of 400 or more are
+               always logged.
+    """
+
+    def __init__(self, fmt="text", logger=None):
+        if fmt not in ("text", "json"):
+            raise ValueError(f"invalid access log format: {fmt}")
+        self.fmt = fmt
+        self.logger = logger or log
+
+    @staticmethod
+    def wants(match, status):
+        """True if a request handled by match (a rest._Match) is logged"""
+        if match is None:
+            return True
+        if match.silent:
+            return status >= 500
+        return status >= 400 or match.sample >= 1.0 or (
+            random.random() < match.sample)
+
+    def __call__(self,  # pylint: disable=too-many-arguments
+                 cid, rid, method, resource, status, elapsed):
+        if _THREAD is None:
+            _start()  # first record, or the thread ended (see _write)
+        if _QUEUE.qsize() >= QUEUE_SIZE:
+            COUNTERS["dropped"] += 1
+            return
+        _QUEUE.put((self, (
+            cid, rid, method, resource, status, elapsed, time.time())))
+
+    def format(self,  # pylint: disable=too-many-arguments
+               cid, rid, method, resource, status, elapsed, when):
+        """format one record"""
+        if self.fmt == "json":
+            return json.dumps(dict(
+                time=round(when, 6), cid=cid, rid=rid, method=method,
+                resource=resource, status=status, t=round(elapsed, 6)))
+        return (
+            f"request cid={cid} rid={rid}, method={method}"
+            f" resource={resource} status={status} t={elapsed:f}")
+
+
+if __name__ == '__main__':
+    import os
+    import timeit
+
+    HANDLER = logging.StreamHandler(open(os.devnull, "w"))
+    log.addHandler(HANDLER)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    ACCESS = AccessLog()
+
+    def _inline():
+        log.info(ACCESS.format(1, 2, "GET", "/ping", 200, 0.001, 0.0))
+
+    def _queued():
+        ACCESS(1, 2, "GET", "/ping", 200, 0.001)
+
+    for label, test in (("inline", _inline), ("queued", _queued)):
+        elapsed = min(timeit.repeat(test, number=10000, repeat=3))
+        flush()
+        print(f"{label:>7} {elapsed / 10000 * 1e6:.2f}us per request")
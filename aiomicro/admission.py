@@ -0,0 +1,93 @@
+"""admission control (load shedding) for concurrent requests"""
+import asyncio
+from collections import deque
+
+from aiomicro.response import Prepared, format_head
+
+
+DECREASE = 0.9  # multiplier for the adaptive limit after a slow request
+
+
+class Limiter:
+    """ limit the number of requests in progress
+
+        Parameters:
+            max_inflight - most requests in progress
+            queue        - most requests waiting for one in progress to
+                           finish; others are shed
+            retry_after  - seconds, sent in the Retry-After header of a
+                           shed request's 503
+            adaptive     - target latency in seconds; if not None, the limit
+                           adapts (AIMD) between 1 and max_inflight: a
+                           request slower than the target multiplies the
+                           limit by DECREASE, a faster one adds 1/limit
+
+        Notes:
+            1. A queued request is admitted, in arrival order, when the
+               number in progress drops below the limit.
+            2. rejection is the prepared 503 response for a shed request.
+    """
+
+    def __init__(self, max_inflight, queue=0, retry_after=1, adaptive=None):
+        self.max_inflight = int(max_inflight)
+        self.limit = float(self.max_inflight)
+        self.queue = int(queue)
+        self.target = None if adaptive is None else float(adaptive)
+        self.inflight = 0
+        self._waiters = deque()
+        self.counters = dict(admitted=0, queued=0, shed=0, decreases=0)
+        self.rejection = Prepared(format_head(503, headers={
+            "Retry-After": int(retry_after), "Content-Length": 0}))
+
+    @property
+    def metrics(self):
+        """current limit, requests in progress and waiting, and counters"""
+        return dict(
+            limit=int(self.limit), inflight=self.inflight,
+            waiting=len(self._waiters), **self.counters)
+
+    async def acquire(self):
+        """True if a request is admitted, or False if it is shed"""
+        if self.inflight < int(self.limit) and not self._waiters:
+            self.inflight += 1
+            self.counters["admitted"] += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            self.counters["shed"] += 1
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.counters["queued"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                if future in self._waiters:  # else skipped by release
+                    self._waiters.remove(future)
+            else:  # admitted, but cancelled before running
+                self.release()
+            raise
+        self.counters["admitted"] += 1
+        return True
+
+    def release(self, elapsed=None):
+        """ finish an admitted request
+
+            elapsed is the request's duration in seconds, used by the
+            adaptive limit.
+        """
+        if self.target is not None and elapsed is not None:
+            if elapsed > self.target:
+                self.limit = max(1.0, self.limit * DECREASE)
+                self.counters["decreases"] += 1
+            else:
+                self.limit = min(
+                    float(self.max_inflight), self.limit + 1 / self.limit)
+        self.inflight -= 1
+        while self._waiters and self.inflight < int(self.limit):
+            future = self._waiters.popleft()
+            if future.cancelled():  # its task hasn't removed it yet
+                continue
+            self.inflight += 1
+            future.set_result(None)
@@ -0,0 +1,47 @@
+"""benchmarks for the request path
+
+    python -m aiomicro.bench stages    # micro-benchmarks of each stage
+    python -m aiomicro.bench e2e       # keep-alive load against a server
+    python -m aiomicro.bench db        # database round trips
+    python -m aiomicro.bench compare old.json new.json
+
+Results are json (see summarize), so runs can be compared across commits.
+"""
+import math
+
+
+def percentile(values, pct):
+    """nearest-rank percentile of sorted values"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(name, times, count=None, elapsed=None, **extra):
+    """ summary of a benchmark
+
+        Parameters:
+            name    - benchmark name
+            times   - seconds per operation (one per sample)
+            count   - operations done (default is len(times))
+            elapsed - seconds taken for count operations (default is the
+                      sum of times)
+            extra   - added to the summary
+
+        Return:
+            dict of name, n, p50_us, p99_us, mean_us and rps (operations
+            per second), plus extra
+    """
+    times = sorted(times)
+    count = len(times) if count is None else count
+    elapsed = sum(times) if elapsed is None else elapsed
+    return dict(
+        name=name,
+        n=count,
+        p50_us=round(percentile(times, 50) * 1e6, 3),
+        p99_us=round(percentile(times, 99) * 1e6, 3),
+        mean_us=round(elapsed / count * 1e6, 3) if count else 0.0,
+        rps=round(count / elapsed, 1) if elapsed else 0.0,
+        **extra,
+    )
@@ -0,0 +1,118 @@
+"""command line for aiomicro.bench"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+from aiomicro.bench import db, load, stages
+
+
+def _meta():
+    return dict(
+        time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        python=platform.python_version(),
+        platform=platform.platform(),
+    )
+
+
+def _compare(old, new):
+    """print the change in p50, p99 and rps of benchmarks in both runs"""
+    with open(old, encoding="utf-8") as data:
+        before = {item["name"]: item for item in json.load(data)["results"]}
+    with open(new, encoding="utf-8") as data:
+        after = json.load(data)["results"]
+    print(f"{'name':<28} {'p50_us':>18} {'p99_us':>18} {'rps':>20}")
+    for item in after:
+        base = before.get(item["name"])
+        if base is None:
+            continue
+        cells = []
+        for key in ("p50_us", "p99_us", "rps"):
+            change = (item[key] / base[key] - 1) * 100 if base[key] else 0.0
+            cells.append(f"{item[key]:>11.1f} {change:+5.1f}%")
+        print(f"{item['name']:<28} " + " ".join(cells))
+
+
+def main(argv=None):
+    """run benchmarks"""
+    parser = argparse.ArgumentParser(
+        prog="python -m aiomicro.bench",
+        description="benchmark the aiomicro request path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("stages", help="micro-benchmark each stage")
+    cmd.add_argument(
+        "names", nargs="*",
+        help=f"stages to run (default all): {', '.join(stages.STAGES)}")
+    cmd.add_argument("--number", type=int, default=100,
+                     help="calls per sample")
+    cmd.add_argument("--repeat", type=int, default=200, help="samples")
+    cmd.add_argument("--output", help="write json here (default stdout)")
+
+    cmd = commands.add_parser(
+        "e2e", help="keep-alive load against a server")
+    cmd.add_argument("--micro", help="micro file (default built-in service)")
+    cmd.add_argument("--path", action="append", dest="paths",
+                     help="resource to GET (repeatable)")
+    cmd.add_argument("--host", default="127.0.0.1")
+    cmd.add_argument("--port", type=int,
+                     help="use a running server instead of starting one")
+    cmd.add_argument("--connections", type=int, default=16)
+    cmd.add_argument("--duration", type=float, default=5.0)
+    cmd.add_argument("--warmup", type=float, default=0.5)
+    cmd.add_argument(
+        "--mysql-latency", type=float,
+        help="connect the server's databases to a fake mysql server which"
+             " delays each query this many seconds")
+    cmd.add_argument("--output", help="write json here (default stdout)")
+
+    cmd = commands.add_parser(
+        "db", help="database round trips against a fake mysql server")
+    cmd.add_argument(
+        "names", nargs="*",
+        help=f"cases to run (default all): {', '.join(db.CASES)}")
+    cmd.add_argument("--number", type=int, default=10,
+                     help="round trips per sample")
+    cmd.add_argument("--repeat", type=int, default=100, help="samples")
+    cmd.add_argument("--latency", type=float, default=0.0,
+                     help="seconds the server delays each query")
+    cmd.add_argument("--output", help="write json here (default stdout)")
+
+    cmd = commands.add_parser("compare", help="compare two json results")
+    cmd.add_argument("old")
+    cmd.add_argument("new")
+
+    args = parser.parse_args(argv)
+    if args.command == "compare":
+        _compare(args.old, args.new)
+        return
+
+    if args.command == "stages":
+        for name in args.names:
+            if name not in stages.STAGES:
+                parser.error(f"invalid stage: {name}")
+        results = stages.run(args.names, args.number, args.repeat)
+    elif args.command == "db":
+        for name in args.names:
+            if name not in db.CASES:
+                parser.error(f"invalid case: {name}")
+        results = db.run(
+            args.names, args.number, args.repeat, args.latency)
+    else:
+        mysql = None
+        if args.mysql_latency is not None:
+            mysql = dict(latency=args.mysql_latency)
+        results = load.run(
+            args.micro, args.paths, args.host, args.port, args.connections,
+            args.duration, args.warmup, mysql)
+    report = json.dumps(dict(meta=_meta(), results=results), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(report + "\n")
+    else:
+        sys.stdout.write(report + "\n")
+
+
+if __name__ == '__main__':
+    main()
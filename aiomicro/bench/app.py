@@ -0,0 +1,77 @@
+"""service benchmarked by default (see MICRO, and MICRO_DB)"""
+import marshmallow as ma
+
+from aiomicro.bench.mysql import Rows
+
+
+MICRO = r"""
+SERVER bench {port} access_log=none
+ROUTE /ping$
+GET aiomicro.bench.app.ping
+ROUTE /items/(\d+)$
+ARG marshmallow path=aiomicro.bench.app.ItemArg
+GET aiomicro.bench.app.item
+CONTENT marshmallow path=aiomicro.bench.app.ItemQuery
+RESPONSE marshmallow path=aiomicro.bench.app.Item
+"""
+
+PATHS = ("/ping", "/items/42?verbose=true")
+
+# with a database (a FakeMySQL), which /items/[id]/db reads
+MICRO_DB = r"""
+DATABASE bench mysql pool=true pool_size=16
+""" + MICRO + r"""
+ROUTE /items/(\d+)/db$
+ARG marshmallow path=aiomicro.bench.app.ItemArg
+GET aiomicro.bench.app.item_db cursor=bench
+"""
+
+PATHS_DB = PATHS + ("/items/42/db",)
+
+QUERY = "SELECT id, name, price FROM item WHERE id = %(id)s"
+
+
+class ItemArg(ma.Schema):
+    """item id from the resource"""
+    id = ma.fields.Integer(required=True)
+
+
+class ItemQuery(ma.Schema):
+    """query string"""
+    verbose = ma.fields.Boolean(required=True)
+
+
+class Item(ma.Schema):
+    """response"""
+    id = ma.fields.Integer()
+    name = ma.fields.String()
+    price = ma.fields.Float()
+    tags = ma.fields.List(ma.fields.String())
+    description = ma.fields.String()
+
+
+async def ping(request):  # pylint: disable=unused-argument
+    """smallest handler"""
+    return dict(content="pong", content_type="text/plain")
+
+
+async def item(request, item_id, verbose):  # pylint: disable=unused-argument
+    """handler with validated arg and content, and a marshmallow response"""
+    result = dict(
+        id=item_id, name=f"item {item_id}", price=item_id * 1.25,
+        tags=["bench", "item", str(item_id)])
+    if verbose:
+        result["description"] = "an item used to benchmark aiomicro"
+    return result
+
+
+async def item_db(request, item_id):
+    """handler with a database round trip, in a transaction"""
+    await request.cursor.execute(QUERY, id=item_id)
+    return dict(content="ok", content_type="text/plain")
+
+
+def can(server):
+    """can the results of the queries in MICRO_DB on a FakeMySQL"""
+    server.add(r"SELECT id, name, price FROM item", Rows(
+        ["id", "name", "price"], [[42, "item 42", 52.5]]))
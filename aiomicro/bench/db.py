@@ -0,0 +1,94 @@
+"""database round trips through the mysql connector and pool"""
+import asyncio
+import time
+
+from aiomicro.bench import summarize
+from aiomicro.bench.mysql import FakeMySQL, Rows
+from aiomicro.database import LazyCursor, _DBS
+
+
+QUERY = "SELECT id, name FROM item WHERE id = %(id)s AND name = %(name)s"
+
+
+async def _execute(dbs):
+    cursor = await dbs["bench"]
+    try:
+        await cursor.execute("SELECT 1")
+    finally:
+        await cursor.close()
+
+
+async def _bind(dbs):
+    cursor = await dbs["bench"]
+    try:
+        await cursor.execute(QUERY, id=42, name="it's")
+    finally:
+        await cursor.close()
+
+
+async def _transaction(dbs):
+    cursor = LazyCursor("bench", dbs)
+    await cursor.execute("SELECT 1")
+    await cursor.commit()
+
+
+async def _readonly(dbs):
+    cursor = LazyCursor("bench", dbs, readonly=True)
+    await cursor.execute("SELECT 1")
+    await cursor.commit()
+
+
+CASES = dict(execute=_execute, bind=_bind, transaction=_transaction,
+             readonly=_readonly)
+
+
+async def _run(cases, number, repeat, latency):
+    async with FakeMySQL(latency=latency) as server:
+        server.add(r"SELECT id, name FROM item", Rows(
+            ["id", "name"], [[42, "it's"]]))
+        dbs = _DBS()
+        dbs.add("bench", "mysql", host=server.host, port=server.port)
+        await dbs.dbs["bench"].init_pool(pool_size=1)
+        try:
+            return await _time(dbs, cases, number, repeat, latency)
+        finally:
+            for source in dbs.dbs["bench"].sources:
+                if source.pool:
+                    await source.pool.close()
+
+
+async def _time(dbs, cases, number, repeat, latency):
+    results = []
+    for name in cases:
+        case = CASES[name]
+        await case(dbs)  # connect, and cache the statement
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                await case(dbs)
+            times.append((time.perf_counter() - start) / number)
+        results.append(summarize(
+            f"db {name}", times, count=number * repeat,
+            elapsed=sum(times) * number, latency=latency))
+    return results
+
+
+def run(names=None, number=10, repeat=100, latency=0.0):
+    """ time round trips to a FakeMySQL through setup_mysql and Pool
+
+        Parameters:
+            names   - cases to run (default all): execute (a query),
+                      bind (a query with parameters, using the statement
+                      cache) and transaction (checkout, begin, a query,
+                      commit and release by a LazyCursor) and readonly
+                      (the same, by a readonly LazyCursor, which skips
+                      begin and commit)
+            number  - round trips per sample
+            repeat  - samples
+            latency - seconds FakeMySQL delays each query
+
+        Return:
+            list of summaries
+    """
+    return asyncio.run(_run(names or list(CASES), number, repeat, latency))
@@ -0,0 +1,193 @@
+"""keep-alive http load generator and end-to-end benchmark"""
+import asyncio
+from collections import Counter
+from io import StringIO
+import multiprocessing
+import os
+import socket
+import time
+
+from aiomicro.bench import summarize
+from aiomicro.bench import app
+from aiomicro.bench.mysql import FakeMySQL
+from aiomicro.micro import parser
+
+
+PORT = 18080  # port of the built-in service
+START_TIMEOUT = 10.0  # seconds to wait for a server to accept connections
+
+
+async def _response(reader):
+    """ read a response
+
+        Return:
+            (status, True if the server closes the connection)
+    """
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+    return status, headers.get("connection", "").lower() == "close"
+
+
+async def _client(  # pylint: disable=too-many-arguments
+        host, port, requests, start, stop, latencies, statuses):
+    """ send requests, in turn, on one keep-alive connection until stop
+
+        Responses which finish after start are recorded.
+    """
+    loop = asyncio.get_running_loop()
+    reader, writer = await asyncio.open_connection(host, port)
+    index = 0
+    try:
+        while loop.time() < stop:
+            path, data = requests[index % len(requests)]
+            index += 1
+            sent = time.perf_counter()
+            writer.write(data)
+            status, close = await _response(reader)
+            if loop.time() >= start:
+                latencies[path].append(time.perf_counter() - sent)
+                statuses[status] += 1
+            if close:
+                writer.close()
+                reader, writer = await asyncio.open_connection(host, port)
+    finally:
+        writer.close()
+
+
+async def load(  # pylint: disable=too-many-arguments
+        host, port, paths, connections=16, duration=5.0, warmup=0.5):
+    """ drive a server with concurrent keep-alive connections
+
+        Parameters:
+            host, port  - server address
+            paths       - resources requested (GET), in turn
+            connections - concurrent connections, each with one request
+                          in progress at a time
+            duration    - seconds of load measured
+            warmup      - seconds of load before measuring
+
+        Return:
+            list of summaries: one for each path, then the total
+    """
+    requests = [(path, (
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"User-Agent: aiomicro-bench\r\n\r\n").encode("latin-1"))
+        for path in paths]
+    latencies = {path: [] for path in paths}
+    statuses = Counter()
+    now = asyncio.get_running_loop().time()
+    start, stop = now + warmup, now + warmup + duration
+    await asyncio.gather(*[
+        _client(host, port, requests, start, stop, latencies, statuses)
+        for _ in range(connections)])
+
+    results = [
+        summarize(f"e2e GET {path}", times, elapsed=duration,
+                  connections=connections)
+        for path, times in latencies.items()]
+    results.append(summarize(
+        "e2e total", [value for times in latencies.values()
+                      for value in times],
+        elapsed=duration, connections=connections,
+        statuses={str(key): value for key, value in sorted(
+            statuses.items())}))
+    return results
+
+
+def _serve(defn, is_text, mysql):
+    """server process entry point"""
+    # pylint: disable=import-outside-toplevel
+    from aiomicro.main import serve
+
+    async def run():
+        if mysql is not None:  # databases connect to a FakeMySQL
+            fake = FakeMySQL(**mysql)
+            if is_text:
+                app.can(fake)
+            os.environ["DB_HOST"] = fake.host
+            os.environ["DB_PORT"] = str(await fake.start())
+        await serve(parser.load(StringIO(defn) if is_text else defn))
+    asyncio.run(run())
+
+
+def wait_for(host, port, timeout=START_TIMEOUT):
+    """wait until host:port accepts connections"""
+    limit = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            if time.monotonic() > limit:
+                raise
+            time.sleep(0.05)
+
+
+def start_server(defn=None, host="127.0.0.1", mysql=None):
+    """ start the first server of a micro definition in a child process
+
+        Parameters:
+            defn  - path of a micro file (default is the built-in service,
+                    see aiomicro.bench.app; with mysql, its MICRO_DB)
+            host  - address used to wait for the server to start
+            mysql - if not None, kwargs for a FakeMySQL started in the
+                    child process, which its databases connect to
+
+        Return:
+            (process, port)
+    """
+    is_text = defn is None
+    if is_text:
+        micro = app.MICRO if mysql is None else app.MICRO_DB
+        defn, port = micro.format(port=PORT), PORT
+    else:
+        port = parser.load(defn).servers[0].port
+    process = multiprocessing.get_context("spawn").Process(
+        target=_serve, args=(defn, is_text, mysql),
+        name="aiomicro-bench-server",
+        daemon=True)
+    process.start()
+    try:
+        wait_for(host, port)
+    except OSError:
+        process.terminate()
+        raise
+    return process, port
+
+
+def run(defn=None, paths=None,  # pylint: disable=too-many-arguments
+        host="127.0.0.1", port=None, connections=16, duration=5.0,
+        warmup=0.5, mysql=None):
+    """ end-to-end benchmark
+
+        If port is None, the first server in defn (see start_server) is
+        started for the run; otherwise, the server at host:port is used.
+        paths defaults to the built-in service's (with mysql, including
+        its database route).
+    """
+    if paths is None:
+        paths = app.PATHS if mysql is None or defn else app.PATHS_DB
+    process = None
+    if port is None:
+        process, port = start_server(defn, host, mysql)
+    try:
+        return asyncio.run(load(
+            host, port, paths, connections, duration, warmup))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.join()
@@ -0,0 +1,452 @@
+"""fake mysql server, for database benchmarks and tests
+
+    python -m aiomicro.bench.mysql --port 3307 --latency 0.002
+
+A FakeMySQL speaks enough of the mysql client/server protocol for a
+client to connect (mysql_native_password), run queries, and begin, commit
+and roll back transactions. Query results are canned (see FakeMySQL.add);
+every query can be delayed, to stand in for a real server's latency.
+"""
+import asyncio
+from collections import Counter
+import hashlib
+import logging
+import random
+import re
+import struct
+
+
+log = logging.getLogger(__name__)
+
+# capability flags
+CLIENT_LONG_PASSWORD = 0x1
+CLIENT_FOUND_ROWS = 0x2
+CLIENT_LONG_FLAG = 0x4
+CLIENT_CONNECT_WITH_DB = 0x8
+CLIENT_PROTOCOL_41 = 0x200
+CLIENT_TRANSACTIONS = 0x2000
+CLIENT_SECURE_CONNECTION = 0x8000
+CLIENT_MULTI_RESULTS = 0x20000
+CLIENT_PLUGIN_AUTH = 0x80000
+CLIENT_PLUGIN_AUTH_LENENC_CLIENT_DATA = 0x200000
+CAPABILITIES = (
+    CLIENT_LONG_PASSWORD | CLIENT_FOUND_ROWS | CLIENT_LONG_FLAG |
+    CLIENT_CONNECT_WITH_DB | CLIENT_PROTOCOL_41 | CLIENT_TRANSACTIONS |
+    CLIENT_SECURE_CONNECTION | CLIENT_MULTI_RESULTS | CLIENT_PLUGIN_AUTH |
+    CLIENT_PLUGIN_AUTH_LENENC_CLIENT_DATA)
+
+# status flags
+SERVER_STATUS_IN_TRANS = 0x1
+SERVER_STATUS_AUTOCOMMIT = 0x2
+
+# commands
+COM_QUIT = 0x01
+COM_INIT_DB = 0x02
+COM_QUERY = 0x03
+COM_PING = 0x0e
+
+# column types
+TYPE_DOUBLE = 0x05
+TYPE_LONGLONG = 0x08
+TYPE_VAR_STRING = 0xfd
+
+CHARSET = 33  # utf8_general_ci
+VERSION = "8.0.0-aiomicro-fake"
+PLUGIN = b"mysql_native_password"
+
+
+class Rows:  # pylint: disable=too-few-public-methods
+    """canned result set: column names and a list of rows"""
+
+    def __init__(self, columns, rows=()):
+        self.columns = list(columns)
+        self.rows = [list(row) for row in rows]
+
+
+class Affected:  # pylint: disable=too-few-public-methods
+    """canned result of a statement without a result set"""
+
+    def __init__(self, count=0, insert_id=0):
+        self.count = count
+        self.insert_id = insert_id
+
+
+class Error(Exception):
+    """canned error"""
+
+    def __init__(self, code, message, state="HY000"):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.state = state
+
+
+def scramble(password, salt):
+    """mysql_native_password auth response for password and salt"""
+    if not password:
+        return b""
+    stage1 = hashlib.sha1(password.encode("utf-8")).digest()
+    stage2 = hashlib.sha1(stage1).digest()
+    mask = hashlib.sha1(salt + stage2).digest()
+    return bytes(a ^ b for a, b in zip(stage1, mask))
+
+
+def lenenc_int(value):
+    """length-encoded integer"""
+    if value < 251:
+        return bytes((value,))
+    if value < 1 << 16:
+        return b"\xfc" + struct.pack("<H", value)
+    if value < 1 << 24:
+        return b"\xfd" + struct.pack("<I", value)[:3]
+    return b"\xfe" + struct.pack("<Q", value)
+
+
+def lenenc_str(value):
+    """length-encoded string"""
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return lenenc_int(len(value)) + value
+
+
+def read_lenenc_int(data, pos):
+    """ read a length-encoded integer
+
+        Return:
+            (value, position after the integer)
+    """
+    first = data[pos]
+    if first < 251:
+        return first, pos + 1
+    size = {0xfc: 2, 0xfd: 3, 0xfe: 8}[first]
+    value = int.from_bytes(data[pos + 1:pos + 1 + size], "little")
+    return value, pos + 1 + size
+
+
+def _nul(data, pos):
+    """read a nul-terminated string, returning (bytes, position after)"""
+    end = data.index(b"\0", pos)
+    return data[pos:end], end + 1
+
+
+def _text(value):
+    if value is None:
+        return b"\xfb"  # NULL
+    if isinstance(value, bool):
+        value = int(value)
+    return lenenc_str(value if isinstance(value, bytes) else str(value))
+
+
+def _column_type(rows, index):
+    for row in rows:
+        value = row[index]
+        if value is None:
+            continue
+        if isinstance(value, (bool, int)):
+            return TYPE_LONGLONG
+        if isinstance(value, float):
+            return TYPE_DOUBLE
+        return TYPE_VAR_STRING
+    return TYPE_VAR_STRING
+
+
+class _Session:
+    """one client connection"""
+
+    def __init__(self, server, reader, writer, connection_id):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.connection_id = connection_id
+        self.sequence = 0
+        self.autocommit = True
+        self.in_transaction = False
+        self.user = None
+        self.database = None
+
+    @property
+    def status(self):
+        """server status flags"""
+        status = SERVER_STATUS_AUTOCOMMIT if self.autocommit else 0
+        if self.in_transaction:
+            status |= SERVER_STATUS_IN_TRANS
+        return status
+
+    async def read(self):
+        """read a packet's payload (None at eof)"""
+        try:
+            head = await self.reader.readexactly(4)
+            payload = await self.reader.readexactly(
+                int.from_bytes(head[:3], "little"))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            return None
+        self.sequence = head[3] + 1
+        return payload
+
+    def write(self, payload):
+        """write a packet"""
+        self.writer.write(
+            len(payload).to_bytes(3, "little") +
+            bytes((self.sequence & 0xff,)) + payload)
+        self.sequence += 1
+
+    def ok(self, affected=0, insert_id=0):
+        """write an OK packet"""
+        self.write(
+            b"\x00" + lenenc_int(affected) + lenenc_int(insert_id) +
+            struct.pack("<HH", self.status, 0))
+
+    def eof(self):
+        """write an EOF packet"""
+        self.write(b"\xfe" + struct.pack("<HH", 0, self.status))
+
+    def error(self, code, message, state="HY000"):
+        """write an ERR packet"""
+        self.write(
+            b"\xff" + struct.pack("<H", code) + b"#" +
+            state.encode("ascii") + message.encode("utf-8"))
+
+    def rows(self, result):
+        """write a text result set"""
+        self.write(lenenc_int(len(result.columns)))
+        for index, name in enumerate(result.columns):
+            self.write(
+                lenenc_str("def") + lenenc_str(self.database or "") +
+                lenenc_str("") + lenenc_str("") + lenenc_str(name) +
+                lenenc_str(name) + b"\x0c" +
+                struct.pack(
+                    "<HIBHB", CHARSET, 1024,
+                    _column_type(result.rows, index), 0, 0) +
+                b"\0\0")
+        self.eof()
+        for row in result.rows:
+            self.write(b"".join(_text(value) for value in row))
+        self.eof()
+
+    async def handshake(self):
+        """greet the client and check its credentials; True if accepted"""
+        salt = bytes(random.randrange(1, 128) for _ in range(20))
+        self.sequence = 0
+        self.write(
+            b"\x0a" + VERSION.encode("ascii") + b"\0" +
+            struct.pack("<I", self.connection_id) + salt[:8] + b"\0" +
+            struct.pack("<HBHH", CAPABILITIES & 0xffff, CHARSET,
+                        self.status, CAPABILITIES >> 16) +
+            bytes((len(salt) + 1,)) + b"\0" * 10 + salt[8:] + b"\0" +
+            PLUGIN + b"\0")
+        await self.writer.drain()
+
+        payload = await self.read()
+        if payload is None:
+            return False
+        flags = struct.unpack("<I", payload[:4])[0]
+        pos = 32  # flags, max packet size, charset, 23 reserved bytes
+        user, pos = _nul(payload, pos)
+        if flags & (CLIENT_PLUGIN_AUTH_LENENC_CLIENT_DATA |
+                    CLIENT_SECURE_CONNECTION):
+            if flags & CLIENT_PLUGIN_AUTH_LENENC_CLIENT_DATA:
+                length, pos = read_lenenc_int(payload, pos)
+            else:
+                length, pos = payload[pos], pos + 1
+            auth, pos = payload[pos:pos + length], pos + length
+        else:
+            auth, pos = _nul(payload, pos)
+        if flags & CLIENT_CONNECT_WITH_DB and pos < len(payload):
+            database, pos = _nul(payload, pos)
+            self.database = database.decode("utf-8") or None
+
+        self.user = user.decode("utf-8")
+        if not self.server.authenticate(self.user, auth, salt):
+            self.error(
+                1045, f"Access denied for user '{self.user}'", "28000")
+            await self.writer.drain()
+            return False
+        self.ok()
+        await self.writer.drain()
+        return True
+
+    async def run(self):
+        """handle commands until the client quits"""
+        if not await self.handshake():
+            return
+        while True:
+            payload = await self.read()
+            if payload is None or payload[:1] == bytes((COM_QUIT,)):
+                return
+            command, body = payload[0], payload[1:]
+            if command == COM_QUERY:
+                await self.query(body.decode("utf-8"))
+            elif command == COM_INIT_DB:
+                self.database = body.decode("utf-8")
+                self.ok()
+            elif command == COM_PING:
+                self.ok()
+            else:
+                self.error(1047, "Unknown command", "08S01")
+            await self.writer.drain()
+
+    async def query(self, query):
+        """run a COM_QUERY"""
+        server = self.server
+        server.counters["queries"] += 1
+        delay = server.delay()
+        if delay:
+            await asyncio.sleep(delay)
+
+        statement = " ".join(query.split()).rstrip(";")
+        verb = statement.split(" ", 1)[0].upper()
+        if verb in ("BEGIN", "START"):
+            self.in_transaction = True
+            server.counters["begin"] += 1
+            return self.ok()
+        if verb in ("COMMIT", "ROLLBACK"):
+            self.in_transaction = False
+            server.counters[verb.lower()] += 1
+            return self.ok()
+
+        try:
+            result = server.result(statement)
+        except Error as exc:
+            return self.error(exc.code, exc.message, exc.state)
+        if result is None:
+            match = re.match(r"SET\s+(?:SESSION\s+)?autocommit\s*=\s*(\w+)",
+                             statement, re.IGNORECASE)
+            if match:
+                self.autocommit = match.group(1).lower() in ("1", "on")
+            if verb in ("SELECT", "SHOW"):
+                return self.error(1105, f"no canned result for: {statement}")
+            result = Affected()
+        if isinstance(result, Rows):
+            return self.rows(result)
+        return self.ok(result.count, result.insert_id)
+
+
+class FakeMySQL:
+    """ in-process fake mysql server
+
+        Parameters:
+            host, port - listening address (port 0 picks a free port)
+            user       - if not None, the only user accepted
+            password   - if not None, the password checked
+                         (mysql_native_password)
+            latency    - seconds each query is delayed
+            jitter     - up to this many more seconds are added at random
+
+        Notes:
+            1. Query results are canned with add; a query which matches no
+               pattern gets an error if it is a SELECT or SHOW, else an OK.
+               SELECT [integer] is answered by default.
+            2. BEGIN, START TRANSACTION, COMMIT and ROLLBACK are accepted,
+               and set the in-transaction status flag.
+            3. counters has connections, open (connections now open),
+               queries, begin, commit and rollback counts.
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 host="127.0.0.1", port=0, user=None, password=None,
+                 latency=0.0, jitter=0.0):
+        self.host = host
+        self.port = int(port)
+        self.user = user
+        self.password = password
+        self.latency = float(latency)
+        self.jitter = float(jitter)
+        self.counters = Counter()
+        self._rules = []
+        self._server = None
+        self.add(r"SELECT (\d+)$", lambda match: Rows(
+            [match.group(1)], [[int(match.group(1))]]))
+
+    def add(self, pattern, result):
+        """ can a result for queries matching pattern
+
+            pattern is a regex, matched (case insensitive) against the
+            query with whitespace collapsed. result is a Rows, Affected or
+            Error, or a callable which is given the re.Match and returns
+            one (or raises an Error). Rules added later are tried first.
+        """
+        self._rules.insert(0, (re.compile(pattern, re.IGNORECASE), result))
+
+    def result(self, query):
+        """the canned result for query (None if no pattern matches)"""
+        for pattern, result in self._rules:
+            match = pattern.match(query)
+            if match:
+                if isinstance(result, Error):
+                    raise result
+                return result(match) if callable(result) else result
+        return None
+
+    def delay(self):
+        """seconds to delay a query"""
+        if self.jitter:
+            return self.latency + random.uniform(0, self.jitter)
+        return self.latency
+
+    def authenticate(self, user, auth, salt):
+        """True if user's auth response is accepted"""
+        if self.user is not None and user != self.user:
+            return False
+        if self.password is None:
+            return True
+        return auth == scramble(self.password, salt)
+
+    async def start(self):
+        """start listening, returning the port"""
+        self._server = await asyncio.start_server(
+            self._connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        """stop listening and wait for the listener to close"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _connection(self, reader, writer):
+        self.counters["connections"] += 1
+        self.counters["open"] += 1
+        session = _Session(self, reader, writer, self.counters["connections"])
+        try:
+            await session.run()
+        except Exception:  # pylint: disable=broad-except
+            log.exception("fake mysql connection failed")
+        finally:
+            self.counters["open"] -= 1
+            writer.close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    PARSER = argparse.ArgumentParser(
+        prog="python -m aiomicro.bench.mysql",
+        description="run a fake mysql server")
+    PARSER.add_argument("--host", default="127.0.0.1")
+    PARSER.add_argument("--port", type=int, default=3306)
+    PARSER.add_argument("--user")
+    PARSER.add_argument("--password")
+    PARSER.add_argument("--latency", type=float, default=0.0,
+                        help="seconds each query is delayed")
+    PARSER.add_argument("--jitter", type=float, default=0.0)
+    ARGS = PARSER.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    async def _main():
+        server = FakeMySQL(
+            ARGS.host, ARGS.port, ARGS.user, ARGS.password, ARGS.latency,
+            ARGS.jitter)
+        await server.start()
+        log.info("fake mysql listening on %s:%s", ARGS.host, server.port)
+        await asyncio.Event().wait()
+
+    asyncio.run(_main())
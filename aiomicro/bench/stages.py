@@ -0,0 +1,197 @@
+"""micro-benchmarks of each stage of the request path"""
+import asyncio
+from io import StringIO
+import inspect
+import time
+
+from aiohttp import HTTPReader, format_server, parse
+
+from aiomicro.bench import summarize
+from aiomicro.bench.app import MICRO
+from aiomicro.connection import HTTPConnection
+from aiomicro.micro import parser
+from aiomicro.request import Head
+from aiomicro.response import prepare
+from aiomicro.rest import match
+from aiomicro.util import to_args
+
+
+REQUEST = (
+    b"GET /items/42?verbose=true HTTP/1.1\r\n"
+    b"Host: localhost\r\n"
+    b"User-Agent: aiomicro-bench\r\n"
+    b"Accept: application/json\r\n"
+    b"\r\n")
+DIRECTIVE = "GET aiomicro.bench.app.item cursor=db timeout=0.5 silent=true"
+
+
+class Packet:  # pylint: disable=too-few-public-methods
+    """a parsed request"""
+    http_method = "GET"
+    http_resource = "/items/42"
+    http_query_string = "verbose=true"
+    http_headers = {"host": "localhost"}
+    is_keep_alive = True
+
+    def __init__(self):
+        self.content = {"verbose": "true"}
+
+
+class NullWriter:
+    """StreamWriter which discards its data"""
+
+    transport = None
+
+    def write(self, data):
+        """discard data"""
+
+    def writelines(self, data):
+        """discard data"""
+
+
+def _server(metrics=False):
+    micro = MICRO.format(port=0)
+    if metrics:
+        micro = micro.replace("access_log=none", "access_log=none metrics=/m")
+    return parser.load(StringIO(micro)).servers[0]
+
+
+def _method(server, resource):
+    route, _ = server.dispatch.lookup(resource)
+    return route.methods["GET"]
+
+
+def stage_to_args():
+    """tokenize a micro directive"""
+    return lambda: to_args(DIRECTIVE)
+
+
+def stage_head():
+    """parse a request head (aiomicro.request.Head)"""
+    return lambda: Head(REQUEST)
+
+
+def stage_parse():
+    """parse a request from a StreamReader (aiohttp.parse)"""
+    async def call():
+        reader = asyncio.StreamReader()
+        reader.feed_data(REQUEST)
+        reader.feed_eof()
+        return await parse(HTTPReader(reader))
+    return call
+
+
+def stage_route():
+    """find a route (Dispatcher.lookup)"""
+    dispatch = _server().dispatch
+    return lambda: dispatch.lookup("/items/42")
+
+
+def stage_content():
+    """validate content (marshmallow CONTENT)"""
+    content = _method(_server(), "/items/42").content
+    value = {"verbose": "true"}
+    return lambda: content(value)
+
+
+def stage_match():
+    """route, and validate the arg and content (rest.match)"""
+    dispatch = _server().dispatch
+    packet = Packet()
+    return lambda: match(dispatch, packet)
+
+
+def stage_response():
+    """project and encode a handler result (marshmallow RESPONSE)"""
+    response = _method(_server(), "/items/42").response
+    result = dict(
+        id=42, name="item 42", price=52.5, tags=["bench", "item", "42"],
+        description="an item used to benchmark aiomicro")
+    return lambda: response(result)
+
+
+def stage_format():
+    """format a json response (response.prepare)"""
+    response = _method(_server(), "/items/42").response
+    value = response(dict(id=42, name="item 42"))
+    return lambda: prepare(value)
+
+
+def stage_format_server():
+    """format a response which can't be prepared (aiohttp.format_server)"""
+    return lambda: format_server("pong")
+
+
+def stage_respond(metrics=False):
+    """handle a parsed request, and write the response (in memory)"""
+    connection = HTTPConnection(_server(metrics), None, NullWriter())
+    packet = Packet()
+
+    async def call():
+        return await connection.respond(packet, 1)
+    return call
+
+
+def stage_respond_metrics():
+    """respond, with SERVER metrics on (compare with respond)"""
+    return stage_respond(metrics=True)
+
+
+STAGES = dict(  # name -> setup, which returns the callable timed
+    to_args=stage_to_args,
+    head=stage_head,
+    parse=stage_parse,
+    route=stage_route,
+    content=stage_content,
+    match=stage_match,
+    response=stage_response,
+    format=stage_format,
+    format_server=stage_format_server,
+    respond=stage_respond,
+    respond_metrics=stage_respond_metrics,
+)
+
+
+def _batch(loop, call, number):
+    """seconds to run call number times (awaited, if it is a coroutine)"""
+    if inspect.iscoroutinefunction(call):
+        async def batch():
+            start = time.perf_counter()
+            for _ in range(number):
+                await call()
+            return time.perf_counter() - start
+        return loop.run_until_complete(batch())
+
+    start = time.perf_counter()
+    for _ in range(number):
+        call()
+    return time.perf_counter() - start
+
+
+def run(names=None, number=100, repeat=200):
+    """ run stage micro-benchmarks
+
+        Parameters:
+            names  - stages to run (default is all of STAGES)
+            number - calls per sample
+            repeat - samples; p50/p99 are of the per-call time of a sample
+
+        Return:
+            list of summaries (see aiomicro.bench.summarize)
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results = []
+    try:
+        for name in names or STAGES:
+            call = STAGES[name]()
+            _batch(loop, call, number)  # warm up
+            times = [
+                _batch(loop, call, number) / number for _ in range(repeat)]
+            results.append(summarize(
+                f"stage {name}", times, count=number * repeat,
+                elapsed=sum(times) * number))
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+    return results
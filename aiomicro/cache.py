@@ -0,0 +1,168 @@
+"""handler result caching and request coalescing"""
+import asyncio
+from collections import OrderedDict
+import time
+
+
+MISS = object()
+
+
+def make_key(args, kwargs, *extra):
+    """hashable key from handler args and kwargs (or None if unhashable)"""
+    key = (tuple(args), tuple(sorted(kwargs.items())), *extra)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def invalidate(request, name, *args, **kwargs):
+    """ invalidate entries in the named cache (see Cache.invalidate)
+
+        The cache is found in request.caches, which are the caches of the
+        micro definition that the request's server came from.
+    """
+    return request.caches[name].invalidate(*args, **kwargs)
+
+
+class Cache:
+    """ least-recently-used cache of handler results with a time-to-live
+
+        Parameters:
+            name     - name used to find the cache (see invalidate)
+            ttl      - seconds a result is kept
+            max_size - most results kept
+            headers  - comma-separated list of request header names whose
+                       values are part of the key
+
+        Notes:
+            1. A key is made from the resource args, the content kwargs and
+               the selected header values. A request with an unhashable
+               arg or kwarg value is not cached.
+            2. A handler can call invalidate after a write to remove stale
+               results.
+    """
+
+    def __init__(self, name, ttl=60, max_size=1000, headers=None):
+        self.name = name
+        self.ttl = float(ttl)
+        self.max_size = int(max_size)
+        if headers:
+            self.headers = tuple(
+                header.strip().lower() for header in headers.split(","))
+        else:
+            self.headers = ()
+        self._entries = OrderedDict()  # key -> (expires, result)
+        self.counters = dict(
+            hits=0, misses=0, evictions=0, expirations=0, invalidations=0)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def metrics(self):
+        """cache size and counters"""
+        return dict(size=len(self._entries), **self.counters)
+
+    def key(self, request, args, kwargs):
+        """cache key for a request (or None if it can't be cached)"""
+        if self.headers:
+            headers = request.http_headers
+            selected = tuple(headers.get(header) for header in self.headers)
+        else:
+            selected = ()
+        return make_key(args, kwargs, selected)
+
+    def get(self, key):
+        """return the cached result for key, or MISS"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, result = entry
+            if expires > time.monotonic():
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return result
+            del self._entries[key]
+            self.counters["expirations"] += 1
+        self.counters["misses"] += 1
+        return MISS
+
+    def put(self, key, result):
+        """cache result for key"""
+        self._entries[key] = (time.monotonic() + self.ttl, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def invalidate(self, *args, **kwargs):
+        """ remove cached results
+
+            With no arguments, all results are removed. Otherwise results
+            whose resource args equal args, and whose content includes
+            kwargs, are removed.
+
+            Return:
+
+                number of results removed
+        """
+        if not args and not kwargs:
+            count = len(self._entries)
+            self._entries.clear()
+        else:
+            items = set(kwargs.items())
+            stale = [
+                key for key in self._entries
+                if (not args or key[0] == args) and items <= set(key[1])]
+            for key in stale:
+                del self._entries[key]
+            count = len(stale)
+        self.counters["invalidations"] += count
+        return count
+
+
+class SingleFlight:
+    """ share one in-flight call among identical concurrent requests
+
+        The first caller for a key (the leader) runs the call; callers with
+        the same key that arrive before it finishes (followers) wait for,
+        and share, its result or exception. If the leader is cancelled, a
+        waiting follower runs the call instead.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> future
+        self.counters = dict(leaders=0, followers=0)
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def __call__(self, key, call):
+        """return the result of await call(), shared by key"""
+        while key in self._calls:
+            future = self._calls[key]
+            self.counters["followers"] += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # this caller was cancelled
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        self.counters["leaders"] += 1
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # mark retrieved, in case of no followers
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[key]
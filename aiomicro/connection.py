@@ -1,23 +1,105 @@
 """http listener"""
+import asyncio
+from functools import partial
 import logging
 import time
+import weakref
 
 from aiohttp import HTTPReader, HTTPException, parse, format_server
 from aiolistener import Connection
 
-from aiomicro.database import DB
+from aiomicro.database import LazyCursor
+from aiomicro.pipeline import Pipeline
+from aiomicro.request import Body, Replay, StreamRequest, read_head
+from aiomicro.response import Prepared, Stream, is_stream, prepare
 from aiomicro.rest import match
 
 
 log = logging.getLogger(__package__)
 
 
+CONTINUE = b"HTTP/1.1 100 Continue\r\n\r\n"
+CONNECTIONS = weakref.WeakSet()  # open HTTPConnections
+COUNTERS = dict(drains=0)  # totals of every connection, open or closed
+
+
+def metrics():
+    """ write buffer use of open connections
+
+        buffered is bytes not yet sent to clients; by_connection maps
+        connection id to (buffered, max_buffered, drains), where drains is
+        the number of times a response waited for the client to read.
+        drains is the total for every connection since the process started.
+    """
+    by_connection = {
+        con.id: (con.buffered, con.max_buffered, con.drains)
+        for con in list(CONNECTIONS)}
+    return dict(
+        connections=len(by_connection),
+        buffered=sum(item[0] for item in by_connection.values()),
+        drains=COUNTERS["drains"],
+        by_connection=by_connection,
+    )
+
+
 class HTTPConnection(Connection):
-    """concrete connection class for HTTP"""
+    """ concrete connection class for HTTP
+
+        If the server has a max_body, or a method with max_body or
+        stream=true (see Server.head_first), the request head is read, and
+        the request routed, before the body is read: a body larger than
+        max_body gets a 413 without being read, and a method with
+        stream=true gets a StreamRequest, whose body is read by the
+        handler. Other requests are parsed from the start, with the head
+        replayed (see Replay).
 
-    def __init__(self, routes, reader, writer):
+        Otherwise, each request is parsed directly from the connection.
+    """
+
+    def __init__(self, server, reader, writer):
         super().__init__(reader, writer)
-        self.routes = routes
+        self.server = server
+        self.routes = server.dispatch
+        self.high_water = 0
+        transport = getattr(writer, "transport", None)
+        if transport is not None:
+            if server.write_high is not None or server.write_low is not None:
+                transport.set_write_buffer_limits(
+                    high=server.write_high, low=server.write_low)
+            _, self.high_water = transport.get_write_buffer_limits()
+        self.peer = None
+        if hasattr(writer, "get_extra_info"):
+            self.peer = writer.get_extra_info("peername")
+        self.max_buffered = 0
+        self.drains = 0
+        self.pipeline = None
+        if server.pipeline > 1:
+            self.pipeline = Pipeline(server.pipeline)
+        self.replay = None
+        if server.head_first:
+            self.replay = Replay(b"", reader)
+            self.http_reader = HTTPReader(self.replay)
+        else:
+            self.http_reader = HTTPReader(reader)
+        CONNECTIONS.add(self)
+
+    @property
+    def buffered(self):
+        """bytes written but not yet sent to the client"""
+        transport = getattr(self.writer, "transport", None)
+        if transport is None:
+            return 0
+        return transport.get_write_buffer_size()
+
+    async def drain(self):
+        """wait while the write buffer is over its high-water mark"""
+        size = self.buffered
+        if size > self.max_buffered:
+            self.max_buffered = size
+        if size > self.high_water:
+            self.drains += 1
+            COUNTERS["drains"] += 1
+            await self.writer.drain()
 
     def on_http_exception(self, exc):
         """write HTTP response"""
@@ -25,63 +107,282 @@ class HTTPConnection(Connection):
             code=exc.code, message=exc.reason, content=exc.explanation))
 
     async def setup_reader(self):
-        return HTTPReader(self.reader)
+        return self.reader  # see next_packet
+
+    def _method(self, head):
+        """method matching head, or None"""
+        route, _ = self.routes.lookup(head.path)
+        if route:
+            return route.methods.get(head.method)
+        return None
+
+    def _continue(self):
+        self.writer.write(CONTINUE)
+
+    async def read_packet(self):
+        """read the head, check the body length, then read the request"""
+        if self.replay is None:
+            return await parse(self.http_reader)
+
+        head = await read_head(self.reader)
+        if head is None:
+            return None
+
+        method = self._method(head)
+        max_body = self.server.max_body
+        if method is not None and method.max_body is not None:
+            max_body = method.max_body
+
+        if method is not None and method.stream:
+            if head.is_chunked:
+                raise HTTPException(411, "Length Required")
+            length = head.content_length
+            if max_body is not None and length > max_body:
+                raise HTTPException(413, "Payload Too Large")
+            on_start = None
+            if head.headers.get("expect", "").lower() == "100-continue":
+                on_start = self._continue
+            return StreamRequest(
+                head, Body(self.reader, length, on_start))
+
+        if max_body is not None:
+            if head.is_chunked:  # the length can't be checked before parse
+                raise HTTPException(411, "Length Required")
+            if head.content_length > max_body:
+                raise HTTPException(413, "Payload Too Large")
+        self.replay.replay(head.data)
+        return await parse(self.http_reader)
 
     async def next_packet(self):
         try:
-            result = await parse(self.reader)
+            result = await self.read_packet()
         except HTTPException as exc:
             if exc.explanation:
                 log.warning("code=%s %s, cid=%s", exc.code, exc.explanation,
                             self.id)
             else:
                 log.warning("code=%s, cid=%s", exc.code, self.id)
+            if self.pipeline is not None:
+                await self.pipeline.wait()  # keep responses in order
             self.on_http_exception(exc)
             result = None
+        except (asyncio.CancelledError, ConnectionError):
+            if self.pipeline is not None:
+                self.pipeline.cancel()
+            raise
 
+        if result is None and self.pipeline is not None:
+            await self.pipeline.wait()  # finish responses before closing
         return result
 
     async def handle(self, packet, packet_id):
+        if self.pipeline is None:
+            return await self.respond(packet, packet_id)
+
+        try:
+            task = await self.pipeline.submit(
+                partial(self.pipelined, packet, packet_id))
+            if packet.is_keep_alive and not isinstance(
+                    packet, StreamRequest):
+                return True  # read the next request while this one runs
+            return await task
+        except asyncio.CancelledError:
+            self.pipeline.cancel()
+            raise
+
+    async def pipelined(self, packet, packet_id, turn):
+        """ respond to a pipelined request
+
+            A failure closes the connection, and cancels the requests which
+            follow it.
+        """
+        try:
+            keep_alive = await self.respond(packet, packet_id, turn)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("pipelined request failed, cid=%s", self.id)
+            keep_alive = False
+        if not keep_alive:
+            self.pipeline.cancel()
+            self.writer.close()
+        return keep_alive
+
+    async def respond(self, packet, packet_id, turn=None):
+        """ handle a request and write its response
+
+            If turn is not None, it is awaited before the response is
+            written (see Pipeline).
+        """
+        admitted = []  # (limiter, time admitted)
+        metrics = self.server.metrics
+        if metrics is not None:
+            metrics.inflight += 1
+        profiler = self.server.profiler
+        profile = None
+        if profiler is not None and profiler.wants(packet):
+            profile = profiler.start()
+            p_start = time.perf_counter()
+        try:
+            return await self._respond(packet, packet_id, turn, admitted)
+        finally:
+            if profile is not None:
+                profiler.stop(
+                    profile, self.id, packet_id, packet.http_method,
+                    packet.http_resource, time.perf_counter() - p_start)
+            if metrics is not None:
+                metrics.inflight -= 1
+            # --- whatever happened, the connection goes back to the pool
+            cursor = getattr(packet, "cursor", None)
+            if cursor is not None and cursor.is_active:
+                await cursor.abort()
+            now = time.perf_counter()
+            for limiter, start in admitted:
+                limiter.release(now - start)
+
+    @staticmethod
+    async def admit(limiter, admitted):
+        """ None if limiter admits the request, else the 503 response
+
+            An admitting limiter is added to admitted, for release.
+        """
+        if limiter is None:
+            return None
+        if await limiter.acquire():
+            admitted.append((limiter, time.perf_counter()))
+            return None
+        return limiter.rejection
+
+    @staticmethod
+    async def call(handler, packet):
+        """ call handler, cancelling it at packet.deadline (if any)
+
+            A cancelled handler raises a 504 HTTPException.
+        """
+        deadline = getattr(packet, "deadline", None)
+        if deadline is None:
+            return await handler(packet)
+        timeout = deadline - asyncio.get_running_loop().time()
+        try:
+            if timeout <= 0:
+                raise asyncio.TimeoutError()
+            return await asyncio.wait_for(handler(packet), timeout)
+        except asyncio.TimeoutError as exc:
+            raise HTTPException(
+                504, "Gateway Timeout", "request timed out") from exc
+
+    async def _respond(self, packet, packet_id, turn, admitted):
         r_start = time.perf_counter()
+        received = asyncio.get_running_loop().time()
 
-        message = (
-            f"request cid={self.id}"
-            f" rid={packet_id}, method={packet.http_method}"
-            f" resource={packet.http_resource}")
+        handler = None
         response_code = 200
+        keep_alive = packet.is_keep_alive
+        cursor = None
 
-        # --- identify handler based on method + resource
         try:
-            handler = match(self.routes, packet)
+            # --- shed the request if the server or route is too busy
+            response = await self.admit(self.server.limiter, admitted)
 
-            # --- grab database connection
-            if handler.cursor:
-                cursor = await DB[handler.cursor]
-                await cursor.start_transaction()
-                packet.cursor = cursor
+            # --- identify handler based on method + resource
+            if response is None:
+                handler = match(self.routes, packet)
+                response = await self.admit(handler.limiter, admitted)
+
+            if response is not None:
+                response_code = 503
             else:
-                cursor = None
+                # --- database connection (checked out on first use)
+                if handler.cursor:
+                    cursor = LazyCursor(
+                        handler.cursor, readonly=handler.readonly)
+                    packet.cursor = cursor
 
-            # --- handle the request
-            packet.cid = self.id
-            packet.id = packet_id
-            response = await handler(packet)
+                # --- handle the request
+                packet.cid = self.id
+                packet.id = packet_id
+                packet.peer = self.peer
+                packet.caches = self.server.caches
+                timeout = handler.timeout
+                if timeout is None:
+                    timeout = self.server.timeout
+                if timeout is not None:
+                    packet.deadline = received + timeout
+                try:
+                    response = await self.call(handler, packet)
+                except BaseException:
+                    if cursor:
+                        await cursor.abort()
+                    raise
 
-            if cursor:
-                await cursor.commit()
+                # --- a streamed response keeps the cursor while it is sent
+                if cursor and not is_stream(response):
+                    await cursor.commit()
+
+        except HTTPException as exc:
+            response_code = exc.code
+            response = exc
 
-            # --- send http response
+        if turn is not None:
+            await turn  # previous response is written
+
+        # --- send http response
+        formatted = 0.0  # seconds formatting the response
+        if isinstance(response, HTTPException):
+            self.on_http_exception(response)
+        elif is_stream(response):
+            if not await self.stream(response, cursor):
+                keep_alive = False
+        else:
+            f_start = time.perf_counter()
             if response is None:
                 response = ""
-            self.writer.write(format_server(response))
+            prepared = response if isinstance(response, Prepared) else (
+                prepare(response))
+            if prepared is not None:
+                await prepared.write(self.writer)
+            else:
+                self.writer.write(format_server(response))
+            formatted = time.perf_counter() - f_start
 
-        except HTTPException as exc:
-            response_code = exc.code
-            self.on_http_exception(exc)
+        await self.drain()
+
+        if isinstance(packet, StreamRequest) and not packet.body.is_complete:
+            keep_alive = False  # unread body is still on the connection
 
-        message += (
-            f" status={response_code}"
-            f" t={time.perf_counter() - r_start:f}")
-        log.info(message)
+        metrics = self.server.metrics
+        if metrics is not None:
+            if handler is None:  # not routed, or shed by the server
+                metrics.unmatched.observe(response_code, 0.0, 0.0, formatted)
+            else:
+                handler.stats.observe(
+                    response_code, handler.handler_time,
+                    cursor.elapsed if cursor else 0.0,
+                    handler.serialize_time + formatted)
+
+        access_log = self.server.access_log
+        if access_log is not None and access_log.wants(
+                handler, response_code):
+            access_log(
+                self.id, packet_id, packet.http_method, packet.http_resource,
+                response_code, time.perf_counter() - r_start)
+
+        return keep_alive
 
-        return packet.is_keep_alive
+    async def stream(self, response, cursor):
+        """ send a streamed response, then commit cursor
+
+            Once the head is sent, an error can't be reported to the client,
+            so a failure rolls back cursor, is logged, and leaves the body
+            unterminated; the return value is False, to close the connection.
+        """
+        if not isinstance(response, Stream):
+            response = Stream(response)
+        try:
+            await response.write(self.writer)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("streamed response failed, cid=%s", self.id)
+            if cursor:
+                await cursor.rollback()
+            return False
+        if cursor:
+            await cursor.commit()
+        return True
@@ -1,16 +1,29 @@
 """setup database"""
+import asyncio
+from collections import Counter
+from functools import partial
+import inspect
 import logging
 import os
+import time
 
-from aiodb import Cursor, Pool
+from aiodb import Cursor
 # from aiodb.connector.postgres import DB as postgres_db
 
 from aiomicro.micro import parser
+from aiomicro.pool import Pool
+from aiomicro.statement import StatementCache
 from aiomicro.util.types import boolean
 
 
 log = logging.getLogger(__name__)
 
+# statement.escape relies on backslash escapes, and renders datetimes in UTC
+SQL_MODE = (
+    "SET SESSION sql_mode = TRIM(BOTH ',' FROM REPLACE(CONCAT("
+    "',', @@SESSION.sql_mode, ','), ',NO_BACKSLASH_ESCAPES,', ',')),"
+    " time_zone = '+00:00'")
+
 
 def setup(defn="micro"):
     """setup database from micro file"""
@@ -32,8 +45,26 @@ def _setup(database_type, *args, **kwargs):
 
 def setup_mysql(host="mysql",  # pylint: disable=too-many-arguments
                 port=3306, name="", user="", password="", isolation=None,
-                commit=True):
-    """setup mysql connector"""
+                commit=True, statement_cache=100, autocommit=False,
+                replica=None):
+    """setup mysql connector
+
+       Cursor.execute(query, **kwargs) binds kwargs to %(name)s parameters
+       in query. Each connection keeps a cache of up to statement_cache
+       parsed queries; hit, miss and evict counts for all connections are
+       available as cursor.statements.
+
+       Since bound parameters are escaped with backslashes, each connection
+       removes NO_BACKSLASH_ESCAPES from its session's sql_mode; since
+       aware datetimes are bound in UTC, it sets the session's time_zone
+       to UTC (so TIMESTAMP columns and NOW() are in UTC too).
+
+       If autocommit is True, each statement is committed by the server,
+       and the cursor does not manage transactions.
+
+       If replica ("host" or "host:port") is specified, it replaces host
+       and port, including any values from the environment.
+    """
     from aiomysql.connection import MysqlConnection  # pylint: disable=C0415
 
     host = os.getenv("DB_HOST", host)
@@ -43,6 +74,11 @@ def setup_mysql(host="mysql",  # pylint: disable=too-many-arguments
     password = os.getenv("DB_PASSWORD", password)
     isolation = os.getenv("DB_ISOLATION", isolation)
     commit = boolean(os.getenv("DB_COMMIT", commit))
+    statement_cache = int(os.getenv("DB_STATEMENT_CACHE", statement_cache))
+    if replica:
+        host, _, replica_port = replica.partition(":")
+        port = int(replica_port or port)
+    statements = Counter()
 
     async def cursor():
         con = await MysqlConnection.connect(
@@ -51,16 +87,22 @@ def setup_mysql(host="mysql",  # pylint: disable=too-many-arguments
             password=password,
             database=name,
             port=port,
-            autocommit=False,
+            autocommit=autocommit,
             isolation=isolation,
         )
+        await con.execute(SQL_MODE)
+
+        cache = StatementCache(statement_cache, statements)
 
-        async def no_kwargs(query, **kwargs):
-            # pylint: disable=unused-argument
+        async def execute(query, **kwargs):
+            if kwargs:
+                query = cache.get(query).bind(kwargs)
             return await con.execute(query)
 
-        return Cursor.bind(con, transactions=commit, execute=no_kwargs)
+        return Cursor.bind(
+            con, transactions=commit and not autocommit, execute=execute)
 
+    cursor.statements = statements
     return cursor
 
 
@@ -80,28 +122,159 @@ def setup_mysql(host="mysql",  # pylint: disable=too-many-arguments
 #     )
 
 
+class _Source:
+    """a connector, optionally pooled"""
+
+    def __init__(self, label, connector):
+        self.label = label
+        self.connector = connector
+        self.pool = None
+
+    @property
+    def load(self):
+        """cursors in use or waiting (0 if not pooled)"""
+        if self.pool is None:
+            return 0
+        metrics = self.pool.metrics
+        return metrics["in_use"] + metrics["waiting"]
+
+    async def init_pool(self, **kwargs):
+        """set up connection pool"""
+        self.pool = await Pool.setup(self.connector, **kwargs)
+
+    async def cursor(self):
+        """return a cursor from the pool or a new connection"""
+        if self.pool:
+            return await self.pool.cursor()
+        return await self.connector()
+
+
 class _DB:
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self._connector = None
+        self._primary = None
+        self._reader = None
+        self._reader_connector = None  # creates the reader's connector
+        self._pool_kwargs = None  # for the reader's pool
+        self._lock = asyncio.Lock()
+        self.replicas = []
+        self.balance = "round_robin"
+        self._next = 0
 
     @classmethod
-    def setup(cls, database_type, *args, **kwargs):
-        """establish connector to database"""
+    def setup(cls, database_type,  # pylint: disable=too-many-arguments
+              *args, connection_name=None, replicas=None,
+              balance="round_robin", **kwargs):
+        """establish connector to database
+
+           Connectors are created for:
+
+               read-write cursors, which run in transactions
+               read-only cursors on the primary, which run in autocommit
+                   (See Note 1)
+               read-only cursors on each replica (See Note 2)
+
+           Notes:
+               1. The connector (and pool) for read-only cursors on the
+                  primary is created when the first one is requested, so a
+                  database which has none opens no extra connections.
+               2. replicas is a comma-separated list of host[:port] (or the
+                  DB_{CONNECTION_NAME}_REPLICAS environment variable, eg
+                  DB_USERS_REPLICAS for connection_name users). Replicas
+                  are chosen by balance, which is round_robin or
+                  least_loaded (the pool with the fewest cursors in use or
+                  waiting).
+        """
+        if balance not in ("round_robin", "least_loaded"):
+            raise ValueError(f"invalid balance: {balance}")
         dbinst = cls()
-        dbinst._connector = _setup(  # pylint: disable=protected-access
-            database_type, *args, **kwargs)
+        dbinst.balance = balance
+        # pylint: disable=protected-access
+        dbinst._primary = _Source("primary", _setup(
+            database_type, *args, **kwargs))
+        dbinst._reader_connector = partial(
+            _setup, database_type, *args, **dict(kwargs, autocommit=True))
+        if connection_name:
+            replicas = os.getenv(
+                f"DB_{connection_name.upper()}_REPLICAS", replicas)
+        for replica in replicas.split(",") if replicas else ():
+            dbinst.replicas.append(_Source(replica, _setup(
+                database_type, *args,
+                **dict(kwargs, autocommit=True, replica=replica))))
         return dbinst
 
-    async def init_pool(self, pool_size):
-        """set up connection pool"""
-        pool = await Pool.setup(self.cursor, pool_size)
-        self.cursor = pool.cursor
-
-    async def cursor(self):  # pylint: disable=method-hidden
+    @property
+    def sources(self):
+        """all connectors for this database"""
+        sources = [self._primary]
+        if self._reader is not None:
+            sources.append(self._reader)
+        return sources + self.replicas
+
+    @property
+    def pool(self):
+        """the read-write pool (or None)"""
+        return self._primary.pool
+
+    @property
+    def statements(self):
+        """statement cache counters, by source (if supported)"""
+        return {
+            source.label: source.connector.statements
+            for source in self.sources
+            if hasattr(source.connector, "statements")}
+
+    @property
+    def metrics(self):
+        """pool metrics, by source (empty if there are no pools)"""
+        return {
+            source.label: source.pool.metrics
+            for source in self.sources if source.pool}
+
+    def leaks(self, age=None):
+        """connections held longer than age seconds, by source (see Pool)"""
+        return {
+            source.label: source.pool.leaks(age)
+            for source in self.sources if source.pool}
+
+    async def init_pool(self, pool_size=10, **kwargs):
+        """set up connection pools
+
+           pool_size is the maximum size of each pool; kwargs are passed to
+           Pool.
+        """
+        self._pool_kwargs = dict(kwargs, max_size=pool_size)
+        for source in self.sources:
+            await source.init_pool(**self._pool_kwargs)
+
+    async def cursor(self):
         """return connection to database as cursor"""
-        return await self._connector()
+        return await self._primary.cursor()
+
+    def _replica(self):
+        """choose a replica"""
+        if self.balance == "least_loaded":
+            return min(self.replicas, key=lambda replica: replica.load)
+        replica = self.replicas[self._next]
+        self._next = (self._next + 1) % len(self.replicas)
+        return replica
+
+    async def reader(self, primary=False):
+        """return autocommit connection to database as cursor
+
+           A replica is used, if any are defined, unless primary is True.
+        """
+        if self.replicas and not primary:
+            return await self._replica().cursor()
+        if self._reader is None:
+            async with self._lock:
+                if self._reader is None:
+                    reader = _Source("reader", self._reader_connector())
+                    if self._pool_kwargs is not None:
+                        await reader.init_pool(**self._pool_kwargs)
+                    self._reader = reader
+        return await self._reader.cursor()
 
 
 class _DBS:
@@ -114,10 +287,161 @@ class _DBS:
         connector = self.dbs[key]
         return await connector.cursor()
 
+    async def reader(self, key, primary=False):
+        """return an autocommit (read-only) cursor"""
+        return await self.dbs[key].reader(primary)
+
+    def metrics(self, key):
+        """pool metrics for a database connection, by source"""
+        return self.dbs[key].metrics
+
+    def leaks(self, key, age=None):
+        """long-held pooled connections for a database connection"""
+        return self.dbs[key].leaks(age)
+
     def add(self, connection_name, *args, **kwargs):
         """add a database connector"""
-        con = self.dbs[connection_name] = _DB.setup(*args, **kwargs)
+        con = self.dbs[connection_name] = _DB.setup(
+            *args, connection_name=connection_name, **kwargs)
         return con
 
 
 DB = _DBS()
+
+
+class LazyCursor:
+    """ cursor which checks out a connection on first use
+
+        The first time the cursor is used, a connection is taken from
+        DB[name] and a transaction is started. A commit or rollback ends
+        the transaction and returns the connection to the pool, so a handler
+        can release its connection early; any later use checks out another
+        connection and starts a new transaction. close is a rollback: work
+        which is not committed is discarded, as when a connection closes.
+
+        If readonly is True, the connection comes from DB.reader(name) and
+        runs in autocommit mode, so no transaction is started or committed.
+        A read-only cursor uses a replica, if any are defined, unless pin
+        is called first ("read your writes").
+
+        Attributes of the underlying cursor are available once it has
+        been acquired; before that, the cursor methods named in DEFERRED
+        are coroutines which acquire the cursor and then call the method,
+        and any other attribute raises AttributeError.
+
+        elapsed is the time, in seconds, spent in database calls (including
+        checkout, commit and rollback).
+    """
+
+    DEFERRED = frozenset(("select", "insert", "update", "delete", "query"))
+
+    def __init__(self, name, dbs=None, readonly=False):
+        self.name = name
+        self.readonly = readonly
+        self._dbs = dbs or DB
+        self._cursor = None
+        self._primary = False
+        self._interrupted = False  # a call was cancelled part way
+        self.elapsed = 0.0
+
+    def pin(self):
+        """send read-only queries to the primary"""
+        self._primary = True
+
+    @property
+    def is_active(self):
+        """True if a connection is checked out"""
+        return self._cursor is not None
+
+    async def acquire(self):
+        """check out a connection and start a transaction (if needed)"""
+        if self._cursor is None and self.readonly:
+            self._cursor = await self._dbs.reader(self.name, self._primary)
+        elif self._cursor is None:
+            cursor = await self._dbs[self.name]
+            try:
+                await cursor.start_transaction()
+            except asyncio.CancelledError:
+                await _discard(cursor)
+                raise
+            except Exception:
+                await cursor.close()
+                raise
+            self._cursor = cursor
+        return self._cursor
+
+    async def _end(self, action):
+        cursor, self._cursor = self._cursor, None
+        if cursor is None:
+            return
+        start = time.perf_counter()
+        try:
+            if not self.readonly:
+                await getattr(cursor, action)()
+        finally:
+            await cursor.close()
+            self.elapsed += time.perf_counter() - start
+
+    async def commit(self):
+        """commit the transaction and release the connection"""
+        await self._end("commit")
+
+    async def rollback(self):
+        """rollback the transaction and release the connection"""
+        await self._end("rollback")
+
+    async def close(self):
+        """rollback the transaction (if any) and release the connection"""
+        await self._end("rollback")
+
+    async def abort(self):
+        """ rollback and release the connection after a failed request
+
+            If a call on the connection was cancelled part way (for
+            instance, by a request timeout), the connection's protocol state
+            is unknown, so it is closed instead of being returned to a pool.
+        """
+        if self._interrupted and self._cursor is not None:
+            cursor, self._cursor = self._cursor, None
+            self._interrupted = False
+            await _discard(cursor)
+        else:
+            await self.rollback()
+
+    async def _call(self, name, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            cursor = await self.acquire()
+            try:
+                return await getattr(cursor, name)(*args, **kwargs)
+            except asyncio.CancelledError:
+                self._interrupted = True
+                raise
+        finally:
+            self.elapsed += time.perf_counter() - start
+
+    async def execute(self, query, **kwargs):
+        """execute query on the connection"""
+        return await self._call("execute", query, **kwargs)
+
+    def __getattr__(self, name):
+        if self._cursor is not None:
+            value = getattr(self._cursor, name)
+            if not inspect.iscoroutinefunction(value):
+                return value
+        elif name not in self.DEFERRED:
+            raise AttributeError(
+                f"{name!r} is not available before the cursor is acquired")
+
+        async def deferred(*args, **kwargs):
+            return await self._call(name, *args, **kwargs)
+        return deferred
+
+
+async def _discard(cursor):
+    """close cursor's connection without returning it to a pool"""
+    discard = getattr(cursor, "discard", None)
+    if discard is not None:
+        await discard()
+    else:
+        await cursor.close()
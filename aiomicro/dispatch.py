@@ -0,0 +1,234 @@
+"""compiled route dispatch"""
+import re
+
+
+_META = set(".^$*+?{}[]|()")
+_OPTIONAL = ("*", "?", "{")
+_NOT_FOUND = (None, None)
+
+
+def literal_prefix(pattern):
+    """ split a route pattern into its literal prefix
+
+        Return:
+
+            tuple of:
+                literal prefix as str
+                True if the pattern matches only the literal (ends in $)
+
+        Notes:
+
+            1. A leading ^ is ignored, since routes are matched with re.match.
+
+            2. A character followed by an optional quantifier (*, ?, {) is
+               not part of the prefix.
+
+            3. A pattern with top-level alternation has no prefix.
+    """
+    if _has_alternation(pattern):
+        return "", False
+
+    prefix = []
+    pos = 1 if pattern.startswith("^") else 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        step = 1
+        if char == "\\":
+            char = pattern[pos + 1:pos + 2]
+            if not char or char.isalnum():  # class, anchor or backreference
+                break
+            step = 2
+        elif char in _META:
+            if char == "$" and pos == len(pattern) - 1:
+                return "".join(prefix), True
+            break
+        if pattern[pos + step:pos + step + 1] in _OPTIONAL:
+            break
+        prefix.append(char)
+        pos += step
+    return "".join(prefix), False
+
+
+def _has_alternation(pattern):
+    """True if pattern contains a '|' outside of groups and classes"""
+    depth = 0
+    in_class = False
+    escaped = False
+    for char in pattern:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            in_class = char != "]"
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+def _is_combinable(pattern):
+    """True if pattern can be embedded in a larger alternation"""
+    return not re.search(r"\\\d|\(\?P=|\(\?\(|^\(\?[a-zA-Z]", pattern)
+
+
+class _Node:  # pylint: disable=too-few-public-methods
+    """prefix trie node"""
+
+    __slots__ = ("children", "routes")
+
+    def __init__(self):
+        self.children = {}
+        self.routes = []
+
+
+class Dispatcher:
+    """match a path against an ordered list of routes
+
+       Routes are partitioned at construction time into:
+
+           1. exact literal patterns (eg, /health$) held in a dict
+           2. patterns with a literal prefix (eg, /users/(\\d+)$) held in a
+              prefix trie, keyed by the prefix
+           3. everything else, combined into one alternation regex
+
+       A lookup consults each structure, and the lowest-numbered matching
+       route wins, so the result is the same as trying each route's pattern,
+       in order, with re.match.
+    """
+
+    def __init__(self, routes):
+        self.routes = list(routes)
+        self.exact = {}
+        self.trie = _Node()
+        self.combined = None
+        self.combined_groups = {}  # outer group index -> (route index, size)
+        self.first_combined = len(self.routes)
+        self.linear = []  # indexes of routes that can't be combined
+
+        combined = []
+        for index, route in enumerate(self.routes):
+            pattern = route.pattern.pattern
+            prefix, is_exact = literal_prefix(pattern)
+            if is_exact:
+                self.exact.setdefault(prefix, index)
+            elif prefix:
+                node = self.trie
+                for char in prefix:
+                    node = node.children.setdefault(char, _Node())
+                node.routes.append(index)
+            elif _is_combinable(pattern):
+                combined.append(index)
+            else:
+                self.linear.append(index)
+
+        self._combine(combined)
+
+    def _combine(self, indexes):
+        """build the alternation regex for routes without a literal prefix"""
+        if self.linear:
+            self.first_combined = self.linear[0]
+        if not indexes:
+            return
+        parts = []
+        group = 1
+        for index in indexes:
+            pattern = self.routes[index].pattern
+            parts.append(f"({pattern.pattern})")
+            self.combined_groups[group] = (index, pattern.groups)
+            group += pattern.groups + 1
+        try:
+            self.combined = re.compile("|".join(parts))
+        except re.error:  # eg, duplicate group names across patterns
+            self.linear = sorted(self.linear + indexes)
+            self.combined_groups = {}
+            self.first_combined = self.linear[0]
+        else:
+            self.first_combined = min(self.first_combined, indexes[0])
+
+    def _candidates(self, path):
+        """indexes of prefix routes whose prefix starts path"""
+        found = []
+        node = self.trie
+        for char in path:
+            node = node.children.get(char)
+            if node is None:
+                break
+            found.extend(node.routes)
+        return sorted(found)
+
+    def lookup(self, path):
+        """find the first matching route
+
+           Return:
+
+               tuple of:
+                   matching route, or None
+                   tuple of regex groups from the match, or None
+        """
+        best = self.exact.get(path, len(self.routes))
+        groups = ()
+
+        for index in self._candidates(path):
+            if index >= best:
+                break
+            resource = self.routes[index].pattern.match(path)
+            if resource:
+                best, groups = index, resource.groups()
+                break
+
+        if self.first_combined < best:
+            if self.combined:
+                resource = self.combined.match(path)
+                if resource:
+                    index, size = self.combined_groups[resource.lastindex]
+                    if index < best:
+                        start = resource.lastindex
+                        best = index
+                        groups = resource.groups()[start:start + size]
+            for index in self.linear:
+                if index >= best:
+                    break
+                resource = self.routes[index].pattern.match(path)
+                if resource:
+                    best, groups = index, resource.groups()
+                    break
+
+        if best == len(self.routes):
+            return _NOT_FOUND
+        return self.routes[best], groups
+
+
+if __name__ == '__main__':
+    import timeit
+
+    class _Route:  # pylint: disable=too-few-public-methods
+        def __init__(self, pattern):
+            self.pattern = re.compile(pattern)
+
+    def _linear(routes, path):
+        for route in routes:
+            if route.pattern.match(path):
+                return route
+        return None
+
+    print(f"{'routes':>8} {'linear (us)':>12} {'dispatch (us)':>14}")
+    for count in (10, 50, 200, 1000):
+        test_routes = []
+        for num in range(count // 2):
+            test_routes.append(_Route(f"/static{num}$"))
+            test_routes.append(_Route(fr"/resource{num}/(\d+)$"))
+        last = f"/resource{count // 2 - 1}/123"
+        dispatch = Dispatcher(test_routes)
+        assert dispatch.lookup(last)[0] is _linear(test_routes, last)
+        scan = min(timeit.repeat(
+            lambda: _linear(test_routes, last), number=2000, repeat=3))
+        fast = min(timeit.repeat(
+            lambda: dispatch.lookup(last), number=2000, repeat=3))
+        print(f"{count:>8} {scan / 2000 * 1e6:>12.2f}"
+              f" {fast / 2000 * 1e6:>14.2f}")
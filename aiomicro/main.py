@@ -2,6 +2,11 @@
 import asyncio
 from functools import partial
 import logging
+import multiprocessing
+import multiprocessing.connection
+import signal
+import socket
+import time
 
 from aiolistener import Listeners
 
@@ -12,12 +17,35 @@ from aiomicro.micro import parser
 
 log = logging.getLogger(__name__)
 
+RESTART_DELAY = 1.0  # minimum seconds between starts of a crashing worker
+STARTUP = 10.0  # a worker which exits sooner than this failed to start
+START_FAILURES = 5  # consecutive failed starts which stop the supervisor
 
-async def main(defn="micro"):
-    """parse micro definition file and start servers"""
 
-    database, servers, tasks = parser.parse(defn)
-    for connection_name, setup in database.items():
+async def main(defn="micro", workers=None):
+    """parse micro definition file and start servers
+
+       If workers (or the WORKERS directive) is greater than one, this
+       process becomes a supervisor for that many worker processes, each of
+       which runs every SERVER on a shared (SO_REUSEPORT) port. Only the
+       task worker runs TASKs.
+
+       In worker mode, defn must be a path, since each worker parses the
+       micro file for itself.
+    """
+    micro = parser.load(defn)
+    workers = int(workers or micro.workers or 1)
+    if workers > 1:
+        for server in micro.servers:
+            check_reuse_port(server.port)
+        await supervise(defn, workers, micro.task_worker)
+    else:
+        await serve(micro)
+
+
+async def serve(micro, run_tasks=True, reuse_port=False):
+    """start databases, servers and tasks from a parsed micro definition"""
+    for connection_name, setup in micro.database.items():
         con = DB.add(connection_name, *setup.args, **setup.kwargs)
         try:
             cursor = await con.cursor()
@@ -27,16 +55,145 @@ async def main(defn="micro"):
         log.info("verified connectivity to database %s", connection_name)
         await cursor.close()
         if setup.pool:
-            await con.init_pool(pool_size=setup.pool_size)
-    for server in servers:
-        connection = partial(HTTPConnection, server.routes)
-        await Listeners.add(server.name, server.port, connection)
-    for key, value in tasks.items():
-        log.info("starting task %s", key)
-        asyncio.create_task(value(), name=key)
+            await con.init_pool(
+                pool_size=setup.pool_size, **setup.pool_kwargs)
+    if micro.sampler is not None:
+        start_sampler(micro.sampler)
+    listen = dict(reuse_port=True) if reuse_port else {}
+    for server in micro.servers:
+        connection = partial(HTTPConnection, server)
+        await Listeners.add(server.name, server.port, connection, **listen)
+    if run_tasks:
+        for key, value in micro.tasks.items():
+            log.info("starting task %s", key)
+            asyncio.create_task(value(), name=key)
     await Listeners.run()
 
 
+def start_sampler(sampler):
+    """start sampling the event loop's thread; SIGUSR2 dumps the samples"""
+    sampler.start()
+    if hasattr(signal, "SIGUSR2"):
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGUSR2, sampler.dump)
+    log.info("sampling stacks at %shz", sampler.hz)
+
+
+def check_reuse_port(port):
+    """ raise an Exception unless two sockets can share port (SO_REUSEPORT)
+
+        This is checked once, before any workers are started, so that a
+        platform (or a port already in use) which can't run workers fails
+        at startup rather than in a restart loop.
+    """
+    option = getattr(socket, "SO_REUSEPORT", None)
+    if option is None:
+        raise Exception("SO_REUSEPORT is not supported; use one worker")
+    sockets = []
+    try:
+        for _ in range(2):
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sockets.append(sock)
+            sock.setsockopt(socket.SOL_SOCKET, option, 1)
+            sock.bind(("", port))
+    except OSError as exc:
+        raise Exception(
+            f"unable to share port {port} between workers: {exc}") from exc
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def _worker(defn, index, run_tasks, log_level):
+    """worker process entry point"""
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=log_level)
+    log.info("worker %s starting", index)
+    asyncio.run(serve(parser.load(defn), run_tasks, reuse_port=True))
+
+
+async def supervise(defn, workers, task_worker=0, target=_worker):
+    """ start worker processes and restart any that exit
+
+        Parameters:
+            defn        - micro file name
+            workers     - number of worker processes
+            task_worker - index of the worker which runs TASKs
+            target      - worker process function
+
+        Notes:
+            1. A worker which exits within STARTUP seconds of being
+               started failed to start; after START_FAILURES of these
+               in a row, the supervisor stops (and raises) instead of
+               restarting workers forever.
+            2. On SIGTERM or SIGINT, the workers are terminated and
+               joined, and supervise returns.
+    """
+    context = multiprocessing.get_context("spawn")
+    log_level = logging.getLogger().getEffectiveLevel()
+    procs = {}
+    failures = 0
+
+    def start(index):
+        proc = context.Process(
+            target=target,
+            args=(defn, index, index == task_worker, log_level),
+            name=f"aiomicro-worker-{index}",
+            daemon=True)
+        proc.start()
+        procs[index] = (proc, time.monotonic())
+        log.info("started worker %s pid=%s", index, proc.pid)
+
+    for index in range(workers):
+        start(index)
+
+    loop = asyncio.get_running_loop()
+    waker, wakeup = socket.socketpair()  # wakes the wait on a signal
+    stopping = []
+
+    def stop(signum):
+        log.info("supervisor stopping on signal %s", signum)
+        stopping.append(signum)
+        wakeup.send(b"\0")
+
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stop, signum)
+    try:
+        while not stopping:
+            await loop.run_in_executor(
+                None, multiprocessing.connection.wait,
+                [waker] + [proc.sentinel for proc, _ in procs.values()])
+            for index, (proc, started) in list(procs.items()):
+                if stopping:
+                    break
+                if proc.is_alive():
+                    continue
+                log.warning("worker %s pid=%s exited code=%s",
+                            index, proc.pid, proc.exitcode)
+                lifetime = time.monotonic() - started
+                if lifetime < STARTUP:
+                    failures += 1
+                    if failures >= START_FAILURES:
+                        raise Exception(
+                            f"workers failed to start {failures} times")
+                else:
+                    failures = 0
+                delay = RESTART_DELAY - lifetime
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if not stopping:
+                    start(index)
+    finally:
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.remove_signal_handler(signum)
+        for proc, _ in procs.values():
+            proc.terminate()
+        for proc, _ in procs.values():
+            proc.join()
+        waker.close()
+        wakeup.close()
+
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
     asyncio.run(main())
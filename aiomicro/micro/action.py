@@ -1,21 +1,67 @@
 """action routines for micro file parsing"""
+import functools
+import inspect
 import re
 
 import marshmallow as ma
 
 from aiohttp import HTTPException
-from aiomicro.util import import_by_path, load_from_path
+from aiomicro.access_log import AccessLog
+from aiomicro.admission import Limiter
+from aiomicro.cache import Cache, SingleFlight
+from aiomicro.dispatch import Dispatcher
+from aiomicro.metrics import CONTENT_TYPE, ServerMetrics, render
+from aiomicro.profiling import RequestProfiler
+from aiomicro.sampler import Sampler
+from aiomicro.micro.validate import compile_dumper, compile_loader
+from aiomicro.response import Stream
+from aiomicro.static import StaticFile
+from aiomicro.util import import_by_path, jsonify
 from aiomicro.util.types import boolean
 
 
+STREAM_CHUNK = 1 << 16  # bytes of json items per streamed chunk
+
+
+def _optional(value, cast=float):
+    """cast value unless it is None"""
+    return None if value is None else cast(value)
+
+
+def _limiter(max_inflight=None, **kwargs):
+    """Limiter for max_inflight, or None if it is not set"""
+    if max_inflight is None:
+        return None
+    return Limiter(int(max_inflight), **kwargs)
+
+
+def _streamed(generator):
+    """make an async generator function awaitable like other handlers"""
+    @functools.wraps(generator)
+    async def handler(*args, **kwargs):
+        return generator(*args, **kwargs)
+    return handler
+
+
 class Database:  # pylint: disable=too-few-public-methods
     """Container for database configuration"""
 
-    def __init__(self, connection_name, *args, pool=False, pool_size=10,
-                 **kwargs):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 connection_name, *args, pool=False, pool_size=10,
+                 min_size=0, max_size=None, max_idle=None,
+                 max_lifetime=None, ping=False, leak_timeout=None,
+                 readonly=False, **kwargs):
         self.connection_name = connection_name
+        self.readonly = boolean(readonly)
         self.pool = boolean(pool)
-        self.pool_size = int(pool_size)
+        self.pool_size = int(max_size or pool_size)
+        self.pool_kwargs = dict(
+            min_size=int(min_size),
+            max_idle=_optional(max_idle),
+            max_lifetime=_optional(max_lifetime),
+            ping=boolean(ping),
+            leak_timeout=_optional(leak_timeout),
+        )
         self.args = args
         self.kwargs = kwargs
 
@@ -23,56 +69,155 @@ class Database:  # pylint: disable=too-few-public-methods
 class Server:  # pylint: disable=too-few-public-methods
     """Container for a server configuration"""
 
-    def __init__(self, name, port):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 name, port, max_body=None, write_high=None, write_low=None,
+                 pipeline=1, max_inflight=None, queue=0, retry_after=1,
+                 adaptive=None, timeout=None, access_log="text",
+                 metrics=None, profile=None, profile_rate=0,
+                 profile_secret=None, profile_size=32):
         self.name = name
         self.port = int(port)
+        self.metrics = None
+        if metrics is not None:
+            self.metrics = ServerMetrics(name, metrics)
+        self.profile = profile
+        self.profiler = None
+        if profile is not None:
+            self.profiler = RequestProfiler(
+                profile_rate, profile_secret, int(profile_size))
+        self.access_log = None
+        if access_log != "none":
+            self.access_log = AccessLog(access_log)
+        self.timeout = _optional(timeout)
+        self.limiter = _limiter(
+            max_inflight, queue=queue, retry_after=retry_after,
+            adaptive=adaptive)
+        self.pipeline = int(pipeline)
+        self.max_body = _optional(max_body, int)
+        self.write_high = _optional(write_high, int)
+        self.write_low = _optional(write_low, int)
         self.routes = []
+        self.dispatch = None
+        self.caches = {}  # the micro definition's caches, by name
+        self.head_first = False
+
+    def compile(self):
+        """ build the route dispatcher once all routes are defined
+
+            A request's head is read (and routed) before the request is
+            parsed only if a body limit or a stream method needs it (see
+            HTTPConnection).
+        """
+        self.dispatch = Dispatcher(self.routes)
+        self.head_first = self.max_body is not None or any(
+            method.stream or method.max_body is not None
+            for route in self.routes for method in route.methods.values())
 
 
 class Route:  # pylint: disable=too-few-public-methods
     """Container for a route configuration"""
 
-    def __init__(self, pattern):
+    def __init__(self, pattern, max_inflight=None, queue=0, retry_after=1,
+                 adaptive=None):
         self.pattern = re.compile(pattern)
         self.args = []
         self.methods = {}
+        self.limiter = _limiter(
+            max_inflight, queue=queue, retry_after=retry_after,
+            adaptive=adaptive)
 
 
 class Method:  # pylint: disable=too-few-public-methods
     """Container for a method configuration"""
 
-    def __init__(self, path, silent=False, cursor=None, wrap=None):
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 path, silent=False, cursor=None, wrap=None, readonly=False,
+                 coalesce=False, stream=False, max_body=None, timeout=None,
+                 sample=1.0):
         self.handler = import_by_path(path)
+        if inspect.isasyncgenfunction(self.handler):
+            if boolean(coalesce):
+                raise Exception('coalesce is not supported when streaming')
+            self.handler = _streamed(self.handler)
         if wrap:
             self.handler = wrap(self.handler)
         self.silent = boolean(silent)
+        self.sample = float(sample)
         self.cursor = cursor
+        self.readonly = boolean(readonly)
         self.content = None
         self.response = None
+        self.cache = None
+        self.coalesce = SingleFlight() if boolean(coalesce) else None
+        self.stream = boolean(stream)
+        self.max_body = _optional(max_body, int)
+        self.timeout = _optional(timeout)
+        self.stats = None
 
 
 class FileMethod:  # pylint: disable=too-few-public-methods
-    """Container for file-based result"""
+    """Container for file-based result
+
+       The response is prepared at parse time (see StaticFile); kwargs are
+       passed to StaticFile.
+    """
 
-    def __init__(self, path, silent=False,
+    OPTIONS = ("content_type", "charset", "compress", "threshold")
+
+    def __init__(self, path, silent=False, sample=1.0,
                  # ignore file argument
                  file=True,  # pylint: disable=unused-argument
                  **kwargs):
 
-        data = load_from_path(path)
+        for name in kwargs:
+            if name not in self.OPTIONS:
+                raise Exception(f"invalid file method argument: {name}")
+        static = StaticFile(path, **kwargs)
+
+        async def handler(request):
+            return static(request)
+
+        self.handler = handler
+        self.silent = boolean(silent)
+        self.sample = float(sample)
+        self.cursor = None
+        self.readonly = False
+        self.content = None
+        self.response = None
+        self.cache = None
+        self.coalesce = None
+        self.stream = False
+        self.max_body = None
+        self.timeout = None
+        self.stats = None
+
 
-        async def handler(request):  # pylint: disable=unused-argument
-            return dict(content=data, **kwargs)
+class AdminMethod:  # pylint: disable=too-few-public-methods
+    """Container for a server's built-in route (see Server metrics, profile)"""
 
+    def __init__(self, handler):
         self.handler = handler
-        self.silent = silent
+        self.silent = True
+        self.sample = 1.0
         self.cursor = None
+        self.readonly = False
         self.content = None
         self.response = None
+        self.cache = None
+        self.coalesce = None
+        self.stream = False
+        self.max_body = None
+        self.timeout = None
+        self.stats = None
 
 
 class MarshmallowResponse:
-    """marshmallow managed response"""
+    """ marshmallow managed response
+
+        The handler result is projected onto the schema's fields (see
+        compile_dumper) and encoded with aiomicro.util.jsonify. The result
+        is serialized, not validated.
+    """
 
     def __init__(self, path=None, only=None):
         schema = import_by_path(path)
@@ -80,14 +225,44 @@ class MarshmallowResponse:
             self.schema = schema(only=only.split(","))
         else:
             self.schema = schema()
+        self.dump = compile_dumper(self.schema)
+        self._default = None
+        if not any(callable(field.default)
+                   for field in self.schema.dump_fields.values()):
+            self._default = self({})
 
     def __call__(self, result):
-        return self.schema.load(result, unknown=ma.EXCLUDE)
+        return dict(
+            content=jsonify.dumps(self.dump(result)),
+            content_type="application/json",
+        )
+
+    def stream(self, results):
+        """ stream an async iterator of results as a json array
+
+            Each result is projected and encoded as it arrives; encoded
+            items are sent in chunks of about STREAM_CHUNK bytes.
+        """
+        async def chunks():
+            parts, size, separator = [b"["], 1, b""
+            async for result in results:
+                item = jsonify.dumps(self.dump(result))
+                parts.extend((separator, item))
+                separator = b","
+                size += len(item) + 1
+                if size >= STREAM_CHUNK:
+                    yield b"".join(parts)
+                    parts, size = [], 0
+            parts.append(b"]")
+            yield b"".join(parts)
+        return Stream(chunks(), content_type="application/json")
 
     @property
     def default(self):
         """default value for response"""
-        return self.schema.load({})
+        if self._default is None:
+            return self({})
+        return self._default
 
 
 class StrResponse:  # pylint: disable=too-few-public-methods
@@ -100,6 +275,15 @@ class StrResponse:  # pylint: disable=too-few-public-methods
     def __call__(self, value):
         return dict(content=str(value), **self.kwargs)
 
+    def stream(self, results):
+        """stream an async iterator of results, one chunk for each str"""
+        async def chunks():
+            async for result in results:
+                yield str(result)
+        return Stream(
+            chunks(), content_type=self.kwargs.get(
+                "content_type", "text/plain"))
+
     @property
     def default(self):
         """default value for response"""
@@ -116,6 +300,11 @@ class HtmlResponse:  # pylint: disable=too-few-public-methods
             compress=True,
         )
 
+    @staticmethod
+    def stream(results):
+        """stream an async iterator of html fragments"""
+        return Stream(results, content_type="text/html")
+
 
 class MarshmallowContent:  # pylint: disable=too-few-public-methods
     """Container for marshmallow content definition"""
@@ -129,13 +318,14 @@ class MarshmallowContent:  # pylint: disable=too-few-public-methods
         else:
             self.fields = schema._declared_fields.keys()
             self.schema = schema()
+        self.load = compile_loader(self.schema)
 
     def __call__(self, value):
         if value is None:
             raise HTTPException(400, "Bad Request",
                                 f"expecting fields: {', '.join(self.fields)}")
         try:
-            result = self.schema.load(value)
+            result = self.load(value)
             return {key: result[key] for key in self.fields}  # enforce order
         except ma.exceptions.ValidationError as exc:
             msg = "; ".join([
@@ -166,14 +356,41 @@ def act_database(context, *args, **kwargs):
     context.database[database.connection_name] = database
 
 
-def act_server(context, name, port):
+def act_sampler(context, hz=100, **kwargs):  # pylint: disable=invalid-name
+    """action routine for sampler"""
+    if context.sampler is not None:
+        raise Exception('sampler already defined')
+    context.sampler = Sampler(hz, **kwargs)
+
+
+def act_server(context, name, port, sampler=None, **kwargs):
     """action routine for server"""
     for server in context.servers:
         if name == server.name:
             raise Exception('duplicate server name')
-    server = Server(name, port)
+    if sampler is not None and context.sampler is None:
+        raise Exception('sampler not defined')
+    server = Server(name, port, **kwargs)
+    server.caches = context.caches
     context.server = server
     context.servers.append(server)
+    if server.metrics is not None:
+        async def metrics(request):  # pylint: disable=unused-argument
+            return dict(content=render(server), content_type=CONTENT_TYPE)
+        _admin_route(server, server.metrics.path, metrics)
+    if server.profiler is not None:
+        _admin_route(server, server.profile, server.profiler.handler)
+    if sampler is not None:
+        _admin_route(server, sampler, context.sampler.handler)
+
+
+def _admin_route(server, path, handler):
+    """add a built-in GET route for path to server"""
+    route = Route(f"{re.escape(path)}$")
+    method = route.methods["GET"] = AdminMethod(handler)
+    if server.metrics is not None:
+        method.stats = server.metrics.route(path, "GET")
+    server.routes.append(route)
 
 
 def act_wrap(context, name, path):
@@ -190,9 +407,23 @@ def act_task(context, name, path):
     context.tasks[name] = import_by_path(path)
 
 
-def act_route(context, pattern):
+def act_workers(context, count, task_worker=0):
+    """action routine for workers"""
+    if context.workers is not None:
+        raise Exception('workers already defined')
+    count = int(count)
+    task_worker = int(task_worker)
+    if count < 1:
+        raise Exception('workers must be at least one')
+    if not 0 <= task_worker < count:
+        raise Exception('task_worker must identify a worker')
+    context.workers = count
+    context.task_worker = task_worker
+
+
+def act_route(context, pattern, **kwargs):
     """action routine for route"""
-    route = Route(pattern)
+    route = Route(pattern, **kwargs)
     context.route = route
     context.server.routes.append(route)
 
@@ -221,6 +452,23 @@ def act_content(context, payload_type, **kwargs):
     context.method.content = content
 
 
+def act_cache(context, ttl=60, max=1000,  # pylint: disable=W0622
+              headers=None, name=None):
+    """action routine for cache"""
+    if context.method.cache is not None:
+        raise Exception('cache already defined')
+    if name is None:
+        command = next(
+            key for key, value in context.route.methods.items()
+            if value is context.method)
+        name = f"{command} {context.route.pattern.pattern}"
+    if name in context.caches:
+        raise Exception('duplicate cache name')
+    cache = Cache(name, ttl, max, headers)
+    context.caches[name] = cache
+    context.method.cache = cache
+
+
 def _method(context, command, path, **kwargs):
     """helper for method action routines"""
     if command in context.route.methods:
@@ -232,7 +480,16 @@ def _method(context, command, path, **kwargs):
     if cursor:
         if cursor not in context.database:
             raise Exception('undefined database name')
+        kwargs.setdefault("readonly", context.database[cursor].readonly)
     method = Method(path, **kwargs)
+    _add_method(context, command, method)
+
+
+def _add_method(context, command, method):
+    """add method to the current route"""
+    metrics = getattr(context.server, "metrics", None)
+    if metrics is not None:
+        method.stats = metrics.route(context.route.pattern.pattern, command)
     context.method = method
     context.route.methods[command] = method
 
@@ -240,9 +497,7 @@ def _method(context, command, path, **kwargs):
 def act_get(context, path, **kwargs):
     """action routine for get method"""
     if boolean(kwargs.get("file", False)):
-        method = FileMethod(path, **kwargs)
-        context.method = method
-        context.route.methods["GET"] = method
+        _add_method(context, "GET", FileMethod(path, **kwargs))
     else:
         _method(context, 'GET', path, **kwargs)
 
@@ -288,6 +543,8 @@ STATES = dict(
             database=(act_database, None),
             wrap=(act_wrap, None),
             task=(act_task, None),
+            workers=(act_workers, None),
+            sampler=(act_sampler, None),
             server=(act_server, "SERVER"),
 
         ), SERVER=dict(
@@ -303,6 +560,7 @@ STATES = dict(
             delete=(act_delete, "METHOD"),
 
         ), METHOD=dict(
+            cache=(act_cache, None),
             content=(act_content, None),
             get=(act_get, None),
             patch=(act_patch, None),
@@ -40,6 +40,12 @@ def trace(*args):
 
 def parse(path):
     """parse micro file"""
+    parser = load(path)
+    return parser.database, parser.servers, parser.tasks
+
+
+def load(path):
+    """parse micro file into a Parser"""
     parser = Parser()
     for linenum, line in enumerate(load_lines_from_path(path), start=1):
         line = un_comment(line).strip()
@@ -56,7 +62,9 @@ def parse(path):
             raise ParseError(str(ex), path, linenum) from ex
         if not handled:
             raise UnexpectedDirective(directive, path, linenum)
-    return parser.database, parser.servers, parser.tasks
+    for server in parser.servers:
+        server.compile()
+    return parser
 
 
 class Parser:  # pylint: disable=too-few-public-methods
@@ -65,6 +73,7 @@ class Parser:  # pylint: disable=too-few-public-methods
 
     def __init__(self):
         self.database = {}
+        self.caches = {}  # name -> Cache
         self.groups = {}
         self.wraps = {}
         self.tasks = {}
@@ -72,6 +81,9 @@ class Parser:  # pylint: disable=too-few-public-methods
         self.server = None
         self.route = None
         self.method = None
+        self.workers = None
+        self.task_worker = 0
+        self.sampler = None
 
         self._state = STATES["INIT"]
 
@@ -0,0 +1,65 @@
+"""concurrent handling of pipelined requests on one connection"""
+import asyncio
+from functools import partial
+
+
+class Pipeline:
+    """ run a connection's pipelined requests concurrently
+
+        Parameters:
+            limit - most requests in progress at once; submit waits for a
+                    free slot, so the connection stops reading requests
+
+        Notes:
+            1. Each call is passed a turn, which it awaits before writing
+               its response. A turn is done when the previous request's call
+               has finished, so responses are written in request order.
+            2. cancel stops every request in progress (for instance, when the
+               connection is lost).
+    """
+
+    def __init__(self, limit):
+        self.limit = int(limit)
+        self._slots = asyncio.Semaphore(self.limit)
+        self._last = None  # future done when the latest call finishes
+        self.tasks = set()
+
+    def __len__(self):
+        return len(self.tasks)
+
+    async def submit(self, call):
+        """ start call(turn) as a task
+
+            Return:
+                the task
+        """
+        await self._slots.acquire()
+        turn = self._last
+        done = self._last = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(call(turn))
+        self.tasks.add(task)
+        task.add_done_callback(partial(self._finished, done))
+        return task
+
+    def _finished(self, done, task):
+        """ give the next request its turn, and free the slot
+
+            This is a done callback, rather than a finally in the task, so
+            that it runs even if the task is cancelled before it starts.
+        """
+        self.tasks.discard(task)
+        if not done.done():
+            done.set_result(None)
+        self._slots.release()
+
+    async def wait(self):
+        """wait for the requests in progress to finish"""
+        if self.tasks:
+            await asyncio.wait(set(self.tasks))
+
+    def cancel(self):
+        """cancel the requests in progress (except the caller)"""
+        current = asyncio.current_task()
+        for task in self.tasks:
+            if task is not current:
+                task.cancel()
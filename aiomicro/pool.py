@@ -0,0 +1,345 @@
+"""database connection pool"""
+import asyncio
+import collections
+import logging
+import time
+import traceback
+
+
+log = logging.getLogger(__name__)
+
+
+STACK_LIMIT = 12  # frames kept for a checkout site
+EXHAUSTED_INTERVAL = 10.0  # seconds between "pool exhausted" warnings
+
+
+class _Connection:  # pylint: disable=too-few-public-methods
+    """pool bookkeeping for one database cursor"""
+
+    __slots__ = ("cursor", "created", "used", "checkout", "site", "reported")
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.created = self.used = self.checkout = time.monotonic()
+        self.site = None
+        self.reported = False
+
+    def held(self, now):
+        """leak report for a checked out connection"""
+        site = "".join(traceback.format_list(self.site)) if self.site else (
+            "(set leak_timeout to record checkout sites)")
+        return dict(age=now - self.checkout, site=site)
+
+
+class PooledCursor:
+    """ cursor proxy which returns its connection to the pool on close
+
+        All attributes, other than close and discard, are those of the
+        underlying cursor.
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise Exception("cursor is closed")
+        return getattr(self._connection.cursor, name)
+
+    @property
+    def is_closed(self):
+        """True if the cursor has been returned to the pool"""
+        return self._connection is None
+
+    async def close(self):
+        """return the connection to the pool"""
+        connection, self._connection = self._connection, None
+        if connection:
+            await self._pool.release(connection)
+
+    async def discard(self):
+        """close the connection instead of returning it to the pool"""
+        connection, self._connection = self._connection, None
+        if connection:
+            await self._pool.destroy(connection, in_use=True)
+
+
+class Pool:  # pylint: disable=too-many-instance-attributes
+    """ pool of database cursors with min/max sizing and idle reaping
+
+        Parameters:
+            connector    - coroutine function returning a new cursor
+            min_size     - connections kept open, even when idle
+            max_size     - most connections open at once (See Note 1)
+            max_idle     - seconds an idle connection is kept (above min_size)
+            max_lifetime - seconds after which a connection is closed
+            ping         - if True, check each idle connection on checkout
+                           with ping_query, and replace it if it fails
+            leak_timeout - seconds a connection can be checked out before it
+                           is logged as a possible leak (See Note 3)
+
+        Notes:
+            1. A checkout when max_size connections are in use waits until
+               a connection is returned.
+            2. The metrics property has counts and timings for the pool.
+            3. With leak_timeout, each checkout records the stack of its
+               caller (its site). The reaper logs a warning, with the site,
+               for each connection held longer than leak_timeout, and a
+               checkout which has to wait logs the longest held connections.
+               The leaks method lists them on demand.
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 connector, min_size=0, max_size=10, max_idle=None,
+                 max_lifetime=None, ping=False, ping_query="SELECT 1",
+                 leak_timeout=None):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError("invalid pool size")
+        self.connector = connector
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.ping = ping
+        self.ping_query = ping_query
+        self.leak_timeout = leak_timeout
+
+        self._idle = collections.deque()
+        self._checked_out = set()
+        self._exhausted_at = None
+        self._size = 0  # open (or opening) connections
+        self._in_use = 0
+        self._waiting = 0
+        self._cond = asyncio.Condition()
+        self._reaper = None
+        self.counters = dict(
+            checkouts=0, created=0, destroyed=0, waits=0, failed_pings=0,
+            leaks=0)
+        self.wait_time = 0.0
+        self.wait_max = 0.0
+
+    @classmethod
+    async def setup(cls, connector, **kwargs):
+        """create pool, open min_size connections and start the reaper"""
+        pool = cls(connector, **kwargs)
+        await pool.fill()
+        if pool.max_idle or pool.max_lifetime or pool.leak_timeout:
+            pool._reaper = asyncio.create_task(pool.reap())
+        return pool
+
+    @property
+    def metrics(self):
+        """pool gauges and counters"""
+        now = time.monotonic()
+        return dict(
+            size=self._size,
+            idle=len(self._idle),
+            in_use=self._in_use,
+            waiting=self._waiting,
+            wait_time=self.wait_time,
+            wait_max=self.wait_max,
+            held_max=max((
+                now - connection.checkout
+                for connection in self._checked_out), default=0.0),
+            **self.counters)
+
+    def leaks(self, age=None):
+        """ checked out connections held longer than age seconds
+
+            Return:
+                list of dict(age, site), longest held first; age defaults to
+                leak_timeout (or 0)
+        """
+        if age is None:
+            age = self.leak_timeout or 0
+        now = time.monotonic()
+        held = sorted(
+            (connection for connection in self._checked_out
+             if now - connection.checkout >= age),
+            key=lambda connection: connection.checkout)
+        return [connection.held(now) for connection in held]
+
+    def _log_exhausted(self):
+        """warn (occasionally) that checkouts are waiting"""
+        now = time.monotonic()
+        if self._exhausted_at and (
+                now - self._exhausted_at < EXHAUSTED_INTERVAL):
+            return
+        self._exhausted_at = now
+        held = self.leaks(0)[:3]
+        log.warning(
+            "pool exhausted: size=%s in_use=%s waiting=%s; longest held:%s",
+            self._size, self._in_use, self._waiting + 1, "".join(
+                f"\n  {item['age']:.3f}s from\n{item['site']}"
+                for item in held))
+
+    async def _create(self):
+        """open a new connection in an already reserved slot"""
+        try:
+            cursor = await self.connector()
+        except BaseException:
+            async with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.counters["created"] += 1
+        return _Connection(cursor)
+
+    def _is_expired(self, connection, now):
+        if self.max_lifetime and now - connection.created > self.max_lifetime:
+            return True
+        return False
+
+    async def _is_alive(self, connection):
+        try:
+            await connection.cursor.execute(self.ping_query)
+        except Exception:  # pylint: disable=broad-except
+            self.counters["failed_pings"] += 1
+            log.warning("pooled connection failed ping; replacing")
+            return False
+        return True
+
+    async def cursor(self):
+        """check out a cursor (close it to return it to the pool)"""
+        start = time.perf_counter()
+        while True:
+            async with self._cond:
+                if not self._idle and self._size >= self.max_size:
+                    self.counters["waits"] += 1
+                    if self.leak_timeout:
+                        self._log_exhausted()
+                    self._waiting += 1
+                    try:
+                        while not self._idle and self._size >= self.max_size:
+                            await self._cond.wait()
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    connection = self._idle.pop()  # most recently used
+                else:
+                    connection = None
+                    self._size += 1
+                self._in_use += 1
+
+            try:
+                if connection is None:
+                    connection = await self._create()
+                elif self._is_expired(connection, time.monotonic()) or (
+                        self.ping and not await self._is_alive(connection)):
+                    await self.destroy(connection, in_use=True)
+                    continue
+            except BaseException:
+                if connection is None:
+                    self._in_use -= 1
+                else:
+                    await self.destroy(connection, in_use=True)
+                raise
+            break
+
+        elapsed = time.perf_counter() - start
+        self.counters["checkouts"] += 1
+        self.wait_time += elapsed
+        self.wait_max = max(self.wait_max, elapsed)
+        connection.checkout = time.monotonic()
+        connection.reported = False
+        if self.leak_timeout:
+            connection.site = traceback.extract_stack(limit=STACK_LIMIT)[:-1]
+        self._checked_out.add(connection)
+        return PooledCursor(self, connection)
+
+    async def release(self, connection):
+        """return a checked out connection to the pool"""
+        now = time.monotonic()
+        if self._is_expired(connection, now):
+            await self.destroy(connection, in_use=True)
+            return
+        connection.used = now
+        connection.site = None
+        async with self._cond:
+            self._checked_out.discard(connection)
+            self._in_use -= 1
+            self._idle.append(connection)
+            self._cond.notify()
+
+    async def destroy(self, connection, in_use=False):
+        """close a connection and free its slot"""
+        async with self._cond:
+            self._size -= 1
+            if in_use:
+                self._checked_out.discard(connection)
+                self._in_use -= 1
+            self._cond.notify()
+        self.counters["destroyed"] += 1
+        try:
+            await connection.cursor.close()
+        except Exception:  # pylint: disable=broad-except
+            log.exception("error closing pooled connection")
+
+    async def fill(self):
+        """open connections until there are at least min_size"""
+        while self._size < self.min_size:
+            async with self._cond:
+                self._size += 1
+            connection = await self._create()
+            async with self._cond:
+                self._idle.append(connection)
+                self._cond.notify()
+
+    async def reap(self):
+        """periodically close idle and expired connections"""
+        interval = min(
+            value for value in (
+                self.max_idle, self.max_lifetime, self.leak_timeout)
+            if value)
+        while True:
+            await asyncio.sleep(interval / 2)
+            await self.reap_once()
+
+    def report_leaks(self):
+        """log each connection newly held longer than leak_timeout"""
+        now = time.monotonic()
+        for connection in list(self._checked_out):
+            if not connection.reported and (
+                    now - connection.checkout > self.leak_timeout):
+                connection.reported = True
+                self.counters["leaks"] += 1
+                item = connection.held(now)
+                log.warning(
+                    "pooled connection held %.3fs; checked out from\n%s",
+                    item["age"], item["site"])
+
+    async def reap_once(self):
+        """close idle and expired connections, then refill to min_size"""
+        if self.leak_timeout:
+            self.report_leaks()
+        now = time.monotonic()
+        expired = []
+        async with self._cond:
+            keep = collections.deque()
+            excess = self._size - self.min_size
+            for connection in self._idle:  # oldest use first
+                if self._is_expired(connection, now) or (
+                        excess > 0 and self.max_idle and
+                        now - connection.used > self.max_idle):
+                    expired.append(connection)
+                    excess -= 1
+                else:
+                    keep.append(connection)
+            self._idle = keep
+        for connection in expired:
+            await self.destroy(connection)
+        try:
+            await self.fill()
+        except Exception:  # pylint: disable=broad-except
+            log.exception("unable to refill pool")
+
+    async def close(self):
+        """stop the reaper and close idle connections"""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        async with self._cond:
+            idle, self._idle = self._idle, collections.deque()
+        for connection in idle:
+            await self.destroy(connection)
@@ -0,0 +1,123 @@
+"""on-demand profiling of individual requests"""
+import cProfile
+from collections import deque
+import hmac
+import io
+import ipaddress
+import pstats
+import random
+import time
+
+from aiohttp import HTTPException
+
+
+HEADER = "x-aiomicro-profile"  # request header which carries the secret
+
+
+def is_local(peer):
+    """ True if peer (a socket's peername) is a loopback address
+
+        A missing or empty peer (for instance, a unix socket's) is not
+        local.
+    """
+    if not peer or isinstance(peer, (str, bytes)):
+        return False
+    try:
+        return ipaddress.ip_address(peer[0]).is_loopback
+    except ValueError:
+        return False
+
+
+def has_secret(request, secret):
+    """True if request's HEADER matches secret (compared in constant time)"""
+    value = request.http_headers.get(HEADER)
+    if value is None:
+        return False
+    return hmac.compare_digest(value.encode(), secret.encode())
+
+
+def is_allowed(request, secret=None):
+    """ True if request may read an admin route
+
+        The client must be local and, if secret is set, send it in HEADER.
+    """
+    if not is_local(getattr(request, "peer", None)):
+        return False
+    return secret is None or has_secret(request, secret)
+
+
+class RequestProfiler:
+    """ profile selected requests with cProfile
+
+        Parameters:
+            rate   - fraction of requests profiled
+            secret - a request with the header HEADER set to secret is
+                     profiled
+            size   - most profiles kept; older profiles are dropped
+            top    - functions listed in each profile's report
+
+        Notes:
+            1. Only one request (in the process) is profiled at a time; a
+               request selected while another is profiled is not profiled.
+            2. cProfile profiles the thread, not the task, so the work of
+               other requests which runs while a profiled request waits
+               appears in its profile.
+            3. A report lists the top functions by cumulative time.
+    """
+
+    active = None  # profile in progress, shared by every server
+
+    def __init__(self, rate=0.0, secret=None, size=32, top=40):
+        self.rate = float(rate)
+        self.secret = secret
+        self.top = int(top)
+        self.profiles = deque(maxlen=int(size))
+
+    def wants(self, request):
+        """True if request is profiled"""
+        if RequestProfiler.active is not None:
+            return False
+        if self.secret is not None and has_secret(request, self.secret):
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+    def start(self):
+        """start profiling, returning the profile (see stop)"""
+        profile = RequestProfiler.active = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile,  # pylint: disable=too-many-arguments
+             cid, rid, method, resource, elapsed):
+        """stop profile and keep its stats"""
+        profile.disable()
+        RequestProfiler.active = None
+        self.profiles.append(dict(
+            time=time.time(), cid=cid, rid=rid, method=method,
+            resource=resource, elapsed=elapsed,
+            stats=pstats.Stats(profile)))
+
+    def report(self):
+        """text of the kept profiles, newest first"""
+        out = io.StringIO()
+        for profile in reversed(self.profiles):
+            when = time.strftime(
+                "%Y-%m-%dT%H:%M:%S", time.localtime(profile["time"]))
+            out.write(
+                f"=== {when} cid={profile['cid']} rid={profile['rid']}"
+                f" {profile['method']} {profile['resource']}"
+                f" t={profile['elapsed']:f}\n")
+            stats = profile["stats"]
+            stats.stream = out
+            stats.sort_stats("cumulative").print_stats(self.top)
+        return out.getvalue()
+
+    async def handler(self, request):
+        """ admin route handler: the report, for local clients only
+
+            If secret is set, the request must also send it. Other clients
+            get a 404.
+        """
+        if not is_allowed(request, self.secret):
+            raise HTTPException(404, "Not Found")
+        return dict(content=self.report(), content_type="text/plain")
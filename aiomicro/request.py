@@ -0,0 +1,220 @@
+"""http request head parsing and streamed request bodies"""
+import asyncio
+from urllib.parse import parse_qsl
+
+from aiohttp import HTTPException
+
+
+CHUNK = 1 << 16  # most bytes returned by one Body iteration
+END_OF_HEAD = b"\r\n\r\n"
+
+
+def remaining(request):
+    """seconds left before request's deadline (None if it has no timeout)"""
+    deadline = getattr(request, "deadline", None)
+    if deadline is None:
+        return None
+    return max(0.0, deadline - asyncio.get_running_loop().time())
+
+
+class Head:  # pylint: disable=too-many-instance-attributes
+    """ request line and headers of an http request
+
+        Parameters:
+            data - bytes of the head, through the blank line
+
+        Notes:
+            1. Header names are lower case. Repeated headers are joined with
+               ", ".
+            2. HTTPException(400) is raised for a malformed head.
+    """
+
+    def __init__(self, data):
+        self.data = data
+        lines = data.decode("latin-1").split("\r\n")
+        try:
+            self.method, self.target, self.version = lines[0].split(" ")
+        except ValueError as exc:
+            raise HTTPException(
+                400, "Bad Request", "malformed request line") from exc
+        self.path, _, self.query = self.target.partition("?")
+
+        headers = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(":")
+            if not sep:
+                raise HTTPException(
+                    400, "Bad Request", "malformed header")
+            name = name.strip().lower()
+            value = value.strip()
+            if name in headers:
+                value = f"{headers[name]}, {value}"
+            headers[name] = value
+        self.headers = headers
+
+    @property
+    def is_chunked(self):
+        """True if the body uses chunked transfer-encoding"""
+        return "chunked" in self.headers.get(
+            "transfer-encoding", "").lower()
+
+    @property
+    def content_length(self):
+        """length of the body from the content-length header (default 0)"""
+        value = self.headers.get("content-length", "0")
+        try:
+            length = int(value)
+        except ValueError:
+            length = -1
+        if length < 0:
+            raise HTTPException(400, "Bad Request", "invalid content-length")
+        return length
+
+    @property
+    def is_keep_alive(self):
+        """True if the connection stays open after this request"""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return connection == "keep-alive"
+        return connection != "close"
+
+
+async def read_head(reader):
+    """ read a request head from reader
+
+        Return:
+            Head, or None if the connection closed before a request started
+
+        Notes:
+            1. Empty lines before a request line are ignored.
+            2. A head longer than the reader's limit gets a 431.
+    """
+    try:
+        data = await reader.readuntil(END_OF_HEAD)
+    except asyncio.IncompleteReadError as exc:
+        if not exc.partial.strip():
+            return None
+        raise HTTPException(
+            400, "Bad Request", "incomplete request head") from exc
+    except asyncio.LimitOverrunError as exc:
+        raise HTTPException(431, "Request Header Fields Too Large") from exc
+    return Head(data.lstrip(b"\r\n"))
+
+
+class Replay:
+    """ a StreamReader which returns data already read before reading more
+
+        This lets a request head that was read to route the request be
+        parsed again by a parser which reads from a StreamReader.
+    """
+
+    def __init__(self, data, reader):
+        self._data = data
+        self._reader = reader
+
+    def replay(self, data):
+        """return data before anything not yet read"""
+        self._data = data + self._data
+
+    def __getattr__(self, name):
+        return getattr(self._reader, name)
+
+    def _take(self, size):
+        data, self._data = self._data[:size], self._data[size:]
+        return data
+
+    def at_eof(self):
+        """True if there is no more data"""
+        return not self._data and self._reader.at_eof()
+
+    async def readuntil(self, separator=b"\n"):
+        """read through separator"""
+        if self._data:
+            index = self._data.find(separator)
+            if index >= 0:
+                return self._take(index + len(separator))
+            data = self._take(len(self._data))
+            return data + await self._reader.readuntil(separator)
+        return await self._reader.readuntil(separator)
+
+    async def readline(self):
+        """read through a newline"""
+        if self._data:
+            return await self.readuntil(b"\n")
+        return await self._reader.readline()
+
+    async def readexactly(self, size):
+        """read size bytes"""
+        data = self._take(size)
+        if len(data) < size:
+            data += await self._reader.readexactly(size - len(data))
+        return data
+
+    async def read(self, size=-1):
+        """read up to size bytes (or to eof if size is negative)"""
+        if not self._data:
+            return await self._reader.read(size)
+        if size < 0:
+            return self._take(len(self._data)) + await self._reader.read()
+        return self._take(size)
+
+
+class Body:
+    """ async iterator over a request body of known length
+
+        Parameters:
+            reader - StreamReader positioned at the start of the body
+            length - bytes in the body (from content-length)
+            on_start - optional callable, called before the first read
+                       (used to send 100 Continue)
+    """
+
+    def __init__(self, reader, length, on_start=None):
+        self.reader = reader
+        self.length = length
+        self.remaining = length
+        self._on_start = on_start
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.remaining:
+            raise StopAsyncIteration
+        if self._on_start:
+            self._on_start()
+            self._on_start = None
+        data = await self.reader.read(min(self.remaining, CHUNK))
+        if not data:
+            raise HTTPException(400, "Bad Request", "incomplete body")
+        self.remaining -= len(data)
+        return data
+
+    @property
+    def is_complete(self):
+        """True if the whole body has been read"""
+        return not self.remaining
+
+    async def read(self):
+        """read the rest of the body"""
+        return b"".join([chunk async for chunk in self])
+
+
+class StreamRequest:  # pylint: disable=too-few-public-methods
+    """ request for a method with stream=true
+
+        The body is not read before the handler is called: request.body is a
+        Body. The content is the query string.
+    """
+
+    def __init__(self, head, body):
+        self.http_method = head.method
+        self.http_resource = head.path
+        self.http_query_string = head.query
+        self.http_headers = head.headers
+        self.http_version = head.version
+        self.is_keep_alive = head.is_keep_alive
+        self.content = dict(parse_qsl(head.query)) if head.query else None
+        self.body = body
@@ -0,0 +1,164 @@
+"""http response formatting"""
+import asyncio
+from http import HTTPStatus
+
+
+def format_head(code=200, message=None, headers=None):
+    """ format an http/1.1 status line and headers as bytes
+
+        Parameters:
+            code    - http status code
+            message - reason phrase (default is the standard phrase for code)
+            headers - dict of header name to value
+    """
+    if message is None:
+        message = HTTPStatus(code).phrase
+    lines = [f"HTTP/1.1 {code} {message}"]
+    if headers:
+        lines.extend(f"{key}: {value}" for key, value in headers.items())
+    lines.append("\r\n")
+    return "\r\n".join(lines).encode("latin-1")
+
+
+class Prepared:  # pylint: disable=too-few-public-methods
+    """ a response which is already formatted as bytes
+
+        A handler (or response) can return a Prepared instance to bypass
+        response formatting.
+    """
+
+    __slots__ = ("head", "body")
+
+    def __init__(self, head, body=b""):
+        self.head = head
+        self.body = body
+
+    async def write(self, writer):
+        """ write response to a StreamWriter
+
+            The head and body are passed to the transport separately (the
+            body as a memoryview), rather than joined into a new string.
+        """
+        if self.body:
+            writer.writelines((self.head, memoryview(self.body)))
+        else:
+            writer.write(self.head)
+
+
+_SIMPLE = frozenset(("content", "content_type"))
+_HEAD = b"HTTP/1.1 200 OK\r\nContent-Type: %s\r\nContent-Length: %d\r\n\r\n"
+
+
+def prepare(response):
+    """ Prepared for a simple response, or None
+
+        A dict with content (bytes, or str, which is utf-8 encoded) and
+        content_type, and no other keys, is formatted here; anything else
+        is left for format_server.
+    """
+    if type(response) is not dict or (  # pylint: disable=unidiomatic-typecheck
+            "content_type" not in response or response.keys() - _SIMPLE):
+        return None
+    content = response.get("content") or b""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    elif not isinstance(content, (bytes, bytearray)):
+        return None
+    content_type = response["content_type"].encode("latin-1")
+    return Prepared(_HEAD % (content_type, len(content)), content)
+
+
+class SendFile(Prepared):  # pylint: disable=too-few-public-methods
+    """ a response whose body is sent from a file with loop.sendfile
+
+        The file is opened for each response, so concurrent responses do not
+        share a file position.
+    """
+
+    __slots__ = ("path", "size")
+
+    def __init__(self, head, path, size):
+        super().__init__(head)
+        self.path = path
+        self.size = size
+
+    async def write(self, writer):
+        writer.write(self.head)
+        with open(self.path, "rb") as body:
+            await asyncio.get_running_loop().sendfile(
+                writer.transport, body, 0, self.size)
+
+
+class Stream(Prepared):  # pylint: disable=too-few-public-methods
+    """ a response whose body is sent from an async iterator
+
+        The body is sent with chunked transfer-encoding, one chunk for each
+        (non-empty) item from the iterator; str items are utf-8 encoded.
+        The writer is drained after each chunk, so a slow client slows the
+        iterator instead of filling memory.
+
+        A handler can return a Stream to set the content type, headers or
+        status code; an async iterator returned by a handler is sent as a
+        Stream with the defaults.
+    """
+
+    __slots__ = ("chunks",)
+
+    def __init__(self, chunks, content_type="application/octet-stream",
+                 headers=None, code=200):
+        headers = {"Content-Type": content_type, **(headers or {})}
+        headers["Transfer-Encoding"] = "chunked"
+        super().__init__(format_head(code, headers=headers))
+        self.chunks = chunks
+
+    async def write(self, writer):
+        writer.write(self.head)
+        try:
+            async for chunk in self.chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                if chunk:
+                    writer.writelines((b"%x\r\n" % len(chunk), chunk, b"\r\n"))
+                    await writer.drain()
+        finally:
+            close = getattr(self.chunks, "aclose", None)
+            if close is not None:
+                await close()
+        writer.write(b"0\r\n\r\n")
+
+
+def is_stream(value):
+    """True if value is sent as a Stream"""
+    return isinstance(value, Stream) or hasattr(value, "__aiter__")
+
+
+if __name__ == '__main__':
+    import time
+    import tracemalloc
+
+    class _Discard:
+        """writer which counts and drops data"""
+        size = 0
+
+        def write(self, data):
+            self.size += len(data)
+
+        def writelines(self, data):
+            for item in data:
+                self.write(item)
+
+        async def drain(self):
+            pass
+
+    async def _export(count, chunk=b"x" * (1 << 16)):
+        for _ in range(count):
+            yield chunk
+
+    WRITER = _Discard()
+    tracemalloc.start()
+    START = time.perf_counter()
+    asyncio.run(Stream(_export(1 << 14)).write(WRITER))
+    ELAPSED = time.perf_counter() - START
+    _, PEAK = tracemalloc.get_traced_memory()
+    print(f"streamed {WRITER.size / (1 << 30):.2f}GB in {ELAPSED:.2f}s,"
+          f" peak traced memory {PEAK / 1024:.0f}KB")
@@ -1,8 +1,15 @@
 """rest/http"""
-import re
+import logging
+import time
 
 from aiohttp import HTTPException
 
+from aiomicro.cache import MISS, make_key
+from aiomicro.dispatch import Dispatcher
+from aiomicro.response import is_stream
+
+
+log = logging.getLogger(__package__)
 
 class _Response:  # pylint: disable=too-few-public-methods
 
@@ -14,42 +21,115 @@ class _Response:  # pylint: disable=too-few-public-methods
             response = result
         elif result is None:
             response = self.response.default
+        elif hasattr(result, "__aiter__"):
+            response = self.response.stream(result)
         else:
             response = self.response(result)
         return response
 
 
+class _Unshared(Exception):
+    """a coalesced call's result which can't be shared (a stream)"""
+
+    def __init__(self, match, response):
+        super().__init__()
+        self.match = match  # the _Match which called the handler
+        self.response = response
+
+
 class _Match:  # pylint: disable=too-few-public-methods
 
-    def __init__(self, method, args, kwargs):
+    def __init__(self, method, args, kwargs, limiter=None):
         self.args = args
+        self.limiter = limiter
         self.kwargs = kwargs
         self.handler = method.handler
         self.silent = method.silent
+        self.sample = method.sample
         self.cursor = method.cursor
+        self.readonly = method.readonly
+        self.timeout = method.timeout
         self.response = _Response(method.response)
+        self.cache = method.cache
+        self.coalesce = method.coalesce
+        self.stats = method.stats
+        self.handler_time = 0.0  # seconds in handler
+        self.serialize_time = 0.0  # seconds formatting the response
+
+    async def _call(self, request):
+        start = time.perf_counter()
+        result = await self.handler(request, *self.args, **self.kwargs)
+        handled = time.perf_counter()
+        try:
+            response = self.response(result)
+        except (TypeError, ValueError) as exc:  # a value can't be serialized
+            log.exception("unable to serialize response")
+            raise HTTPException(500, "Internal Server Error") from exc
+        self.handler_time = handled - start
+        self.serialize_time = time.perf_counter() - handled
+        return response
+
+    async def _call_shared(self, request):
+        response = await self._call(request)
+        if is_stream(response):  # consumed by one caller
+            raise _Unshared(self, response)
+        return response
 
     async def __call__(self, request):
-        result = await self.handler(request, *self.args, **self.kwargs)
-        return self.response(result)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(request, self.args, self.kwargs)
+            if key is not None:
+                result = self.cache.get(key)
+                if result is not MISS:
+                    return _copy(result)
+
+        flight = None
+        if self.coalesce is not None:
+            flight = make_key(self.args, self.kwargs)
+        if flight is not None:
+            try:
+                result = await self.coalesce(
+                    flight, lambda: self._call_shared(request))
+            except _Unshared as exc:  # followers call the handler themselves
+                if exc.match is self:
+                    result = exc.response
+                else:
+                    result = await self._call(request)
+        else:
+            result = await self._call(request)
+
+        if key is not None and not is_stream(result):
+            self.cache.put(key, _copy(result))
+        return result
+
+
+def _copy(result):
+    """ a cached result, which the caller can change without changing the
+        cache (a dict is copied; its values, and other results, are shared)
+    """
+    if type(result) is dict:  # pylint: disable=unidiomatic-typecheck
+        return dict(result)
+    return result
 
 
 def match(routes, request):
-    """match http resource and method against server routes"""
+    """match http resource and method against server routes
 
-    route = None
-    for route in routes:
-        resource = re.match(route.pattern, request.http_resource)
-        if resource:
-            break
+       routes is a Dispatcher (see Server.dispatch); a list of Route is
+       accepted, but is compiled on every call.
+    """
+    if not isinstance(routes, Dispatcher):
+        routes = Dispatcher(routes)
+    route, groups = routes.lookup(request.http_resource)
 
-    if resource:
+    if route:
         method = route.methods.get(request.http_method)
         if method:
 
             # normalize args (from url) and content
             if route.args:
-                args = route.args(resource.groups())
+                args = route.args(groups)
             else:
                 args = []
             if method.content:
@@ -57,6 +137,6 @@ def match(routes, request):
             else:
                 kwargs = {}
 
-            return _Match(method, args, kwargs)
+            return _Match(method, args, kwargs, route.limiter)
 
     raise HTTPException(404, 'Not Found')
@@ -0,0 +1,154 @@
+"""statistical stack sampler with folded (flamegraph) output"""
+from collections import Counter
+import logging
+import os
+import sys
+import tempfile
+import threading
+
+from aiohttp import HTTPException
+
+from aiomicro.profiling import is_allowed
+
+
+log = logging.getLogger(__name__)
+
+
+class Sampler:
+    """ sample a thread's stack from a background thread
+
+        Parameters:
+            hz        - samples per second
+            dump      - path written by dump; "{pid}" is replaced by the
+                        process id (default is aiomicro-{pid}.folded in the
+                        temp directory)
+            max_depth - most frames kept from each stack (the innermost)
+            secret    - if set, a request for the samples must send it in
+                        the header profiling.HEADER
+
+        Notes:
+            1. Samples are aggregated by stack, so memory grows with the
+               number of distinct stacks, not the number of samples.
+            2. folded returns the stacks in the "folded" format read by
+               flamegraph.pl and speedscope: one line per stack, outermost
+               frame first, frames separated by ";", then a space and the
+               number of samples.
+            3. The sampled thread is the one which calls start (normally
+               the thread running the event loop).
+    """
+
+    def __init__(self, hz=100, dump=None, max_depth=64, secret=None):
+        self.hz = float(hz)  # pylint: disable=invalid-name
+        if self.hz <= 0:
+            raise ValueError("hz must be positive")
+        self.path = dump or os.path.join(
+            tempfile.gettempdir(), "aiomicro-{pid}.folded")
+        self.max_depth = int(max_depth)
+        self.secret = secret
+        self.stacks = Counter()
+        self.samples = 0
+        self.thread_id = None
+        self._labels = {}  # code object -> frame label
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        """True if the sampling thread is running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id=None):
+        """start sampling thread_id (default is the calling thread)"""
+        if self.is_running:
+            return
+        self.thread_id = thread_id or threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """stop sampling"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        interval = 1 / self.hz
+        while not self._stop.wait(interval):
+            self.sample()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = (
+                f"{name} ({code.co_filename}:{code.co_firstlineno})")
+        return label
+
+    def sample(self):
+        """record the sampled thread's current stack"""
+        frame = sys._current_frames().get(  # pylint: disable=protected-access
+            self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        stack.reverse()
+        self.stacks[";".join(stack)] += 1
+        self.samples += 1
+
+    def clear(self):
+        """discard the samples taken so far"""
+        self.stacks = Counter()
+        self.samples = 0
+
+    def folded(self):
+        """the samples in folded format"""
+        return "".join(
+            f"{stack} {count}\n"
+            for stack, count in sorted(dict(self.stacks).items()))
+
+    def dump(self):
+        """write folded samples to the dump path, returning the path"""
+        path = self.path.format(pid=os.getpid())
+        with open(path, "w", encoding="utf-8") as out:
+            out.write(self.folded())
+        log.info("wrote %s stack samples to %s", self.samples, path)
+        return path
+
+    async def handler(self, request):
+        """ admin route handler: folded samples, for local clients only
+
+            If secret is set, the request must also send it. Other clients
+            get a 404.
+        """
+        if not is_allowed(request, self.secret):
+            raise HTTPException(404, "Not Found")
+        return dict(content=self.folded(), content_type="text/plain")
+
+
+if __name__ == '__main__':
+    import time
+    import timeit
+
+    SAMPLER = Sampler()
+    SAMPLER.thread_id = threading.get_ident()
+    COUNT = 10000
+    ELAPSED = min(timeit.repeat(SAMPLER.sample, number=COUNT, repeat=3))
+    COST = ELAPSED / COUNT
+    print(f"sample: {COST * 1e6:.1f}us"
+          f" ({COST * 100 * 100:.3f}% of a thread at 100hz)")
+
+    def _busy(until):
+        while time.perf_counter() < until:
+            pass
+
+    SAMPLER.clear()
+    SAMPLER.start()
+    _busy(time.perf_counter() + 0.5)
+    SAMPLER.stop()
+    print(SAMPLER.folded())
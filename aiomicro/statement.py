@@ -0,0 +1,156 @@
+"""sql statements with named parameters"""
+from collections import OrderedDict
+import datetime
+import decimal
+import re
+
+
+_PARAM = re.compile(r"%\((\w+)\)s|%%")
+_ESCAPE = str.maketrans({
+    "\0": "\\0",
+    "\n": "\\n",
+    "\r": "\\r",
+    "\x1a": "\\Z",
+    "\\": "\\\\",
+    "'": "\\'",
+    '"': '\\"',
+})
+_UTC = datetime.timezone.utc
+_DAY = datetime.date(2000, 1, 1)  # to convert a time with a tzinfo to UTC
+
+
+def escape(value):
+    """ render a python value as a mysql literal
+
+        Notes:
+
+            1. Strings are escaped with backslashes, which assumes that the
+               session is not running with NO_BACKSLASH_ESCAPES (the mysql
+               connector removes it from sql_mode at connect).
+
+            2. A list, tuple or set is rendered as a parenthesized,
+               comma-separated list, for use with IN.
+
+            3. A datetime (or time) with a tzinfo is converted to UTC, since
+               mysql DATETIME literals don't accept an offset (the mysql
+               connector sets the session's time_zone to UTC at connect).
+    """
+    if value is None:
+        return "NULL"
+    if value is True or value is False:
+        return "1" if value else "0"
+    if isinstance(value, (int, decimal.Decimal)):
+        return str(value)
+    if isinstance(value, float):
+        if value != value or value in (float("inf"), float("-inf")):
+            raise ValueError(f"invalid float parameter: {value}")
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.translate(_ESCAPE) + "'"
+    if isinstance(value, (bytes, bytearray)):
+        return "X'" + value.hex() + "'"
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(_UTC).replace(tzinfo=None)
+        return "'" + value.isoformat(" ") + "'"
+    if isinstance(value, datetime.time) and value.tzinfo is not None:
+        value = datetime.datetime.combine(_DAY, value).astimezone(_UTC)
+        return "'" + value.time().isoformat() + "'"
+    if isinstance(value, (datetime.date, datetime.time)):
+        return "'" + value.isoformat() + "'"
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return "(" + ",".join(escape(item) for item in value) + ")"
+    raise TypeError(f"unsupported parameter type: {type(value).__name__}")
+
+
+class Statement:  # pylint: disable=too-few-public-methods
+    """ a query split into literal text and named parameters
+
+        Parameters are specified as %(name)s; a literal % is written as %%.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.parts = []
+        self.names = []
+        text = []
+        pos = 0
+        for match in _PARAM.finditer(query):
+            text.append(query[pos:match.start()])
+            pos = match.end()
+            if match.group(1) is None:
+                text.append("%")
+            else:
+                self.parts.append("".join(text))
+                self.names.append(match.group(1))
+                text = []
+        text.append(query[pos:])
+        self.parts.append("".join(text))
+
+    def bind(self, kwargs):
+        """return the query text with parameters replaced by literals"""
+        result = [self.parts[0]]
+        for name, part in zip(self.names, self.parts[1:]):
+            try:
+                value = kwargs[name]
+            except KeyError:
+                raise ValueError(f"missing query parameter: {name}") from None
+            result.append(escape(value))
+            result.append(part)
+        return "".join(result)
+
+
+class StatementCache:
+    """ least-recently-used cache of parsed Statements
+
+        Parameters:
+            size     - maximum number of Statements held
+            counters - optional collections.Counter which is updated with
+                       "hit", "miss" and "evict" counts (See Note 1)
+
+        Notes:
+            1. counters can be shared by many caches (eg, one cache per
+               pooled connection) to provide totals for a database.
+    """
+
+    def __init__(self, size=100, counters=None):
+        self.size = size
+        self.counters = counters if counters is not None else {}
+        self._statements = OrderedDict()
+
+    def __len__(self):
+        return len(self._statements)
+
+    def _count(self, key):
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def get(self, query):
+        """return the Statement for query"""
+        statement = self._statements.get(query)
+        if statement is not None:
+            self._statements.move_to_end(query)
+            self._count("hit")
+            return statement
+        self._count("miss")
+        statement = Statement(query)
+        if self.size > 0:
+            self._statements[query] = statement
+            if len(self._statements) > self.size:
+                self._statements.popitem(last=False)
+                self._count("evict")
+        return statement
+
+
+if __name__ == '__main__':
+    import timeit
+
+    QUERY = ("SELECT id, name, email FROM user"
+             " WHERE id = %(id)s AND name LIKE %(name)s AND active = 1")
+    PARAMS = dict(id=123, name="b%")
+    CACHE = StatementCache()
+    for label, test in (
+            ("parse+bind", lambda: Statement(QUERY).bind(PARAMS)),
+            ("cache+bind", lambda: CACHE.get(QUERY).bind(PARAMS))):
+        elapsed = min(timeit.repeat(test, number=10000, repeat=3))
+        print(f"{label} {elapsed / 10000 * 1e6:.2f}us")
+    print(CACHE.counters)
@@ -0,0 +1,168 @@
+"""static file responses"""
+import email.utils
+import gzip
+import hashlib
+import mimetypes
+import os
+import zlib
+
+from aiomicro.response import Prepared, SendFile, format_head
+from aiomicro.util import normalize_path
+from aiomicro.util.types import boolean
+
+
+MIN_COMPRESS = 256  # bytes; smaller files are not worth compressing
+CHUNK = 1 << 16
+
+
+def _accepted(request):
+    """set of acceptable content-codings from the accept-encoding header"""
+    value = request.http_headers.get("accept-encoding")
+    if not value:
+        return set()
+    accepted = set()
+    for item in value.split(","):
+        coding, *params = item.strip().lower().split(";")
+        quality = 1.0
+        for param in params:
+            key, _, val = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(val)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip())
+    return accepted
+
+
+def _matches(etag, value):
+    """True if etag is in the if-none-match header value (weak compare)"""
+    for item in value.split(","):
+        item = item.strip()
+        if item.startswith("W/"):
+            item = item[2:]
+        if item in ("*", etag):
+            return True
+    return False
+
+
+class StaticFile:  # pylint: disable=too-many-instance-attributes
+    """ a file prepared for serving
+
+        The file is read once, when the micro file is parsed. The response
+        headers (including a strong ETag and Last-Modified), and gzip and
+        deflate encodings of the content, are built then, so a request only
+        selects a prepared response. Each encoding has its own ETag (the
+        identity ETag with a "-gzip" or "-deflate" suffix), since a strong
+        validator identifies one content-coding.
+
+        Parameters:
+            path         - dot-separated path to file (see normalize_path)
+            content_type - Content-Type (default is guessed from the path)
+            charset      - charset added to text content types
+            compress     - if True, prepare gzip and deflate encodings
+            threshold    - files larger than this many bytes are not held in
+                           memory; they are sent with loop.sendfile (and not
+                           compressed)
+
+        Notes:
+            1. A request with If-None-Match matching the ETag of the
+               encoding it would get (or, if there is no If-None-Match, a
+               satisfied If-Modified-Since) gets a 304.
+            2. The file is assumed not to change while the server runs.
+    """
+
+    def __init__(self,  # pylint: disable=too-many-arguments
+                 path, content_type=None, charset="utf-8", compress=True,
+                 threshold=1 << 20):
+        self.path = normalize_path(path)
+        stat = os.stat(self.path)
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        self.last_modified = email.utils.formatdate(self.mtime, usegmt=True)
+
+        if content_type is None:
+            content_type = mimetypes.guess_type(self.path)[0]
+        if content_type is None:
+            content_type = "application/octet-stream"
+        if charset and content_type.startswith("text/") and (
+                "charset" not in content_type):
+            content_type = f"{content_type}; charset={charset}"
+
+        digest = hashlib.sha256()
+        data = None
+        with open(self.path, "rb") as source:
+            if self.size <= int(threshold):
+                data = source.read()
+                digest.update(data)
+            else:
+                for chunk in iter(lambda: source.read(CHUNK), b""):
+                    digest.update(chunk)
+        self.etag = f'"{digest.hexdigest()[:32]}"'
+
+        self.headers = {"Last-Modified": self.last_modified}
+        self.encodings = {}  # content-coding -> (ETag, Prepared, 304)
+        if data is not None and boolean(compress) and (
+                len(data) >= MIN_COMPRESS):
+            self.headers["Vary"] = "Accept-Encoding"
+            for coding, body in (
+                    ("gzip", gzip.compress(data, mtime=0)),
+                    ("deflate", zlib.compress(data))):
+                if len(body) < len(data):
+                    self.encodings[coding] = self._prepare(
+                        content_type, body, coding)
+        if data is None:
+            head = self._head(self.etag, content_type, self.size)
+            self.identity = (
+                self.etag, SendFile(head, self.path, self.size),
+                self._not_modified(self.etag))
+        else:
+            self.identity = self._prepare(content_type, data)
+
+    def _prepare(self, content_type, body, coding=None):
+        """(ETag, Prepared, 304 Prepared) for one encoding"""
+        etag = f'{self.etag[:-1]}-{coding}"' if coding else self.etag
+        head = self._head(etag, content_type, len(body), coding)
+        return etag, Prepared(head, body), self._not_modified(etag)
+
+    def _not_modified(self, etag):
+        headers = dict(self.headers, ETag=etag)
+        return Prepared(format_head(304, headers=headers))
+
+    def _head(self, etag, content_type, length, coding=None):
+        headers = dict(self.headers, ETag=etag)
+        headers["Content-Type"] = content_type
+        if coding:
+            headers["Content-Encoding"] = coding
+        headers["Content-Length"] = length
+        return format_head(headers=headers)
+
+    def _is_not_modified(self, request, etag):
+        headers = request.http_headers
+        value = headers.get("if-none-match")
+        if value is not None:
+            return _matches(etag, value)
+        value = headers.get("if-modified-since")
+        if value is not None:
+            try:
+                since = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return False
+            return since is not None and self.mtime <= since.timestamp()
+        return False
+
+    def _select(self, request):
+        if self.encodings:
+            accepted = _accepted(request)
+            for coding in ("gzip", "deflate"):
+                if coding in accepted and coding in self.encodings:
+                    return self.encodings[coding]
+        return self.identity
+
+    def __call__(self, request):
+        """select the prepared response for request"""
+        etag, response, not_modified = self._select(request)
+        if self._is_not_modified(request, etag):
+            return not_modified
+        return response
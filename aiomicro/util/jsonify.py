@@ -0,0 +1,39 @@
+"""json encoding with a pluggable backend"""
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _stdlib(value):
+    return json.dumps(
+        value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+BACKENDS = {"json": _stdlib}
+if orjson is not None:
+    BACKENDS["orjson"] = orjson.dumps
+
+_dumps = BACKENDS.get("orjson", _stdlib)
+
+
+def set_backend(backend):
+    """ set the function used by dumps
+
+        Parameters:
+            backend - name in BACKENDS, or a callable which takes a value
+                      and returns utf-8 encoded json bytes
+    """
+    global _dumps  # pylint: disable=global-statement
+    if not callable(backend):
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown json backend: {backend}")
+        backend = BACKENDS[backend]
+    _dumps = backend
+
+
+def dumps(value):
+    """encode value as compact utf-8 json bytes"""
+    return _dumps(value)
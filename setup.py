@@ -5,6 +5,7 @@ setup(
     name='aiomicro',
     version='1.3.2',
     packages=find_packages(exclude=['tests']),
+    install_requires=['marshmallow>=3.0,<4'],
     description='a microservice framework',
     long_description="""
 Documentation
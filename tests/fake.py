@@ -0,0 +1,94 @@
+"""fakes for the tests which drive an HTTPConnection without a socket"""
+from io import StringIO
+
+from aiomicro.connection import HTTPConnection
+from aiomicro.micro.parser import parse
+
+
+class Transport:
+    """mock transport"""
+
+    def __init__(self):
+        self.limits = (16, 64)
+        self.size = 0
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        """set limits"""
+        self.limits = (low, high)
+
+    def get_write_buffer_limits(self):
+        """get limits"""
+        return self.limits
+
+    def get_write_buffer_size(self):
+        """get size"""
+        return self.size
+
+
+class Writer:
+    """ mock StreamWriter
+
+        data is everything written, and writes each write (or writelines
+        item) separately; bodies is the body of each Prepared response,
+        which writes its head and body with one writelines.
+    """
+
+    def __init__(self, peer=("127.0.0.1", 5000)):
+        self.data = b""
+        self.writes = []
+        self.bodies = []
+        self.peer = peer
+        self.transport = Transport()
+        self.drains = 0
+        self.closed = False
+
+    def get_extra_info(self, name):
+        """peername"""
+        assert name == "peername"
+        return self.peer
+
+    def write(self, data):
+        """write"""
+        self.writes.append(bytes(data))
+        self.data += data
+
+    def writelines(self, data):
+        """writelines"""
+        data = [bytes(item) for item in data]
+        if len(data) == 2:
+            self.bodies.append(data[1])
+        self.writes.extend(data)
+        self.data += b"".join(data)
+
+    async def drain(self):
+        """drain"""
+        self.drains += 1
+        self.transport.size = 0
+
+    def close(self):
+        """close"""
+        self.closed = True
+
+
+class Packet:  # pylint: disable=too-few-public-methods
+    """mock request"""
+    content = None
+    is_keep_alive = True
+
+    def __init__(self, resource="/", headers=None, method="GET"):
+        self.http_method = method
+        self.http_resource = resource
+        self.http_headers = headers or {}
+
+
+def server(micro):
+    """the first SERVER of a micro definition (text)"""
+    _, servers, _ = parse(StringIO(micro))
+    return servers[0]
+
+
+def connection(micro, reader=None, writer=None):
+    """HTTPConnection to the first SERVER of micro (text, or a Server)"""
+    if isinstance(micro, str):
+        micro = server(micro)
+    return HTTPConnection(micro, reader, writer or Writer())
@@ -0,0 +1,128 @@
+"""test access log"""
+import asyncio
+import json
+import logging
+
+import pytest
+
+from aiomicro import access_log
+from aiomicro.access_log import AccessLog
+
+from tests.fake import Packet, connection, server
+
+
+class Match:  # pylint: disable=too-few-public-methods
+    """mock rest._Match"""
+
+    def __init__(self, silent=False, sample=1.0):
+        self.silent = silent
+        self.sample = sample
+
+
+def test_format():
+    """test text and json formats"""
+    fields = (1, 2, "GET", "/ping", 200, 0.5, 10.0)
+    assert AccessLog().format(*fields) == (
+        "request cid=1 rid=2, method=GET resource=/ping status=200"
+        " t=0.500000")
+    assert json.loads(AccessLog("json").format(*fields)) == dict(
+        time=10.0, cid=1, rid=2, method="GET", resource="/ping", status=200,
+        t=0.5)
+    with pytest.raises(ValueError):
+        AccessLog("xml")
+
+
+def test_wants():
+    """test silent and sampled methods"""
+    wants = AccessLog.wants
+    assert wants(None, 404)
+    assert wants(Match(), 200)
+    assert not wants(Match(silent=True), 200)
+    assert not wants(Match(silent=True), 404)
+    assert wants(Match(silent=True), 500)
+    assert not wants(Match(sample=0.0), 200)
+    assert wants(Match(sample=0.0), 400)
+    assert 200 < sum(wants(Match(sample=0.5), 200) for _ in range(1000)) < 800
+
+
+def test_write(caplog):
+    """test records are written by the writer thread"""
+    caplog.set_level(logging.INFO)
+    log = AccessLog("json")
+    for rid in range(10):
+        log(1, rid, "GET", "/", 200, 0.0)
+    access_log.flush(1)
+    rids = [json.loads(record.message)["rid"] for record in caplog.records
+            if record.name == "aiomicro"]
+    assert rids == list(range(10))
+    assert all(record.threadName == "access-log"
+               for record in caplog.records if record.name == "aiomicro")
+
+
+@pytest.mark.filterwarnings(
+    "ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_writer_restart(caplog, monkeypatch):
+    """test a failed record is logged, and a dead writer is restarted"""
+    caplog.set_level(logging.INFO)
+    log = AccessLog("json")
+    log(1, 1, "GET", "/", 200, 0.0)
+    access_log.flush(1)
+
+    def fail(*args):
+        raise ValueError("bad record")
+    monkeypatch.setattr(log, "format", fail)
+    log(1, 2, "GET", "/", 200, 0.0)
+    access_log.flush(1)
+    assert "unable to write access log" in caplog.text
+
+    def die():
+        raise SystemExit()  # not caught by the writer
+    # pylint: disable=protected-access
+    thread = access_log._THREAD
+    monkeypatch.setattr(access_log, "_write_batch", die)
+    access_log._QUEUE.put(None)
+    thread.join(1)
+    assert access_log._THREAD is None
+    monkeypatch.undo()
+    log(1, 3, "GET", "/", 200, 0.0)
+    access_log.flush(1)
+    assert '"rid": 3' in caplog.text
+
+
+def test_dropped(monkeypatch):
+    """test records are dropped, and counted, when the queue is full"""
+    monkeypatch.setattr(access_log, "QUEUE_SIZE", 0)
+    monkeypatch.setitem(access_log.COUNTERS, "dropped", 0)
+    AccessLog()(1, 1, "GET", "/", 200, 0.0)
+    assert access_log.COUNTERS["dropped"] == 1
+
+
+async def ping(request):  # pylint: disable=unused-argument
+    """handler"""
+    return dict(content="pong", content_type="text/plain")
+
+
+def test_connection_silent(caplog):
+    """test silent methods are not logged"""
+    caplog.set_level(logging.INFO)
+    con = connection(
+        'SERVER test 1000\n'
+        'ROUTE /ping$\n'
+        'GET tests.test_access_log.ping\n'
+        'ROUTE /health$\n'
+        'GET tests.test_access_log.ping silent=true\n')
+
+    async def _test():
+        await con.respond(Packet("/health"), 1)
+        await con.respond(Packet("/ping"), 2)
+    asyncio.run(_test())
+    access_log.flush(1)
+    messages = [record.message for record in caplog.records
+                if record.name == "aiomicro"]
+    assert len(messages) == 1
+    assert "resource=/ping status=200" in messages[0]
+
+
+def test_server_none():
+    """test access log can be turned off"""
+    assert server('SERVER test 1000 access_log=none\n').access_log is None
@@ -0,0 +1,124 @@
+"""test admission control"""
+import asyncio
+
+import pytest
+
+from aiomicro.admission import Limiter
+
+from tests.fake import Packet, connection, server
+
+
+def test_shed():
+    """test requests over the limit are shed"""
+    async def _test():
+        limiter = Limiter(2)
+        assert await limiter.acquire()
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        limiter.release()
+        assert await limiter.acquire()
+        assert limiter.metrics == dict(
+            limit=2, inflight=2, waiting=0, admitted=3, queued=0, shed=1,
+            decreases=0)
+        assert b"503 Service Unavailable" in limiter.rejection.head
+        assert b"Retry-After: 1\r\n" in limiter.rejection.head
+    asyncio.run(_test())
+
+
+def test_queue():
+    """test queued requests are admitted in order"""
+    async def _test():
+        limiter = Limiter(1, queue=2)
+        order = []
+
+        async def request(name):
+            if await limiter.acquire():
+                order.append(name)
+                await asyncio.sleep(0)
+                limiter.release()
+            else:
+                order.append(f"shed {name}")
+
+        await asyncio.gather(*(request(name) for name in "abcd"))
+        assert order == ["a", "shed d", "b", "c"]
+        assert limiter.inflight == 0
+    asyncio.run(_test())
+
+
+def test_queue_cancel():
+    """test a cancelled waiter leaves the queue"""
+    async def _test():
+        limiter = Limiter(1, queue=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.metrics["waiting"] == 1
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert limiter.metrics["waiting"] == 0
+        limiter.release()
+        assert limiter.inflight == 0
+    asyncio.run(_test())
+
+
+def test_queue_cancel_then_release():
+    """test a release before a cancelled waiter's task runs skips it"""
+    async def _test():
+        limiter = Limiter(1, queue=2)
+        await limiter.acquire()
+        cancelled = asyncio.create_task(limiter.acquire())
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.metrics["waiting"] == 2
+        cancelled.cancel()
+        limiter.release()  # before the cancelled task removes its future
+        assert await waiter
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert limiter.inflight == 1
+        assert limiter.metrics["waiting"] == 0
+        limiter.release()
+        assert limiter.inflight == 0
+    asyncio.run(_test())
+
+
+def test_adaptive():
+    """test limit decreases when slow, and recovers when fast"""
+    async def _test():
+        limiter = Limiter(10, adaptive=0.1)
+        for _ in range(5):
+            await limiter.acquire()
+            limiter.release(0.5)
+        assert limiter.metrics["limit"] == 5
+        assert limiter.counters["decreases"] == 5
+        for _ in range(100):
+            await limiter.acquire()
+            limiter.release(0.01)
+        assert limiter.limit == 10
+    asyncio.run(_test())
+
+
+async def ping(request):  # pylint: disable=unused-argument
+    """handler"""
+    await asyncio.sleep(0.01)
+    return dict(content="pong", content_type="text/plain")
+
+
+def test_connection_shed():
+    """test route limit sheds with a 503"""
+    async def _test():
+        service = server(
+            'SERVER test 1000 max_inflight=10\n'
+            'ROUTE /ping max_inflight=1 retry_after=5\n'
+            'GET tests.test_admission.ping\n')
+        cons = [connection(service) for _ in range(2)]
+        await asyncio.gather(*(
+            con.respond(Packet("/ping"), 1) for con in cons))
+        assert cons[0].writer.data.endswith(b"pong")
+        assert cons[1].writer.data.startswith(b"HTTP/1.1 503")
+        assert b"Retry-After: 5\r\n" in cons[1].writer.data
+        route = service.routes[0]
+        assert route.limiter.inflight == service.limiter.inflight == 0
+        assert route.limiter.counters["shed"] == 1
+        assert service.limiter.counters["admitted"] == 2
+    asyncio.run(_test())
@@ -0,0 +1,95 @@
+"""test benchmark helpers and load generator"""
+import asyncio
+from io import StringIO
+
+import pytest
+
+from aiomicro.bench import app, db, load, percentile, stages, summarize
+from aiomicro.micro import parser
+
+
+def test_percentile():
+    """test nearest-rank percentile"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize():
+    """test summary fields"""
+    result = summarize("x", [0.001] * 10, extra=1)
+    assert result == dict(
+        name="x", n=10, p50_us=1000.0, p99_us=1000.0, mean_us=1000.0,
+        rps=1000.0, extra=1)
+    assert summarize("x", [0.001], count=4, elapsed=2.0)["rps"] == 2.0
+
+
+@pytest.mark.parametrize("name", ("to_args", "head", "route", "content",
+                                  "match", "response", "format", "respond",
+                                  "respond_metrics"))
+def test_stage(name):
+    """test a stage runs"""
+    result, = stages.run([name], number=2, repeat=3)
+    assert result["name"] == f"stage {name}"
+    assert result["n"] == 6
+
+
+async def _server(reader, writer):
+    """keep-alive server: a fixed body, chunked for /chunked"""
+    while True:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            break
+        if b" /chunked " in head:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                b"4\r\npong\r\n0\r\n\r\n")
+        elif b" /close " in head:
+            writer.write(
+                b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n"
+                b"Connection: close\r\n\r\n")
+            break
+        else:
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Length: 4\r\n\r\npong")
+        await writer.drain()
+    writer.close()
+
+
+def test_load():
+    """test load against a server"""
+    async def _test():
+        server = await asyncio.start_server(_server, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await load.load(
+                "127.0.0.1", port, ["/ping", "/chunked", "/close"],
+                connections=2, duration=0.2, warmup=0.05)
+    ping, chunked, close, total = asyncio.run(_test())
+    assert ping["name"] == "e2e GET /ping"
+    assert ping["n"] > 0 and chunked["n"] > 0 and close["n"] > 0
+    assert total["n"] == ping["n"] + chunked["n"] + close["n"]
+    assert total["statuses"]["404"] == close["n"]
+    assert total["connections"] == 2
+
+
+def test_app_db():
+    """test the built-in service with a database has a cursor route"""
+    micro = parser.load(StringIO(app.MICRO_DB.format(port=0)))
+    assert list(micro.database) == ["bench"]
+    route = micro.servers[0].routes[-1]
+    assert route.pattern.match(app.PATHS_DB[-1])
+    assert route.methods["GET"].cursor == "bench"
+
+
+def test_db():
+    """test round trips through the mysql connector"""
+    pytest.importorskip("aiomysql.connection")
+    results = db.run(number=2, repeat=3)
+    assert [result["name"] for result in results] == [
+        "db execute", "db bind", "db transaction", "db readonly"]
+    assert all(result["n"] == 6 for result in results)
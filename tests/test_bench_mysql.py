@@ -0,0 +1,194 @@
+"""test fake mysql server with a raw protocol client, and the connector"""
+import asyncio
+import struct
+import time
+
+import pytest
+
+from aiomicro import database
+from aiomicro.bench import mysql
+from aiomicro.bench.mysql import Affected, Error, FakeMySQL, Rows
+from aiomicro.database import setup_mysql
+from aiomicro.pool import Pool
+from aiomicro.statement import escape
+
+
+class Client:
+    """just enough of a mysql client"""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.sequence = 0
+
+    async def read(self):
+        """read a packet's payload"""
+        head = await self.reader.readexactly(4)
+        self.sequence = head[3] + 1
+        return await self.reader.readexactly(
+            int.from_bytes(head[:3], "little"))
+
+    def write(self, payload):
+        """write a packet"""
+        self.writer.write(
+            len(payload).to_bytes(3, "little") + bytes((self.sequence,)) +
+            payload)
+
+    async def connect(self, user, password, database="db"):
+        """handshake; return the server's response"""
+        greeting = await self.read()
+        assert greeting[0] == 10
+        version_end = greeting.index(b"\0", 1)
+        pos = version_end + 1 + 4
+        salt = greeting[pos:pos + 8]
+        pos += 8 + 1 + 2 + 1 + 2 + 2 + 1 + 10
+        salt += greeting[pos:pos + 12]
+        assert greeting.endswith(mysql.PLUGIN + b"\0")
+
+        auth = mysql.scramble(password, salt)
+        flags = (mysql.CLIENT_PROTOCOL_41 | mysql.CLIENT_SECURE_CONNECTION |
+                 mysql.CLIENT_CONNECT_WITH_DB | mysql.CLIENT_PLUGIN_AUTH)
+        self.write(
+            struct.pack("<IIB", flags, 1 << 24, mysql.CHARSET) +
+            b"\0" * 23 + user.encode() + b"\0" + bytes((len(auth),)) +
+            auth + database.encode() + b"\0" + mysql.PLUGIN + b"\0")
+        return await self.read()
+
+    async def query(self, query):
+        """ run query
+
+            Return:
+                list of rows (each a list of bytes or None) for a result
+                set, or the OK or ERR packet
+        """
+        self.sequence = 0
+        self.write(bytes((mysql.COM_QUERY,)) + query.encode())
+        first = await self.read()
+        if first[0] in (0x00, 0xff):
+            return first
+        count, _ = mysql.read_lenenc_int(first, 0)
+        for _ in range(count):
+            await self.read()  # column definitions
+        assert (await self.read())[0] == 0xfe
+        rows = []
+        while True:
+            packet = await self.read()
+            if packet[0] == 0xfe and len(packet) < 9:
+                return rows
+            row, pos = [], 0
+            while pos < len(packet):
+                if packet[pos] == 0xfb:
+                    row.append(None)
+                    pos += 1
+                    continue
+                length, pos = mysql.read_lenenc_int(packet, pos)
+                row.append(packet[pos:pos + length])
+                pos += length
+            rows.append(row)
+
+
+def _status(ok):
+    """status flags of an OK packet"""
+    _, pos = mysql.read_lenenc_int(ok, 1)
+    _, pos = mysql.read_lenenc_int(ok, pos)
+    return struct.unpack("<H", ok[pos:pos + 2])[0]
+
+
+def test_protocol():
+    """test handshake, queries, transactions and errors"""
+    async def _test():
+        async with FakeMySQL(user="me", password="secret") as server:
+            server.add(r"SELECT id, name FROM item", Rows(
+                ["id", "name"], [[1, "one"], [2, None]]))
+            server.add(r"INSERT", Affected(1, 42))
+            server.add(r"DROP", Error(1051, "Unknown table"))
+
+            client = Client(*await asyncio.open_connection(
+                "127.0.0.1", server.port))
+            assert (await client.connect("me", "secret"))[0] == 0x00
+            assert await client.query("SELECT 7") == [[b"7"]]
+            assert await client.query("SELECT  id, name FROM item") == [
+                [b"1", b"one"], [b"2", None]]
+
+            ok = await client.query("INSERT INTO item VALUES (3)")
+            assert ok[:3] == b"\x00\x01\x2a"
+            ok = await client.query("BEGIN")
+            assert _status(ok) & mysql.SERVER_STATUS_IN_TRANS
+            ok = await client.query("COMMIT")
+            assert not _status(ok) & mysql.SERVER_STATUS_IN_TRANS
+
+            err = await client.query("DROP TABLE item")
+            assert err[0] == 0xff and struct.unpack("<H", err[1:3]) == (1051,)
+            assert (await client.query("SELECT x"))[0] == 0xff
+
+            client.writer.close()
+            await asyncio.sleep(0.01)
+            assert server.counters["open"] == 0
+            assert server.counters["begin"] == server.counters["commit"] == 1
+    asyncio.run(_test())
+
+
+def test_access_denied():
+    """test wrong password"""
+    async def _test():
+        async with FakeMySQL(password="secret") as server:
+            client = Client(*await asyncio.open_connection(
+                "127.0.0.1", server.port))
+            err = await client.connect("me", "guess")
+            assert err[0] == 0xff
+            assert struct.unpack("<H", err[1:3]) == (1045,)
+    asyncio.run(_test())
+
+
+def test_latency():
+    """test queries are delayed"""
+    async def _test():
+        async with FakeMySQL(latency=0.05) as server:
+            client = Client(*await asyncio.open_connection(
+                "127.0.0.1", server.port))
+            await client.connect("me", "")
+            start = time.perf_counter()
+            await client.query("SELECT 1")
+            assert time.perf_counter() - start >= 0.05
+            client.writer.close()
+    asyncio.run(_test())
+
+
+def test_setup_mysql(monkeypatch):
+    """test setup_mysql's connector, through a Pool, against FakeMySQL"""
+    pytest.importorskip("aiomysql.connection")
+    for name in ("DB_HOST", "DB_PORT", "DB_NAME", "DB_USER", "DB_PASSWORD"):
+        monkeypatch.delenv(name, raising=False)
+    query = "SELECT id, name FROM item WHERE id = %(id)s AND name = %(name)s"
+    seen = []
+
+    def session(match):
+        seen.append(match.group(0))
+        return Affected()
+
+    def item(match):
+        seen.append(match.group(0))
+        return Rows(["id", "name"], [[42, "it's"]])
+
+    async def _test():
+        async with FakeMySQL(user="me", password="secret") as server:
+            server.add(r"SELECT id, name FROM item .*", item)
+            server.add(r"SET SESSION .*", session)
+            connector = setup_mysql(
+                host=server.host, port=server.port, name="db", user="me",
+                password="secret")
+            pool = await Pool.setup(connector, max_size=1)
+            for _ in range(2):
+                cursor = await pool.cursor()
+                await cursor.execute(query, id=42, name="it's")
+                await cursor.close()
+            await pool.close()
+            await asyncio.sleep(0.01)
+            assert server.counters["connections"] == 1
+            assert server.counters["open"] == 0
+            assert connector.statements["miss"] == 1
+            assert connector.statements["hit"] == 1
+    asyncio.run(_test())
+    assert seen == [database.SQL_MODE] + [
+        "SELECT id, name FROM item WHERE id = 42 AND name = " +
+        escape("it's")] * 2
@@ -0,0 +1,139 @@
+"""test handler result caching"""
+import asyncio
+import time
+
+from aiomicro.cache import MISS, Cache, SingleFlight, invalidate
+
+
+class Request:  # pylint: disable=too-few-public-methods
+    """mock request"""
+
+    def __init__(self, **headers):
+        self.http_headers = headers
+
+
+def test_hit_miss():
+    """test cache get and put"""
+    cache = Cache("test")
+    key = cache.key(Request(), [1], dict(a=2))
+    assert cache.get(key) is MISS
+    cache.put(key, "result")
+    assert cache.get(key) == "result"
+    assert cache.get(cache.key(Request(), [1], dict(a=3))) is MISS
+    assert cache.metrics == dict(
+        size=1, hits=1, misses=2, evictions=0, expirations=0,
+        invalidations=0)
+
+
+def test_headers():
+    """test selected headers are part of the key"""
+    cache = Cache("test", headers="Accept, X-Tenant")
+    first = cache.key(Request(accept="a", other="1"), [], {})
+    assert first == cache.key(Request(accept="a", other="2"), [], {})
+    assert first != cache.key(Request(accept="b"), [], {})
+
+
+def test_unhashable():
+    """test unhashable content is not cached"""
+    cache = Cache("test")
+    assert cache.key(Request(), [], dict(a=[1, 2])) is None
+
+
+def test_ttl():
+    """test expiration"""
+    cache = Cache("test", ttl=0.01)
+    cache.put("key", "result")
+    time.sleep(0.02)
+    assert cache.get("key") is MISS
+    assert cache.counters["expirations"] == 1
+    assert not cache
+
+
+def test_lru():
+    """test eviction of least recently used"""
+    cache = Cache("test", max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is MISS
+    assert cache.get("a") == 1
+    assert cache.counters["evictions"] == 1
+
+
+def test_invalidate():
+    """test invalidation by args and kwargs"""
+    cache = Cache("test", headers="accept")
+    for args, kwargs, accept in (
+            ([1], {}, "a"), ([1], {}, "b"), ([2], dict(x=1), "a"),
+            ([2], dict(x=2), "a")):
+        cache.put(cache.key(Request(accept=accept), args, kwargs), "result")
+    assert cache.invalidate(1) == 2
+    assert cache.invalidate(2, x=1) == 1
+    assert len(cache) == 1
+    assert cache.invalidate() == 1
+    assert cache.counters["invalidations"] == 4
+
+
+def test_invalidate_by_name():
+    """test invalidation of a request's cache by name"""
+    cache = Cache("test")
+    cache.put(cache.key(Request(), [1], {}), "result")
+    request = Request()
+    request.caches = {"test": cache}
+    assert invalidate(request, "test", 1) == 1
+    assert not cache
+
+
+def test_single_flight():
+    """test concurrent identical calls share one result"""
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def _test():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            *(flight("key", call) for _ in range(5)), flight("other", call))
+        assert len(calls) == 2
+        assert len(set(results[:5])) == 1
+        assert flight.counters == dict(leaders=2, followers=4)
+        assert not flight
+        assert await flight("key", call) == 3  # not in flight any more
+    asyncio.run(_test())
+
+
+def test_single_flight_exception():
+    """test followers share the leader's exception"""
+    async def call():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+
+    async def _test():
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            flight("key", call), flight("key", call),
+            return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+    asyncio.run(_test())
+
+
+def test_single_flight_leader_cancelled():
+    """test a follower takes over from a cancelled leader"""
+    async def call():
+        await asyncio.sleep(0.01)
+        return "done"
+
+    async def _test():
+        flight = SingleFlight()
+        leader = asyncio.create_task(flight("key", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight("key", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == "done"
+        assert flight.counters["leaders"] == 2
+    asyncio.run(_test())
@@ -0,0 +1,158 @@
+"""test http connection writes"""
+import asyncio
+
+import pytest
+
+from aiomicro import connection
+from aiomicro.connection import HTTPConnection
+from aiomicro.database import LazyCursor
+
+from tests.fake import Packet, Writer, server
+
+
+def _connection(micro='SERVER test 1000\n'):
+    return HTTPConnection(server(micro), None, Writer())
+
+
+def test_write_limits():
+    """test server write buffer limits are set on the transport"""
+    con = _connection('SERVER test 1000 write_high=1000 write_low=100\n')
+    assert con.writer.transport.limits == (100, 1000)
+    assert con.high_water == 1000
+    assert _connection().high_water == 64
+
+
+def test_drain():
+    """test drain waits only over the high-water mark"""
+    async def _test():
+        con = _connection()
+        con.writer.transport.size = 64
+        await con.drain()
+        assert con.writer.drains == 0
+        con.writer.transport.size = 65
+        drains = connection.COUNTERS["drains"]
+        await con.drain()
+        assert connection.COUNTERS["drains"] == drains + 1
+        assert con.writer.drains == 1
+        assert con.drains == 1
+        assert con.max_buffered == 65
+    asyncio.run(_test())
+
+
+def test_metrics():
+    """test buffered bytes by connection"""
+    first, second = _connection(), _connection()
+    first.writer.transport.size = 10
+    second.writer.transport.size = 5
+    result = connection.metrics()
+    assert result["by_connection"][first.id] == (10, 0, 0)
+    assert result["by_connection"][second.id] == (5, 0, 0)
+    assert result["buffered"] >= 15
+
+
+class Cursor:
+    """mock LazyCursor"""
+
+    def __init__(self, name, readonly=False):
+        # pylint: disable=unused-argument
+        self.is_active = False
+        self.log = CURSOR_LOG
+
+    async def execute(self, query):
+        """execute"""
+        self.is_active = True
+        self.log.append(query)
+
+    async def commit(self):
+        """commit"""
+        self.is_active = False
+        self.log.append("commit")
+
+    async def abort(self):
+        """abort"""
+        self.is_active = False
+        self.log.append("abort")
+
+
+CURSOR_LOG = []
+
+
+async def broken(request):
+    """handler which fails after using its cursor"""
+    await request.cursor.execute("SELECT 1")
+    raise ValueError("broken")
+
+
+def test_cursor_released(monkeypatch):
+    """test a non-http exception still releases the cursor"""
+    monkeypatch.setattr(connection, "LazyCursor", Cursor)
+    con = _connection(
+        'DATABASE db mysql\n'
+        'SERVER test 1000\n'
+        'ROUTE /broken\n'
+        'GET tests.test_connection.broken cursor=db\n')
+    CURSOR_LOG.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(con.respond(Packet("/broken"), 1))
+    assert CURSOR_LOG == ["SELECT 1", "abort"]
+
+
+class RawCursor:
+    """mock database cursor, which can't be used after close"""
+
+    def __init__(self):
+        self.closed = False
+
+    def _log(self, name):
+        assert not self.closed
+        CURSOR_LOG.append(name)
+
+    async def start_transaction(self):
+        """start"""
+        self._log("start")
+
+    async def execute(self, query):
+        """execute"""
+        self._log(query)
+
+    async def commit(self):
+        """commit"""
+        self._log("commit")
+
+    async def rollback(self):
+        """rollback"""
+        self._log("rollback")
+
+    async def close(self):
+        """close"""
+        self._log("close")
+        self.closed = True
+
+
+class RawDBS:  # pylint: disable=too-few-public-methods
+    """mock DB"""
+
+    async def __getitem__(self, key):
+        return RawCursor()
+
+
+async def closing(request):
+    """handler which closes its cursor"""
+    await request.cursor.execute("SELECT 1")
+    await request.cursor.close()
+    return dict(content="ok", content_type="text/plain")
+
+
+def test_cursor_closed_by_handler(monkeypatch):
+    """test a cursor closed by its handler is not committed or aborted"""
+    monkeypatch.setattr(
+        connection, "LazyCursor",
+        lambda name, readonly=False: LazyCursor(name, RawDBS(), readonly))
+    con = _connection(
+        'DATABASE db mysql\n'
+        'SERVER test 1000\n'
+        'ROUTE /closing\n'
+        'GET tests.test_connection.closing cursor=db\n')
+    CURSOR_LOG.clear()
+    assert asyncio.run(con.respond(Packet("/closing"), 1))
+    assert CURSOR_LOG == ["start", "SELECT 1", "rollback", "close"]
@@ -0,0 +1,303 @@
+"""test database helpers"""
+import asyncio
+
+import pytest
+
+from aiomicro import database
+from aiomicro.database import LazyCursor
+
+
+class Cursor:
+    """mock cursor"""
+
+    def __init__(self, log):
+        self.log = log
+        self.last_id = 10
+
+    async def start_transaction(self):
+        """start"""
+        self.log.append("start")
+
+    async def execute(self, query):
+        """execute"""
+        self.log.append(query)
+        return query
+
+    async def select(self, query):
+        """select"""
+        self.log.append(f"select {query}")
+        return [query]
+
+    async def commit(self):
+        """commit"""
+        self.log.append("commit")
+
+    async def rollback(self):
+        """rollback"""
+        self.log.append("rollback")
+
+    async def close(self):
+        """close"""
+        self.log.append("close")
+
+
+class DBS:  # pylint: disable=too-few-public-methods
+    """mock DB"""
+
+    def __init__(self):
+        self.log = []
+
+    async def __getitem__(self, key):
+        self.log.append(f"get {key}")
+        return Cursor(self.log)
+
+    async def reader(self, key, primary=False):
+        """read-only cursor"""
+        # pylint: disable=unused-argument
+        self.log.append(f"reader {key}")
+        return Cursor(self.log)
+
+
+def test_lazy_unused():
+    """test no connection is taken if cursor is not used"""
+    dbs = DBS()
+    cursor = LazyCursor("db", dbs)
+    asyncio.run(cursor.commit())
+    assert not cursor.is_active
+    assert not dbs.log
+
+
+def test_lazy_execute():
+    """test connection on first use and release on commit"""
+    async def _test():
+        dbs = DBS()
+        cursor = LazyCursor("db", dbs)
+        assert await cursor.execute("SELECT 1") == "SELECT 1"
+        assert cursor.is_active
+        assert cursor.last_id == 10
+        await cursor.execute("SELECT 2")
+        await cursor.commit()
+        assert not cursor.is_active
+        assert dbs.log == [
+            "get db", "start", "SELECT 1", "SELECT 2", "commit", "close"]
+        await cursor.rollback()  # no-op
+        assert len(dbs.log) == 6
+        assert cursor.elapsed > 0
+    asyncio.run(_test())
+
+
+def test_lazy_close():
+    """test close releases the connection, without committing"""
+    async def _test():
+        dbs = DBS()
+        cursor = LazyCursor("db", dbs)
+        await cursor.execute("SELECT 1")
+        await cursor.close()
+        assert not cursor.is_active
+        await cursor.commit()  # no-op
+        await cursor.close()  # no-op
+        assert dbs.log == ["get db", "start", "SELECT 1", "rollback", "close"]
+    asyncio.run(_test())
+
+
+def test_lazy_reacquire():
+    """test use after release checks out another connection"""
+    async def _test():
+        dbs = DBS()
+        cursor = LazyCursor("db", dbs)
+        await cursor.execute("SELECT 1")
+        await cursor.rollback()
+        await cursor.execute("SELECT 2")
+        assert dbs.log == [
+            "get db", "start", "SELECT 1", "rollback", "close",
+            "get db", "start", "SELECT 2"]
+    asyncio.run(_test())
+
+
+def test_lazy_deferred_method():
+    """test other cursor methods acquire the connection"""
+    async def _test():
+        dbs = DBS()
+        cursor = LazyCursor("db", dbs)
+        assert await cursor.select("SELECT 1") == ["SELECT 1"]
+        assert dbs.log == ["get db", "start", "select SELECT 1"]
+        assert cursor.last_id == 10
+    asyncio.run(_test())
+
+
+def test_lazy_unknown_attribute():
+    """test only known methods are deferred before acquire"""
+    cursor = LazyCursor("db", DBS())
+    with pytest.raises(AttributeError):
+        cursor.last_id  # pylint: disable=pointless-statement
+    with pytest.raises(AttributeError):
+        cursor.slect  # pylint: disable=pointless-statement
+    assert not cursor.is_active
+
+
+def test_lazy_readonly():
+    """test read-only cursor skips transaction"""
+    async def _test():
+        dbs = DBS()
+        cursor = LazyCursor("db", dbs, readonly=True)
+        await cursor.execute("SELECT 1")
+        await cursor.commit()
+        assert dbs.log == ["reader db", "SELECT 1", "close"]
+    asyncio.run(_test())
+
+
+def _connector(database_type, *args, **kwargs):
+    """mock connector setup"""
+    # pylint: disable=unused-argument
+    async def cursor():
+        return kwargs.get("replica") or (
+            "reader" if kwargs.get("autocommit") else "primary")
+    return cursor
+
+
+def test_replicas_round_robin(monkeypatch):
+    """test read-only cursors rotate across replicas"""
+    monkeypatch.setattr(database, "_setup", _connector)
+
+    async def _test():
+        dbinst = database._DB.setup(  # pylint: disable=protected-access
+            "mysql", replicas="r1,r2:3307")
+        assert await dbinst.cursor() == "primary"
+        reads = [await dbinst.reader() for _ in range(4)]
+        assert reads == ["r1", "r2:3307", "r1", "r2:3307"]
+        assert await dbinst.reader(primary=True) == "reader"
+    asyncio.run(_test())
+
+
+def test_replicas_least_loaded(monkeypatch):
+    """test read-only cursors use the least loaded replica"""
+    monkeypatch.setattr(database, "_setup", _connector)
+
+    async def _test():
+        dbinst = database._DB.setup(  # pylint: disable=protected-access
+            "mysql", replicas="r1,r2", balance="least_loaded")
+        await dbinst.init_pool(pool_size=2)
+        first = await dbinst.reader()
+        assert dbinst.replicas[0].load + dbinst.replicas[1].load == 1
+        await dbinst.reader()
+        assert dbinst.replicas[0].load == dbinst.replicas[1].load == 1
+        await first.close()
+        assert dbinst.replicas[0].load + dbinst.replicas[1].load == 1
+    asyncio.run(_test())
+
+
+def test_replicas_none(monkeypatch):
+    """test read-only cursors use the primary without replicas"""
+    monkeypatch.setattr(database, "_setup", _connector)
+    dbinst = database._DB.setup("mysql")  # pylint: disable=protected-access
+    assert asyncio.run(dbinst.reader()) == "reader"
+
+
+def test_replicas_env(monkeypatch):
+    """test replicas from the environment are scoped by connection name"""
+    monkeypatch.setattr(database, "_setup", _connector)
+    monkeypatch.setenv("DB_USERS_REPLICAS", "r1")
+    dbs = database._DBS()  # pylint: disable=protected-access
+    dbs.add("users", "mysql", replicas="r2")
+    dbs.add("orders", "mysql", replicas="r2")
+    assert asyncio.run(dbs.reader("users")) == "r1"
+    assert asyncio.run(dbs.reader("orders")) == "r2"
+
+
+def test_sources_reported(monkeypatch):
+    """test metrics and statements cover every source"""
+    def _counting(database_type, *args, **kwargs):
+        connector = _connector(database_type, *args, **kwargs)
+        connector.statements = {"hit": 1}
+        return connector
+    monkeypatch.setattr(database, "_setup", _counting)
+
+    async def _test():
+        dbinst = database._DB.setup(  # pylint: disable=protected-access
+            "mysql", replicas="r1")
+        await dbinst.init_pool(pool_size=2)
+        await dbinst.reader(primary=True)
+        assert list(dbinst.metrics) == ["primary", "reader", "r1"]
+        assert dbinst.metrics["reader"]["in_use"] == 1
+        assert list(dbinst.statements) == ["primary", "reader", "r1"]
+    asyncio.run(_test())
+
+
+def test_reader_lazy(monkeypatch):
+    """test the primary's read-only pool is created on first use"""
+    monkeypatch.setattr(database, "_setup", _connector)
+
+    async def _test():
+        dbinst = database._DB.setup(  # pylint: disable=protected-access
+            "mysql")
+        await dbinst.init_pool(pool_size=2, min_size=1)
+        assert [source.label for source in dbinst.sources] == ["primary"]
+        reader = await dbinst.reader()
+        assert [source.label for source in dbinst.sources] == [
+            "primary", "reader"]
+        assert dbinst.sources[1].pool.metrics["in_use"] == 1
+        await reader.close()
+    asyncio.run(_test())
+
+
+def test_lazy_pin():
+    """test pinned read-only cursor uses the primary"""
+    class PinDBS(DBS):  # pylint: disable=too-few-public-methods
+        """mock DB with primary flag"""
+        async def reader(self, key, primary=False):
+            self.log.append(f"reader {key} {primary}")
+            return Cursor(self.log)
+
+    async def _test():
+        dbs = PinDBS()
+        cursor = LazyCursor("db", dbs, readonly=True)
+        cursor.pin()
+        await cursor.execute("SELECT 1")
+        assert dbs.log == ["reader db True", "SELECT 1"]
+    asyncio.run(_test())
+
+
+class PooledCursor(Cursor):
+    """mock pooled cursor"""
+
+    async def slow(self):
+        """long query"""
+        self.log.append("slow")
+        await asyncio.sleep(10)
+
+    async def discard(self):
+        """discard"""
+        self.log.append("discard")
+
+
+class PoolDBS(DBS):  # pylint: disable=too-few-public-methods
+    """mock DB with pooled cursors"""
+
+    async def __getitem__(self, key):
+        self.log.append(f"get {key}")
+        return PooledCursor(self.log)
+
+
+def test_lazy_abort():
+    """test abort rolls back and releases the connection"""
+    async def _test():
+        dbs = PoolDBS()
+        cursor = LazyCursor("db", dbs)
+        await cursor.execute("SELECT 1")
+        await cursor.abort()
+        assert dbs.log == ["get db", "start", "SELECT 1", "rollback", "close"]
+    asyncio.run(_test())
+
+
+def test_lazy_abort_interrupted():
+    """test abort discards a connection whose call was cancelled"""
+    async def _test():
+        dbs = PoolDBS()
+        cursor = LazyCursor("db", dbs)
+        await cursor.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cursor.slow(), 0.01)
+        await cursor.abort()
+        assert dbs.log == ["get db", "start", "slow", "discard"]
+        assert not cursor.is_active
+    asyncio.run(_test())
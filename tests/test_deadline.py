@@ -0,0 +1,52 @@
+"""test request deadlines"""
+import asyncio
+
+from aiomicro.connection import HTTPConnection
+from aiomicro.request import remaining
+
+from tests.fake import Packet, connection
+
+
+SEEN = []
+
+
+async def slow(request):
+    """handler"""
+    SEEN.append(remaining(request))
+    await asyncio.sleep(float(request.http_resource.split("/")[-1]))
+    return dict(content="done", content_type="text/plain")
+
+
+MICRO = (
+    'SERVER test 1000 timeout=0.5\n'
+    'ROUTE /slow/\n'
+    'GET tests.test_deadline.slow timeout=0.05\n'
+    'ROUTE /default/\n'
+    'GET tests.test_deadline.slow\n'
+)
+
+
+def test_timeout(monkeypatch):
+    """test handler is cancelled with a 504 at its deadline"""
+    sent = []
+    monkeypatch.setattr(
+        HTTPConnection, "on_http_exception",
+        lambda self, exc: sent.append(exc.code))
+
+    async def _test():
+        con = connection(MICRO)
+        SEEN.clear()
+        await con.respond(Packet("/slow/0.001"), 1)
+        assert con.writer.data.endswith(b"done")
+        await con.respond(Packet("/slow/1"), 2)
+        assert sent == [504]
+        await con.respond(Packet("/default/0.1"), 3)
+        assert sent == [504]
+        assert 0.04 < SEEN[0] <= 0.05
+        assert 0.4 < SEEN[2] <= 0.5
+    asyncio.run(_test())
+
+
+def test_remaining_none():
+    """test no deadline"""
+    assert remaining(Packet("/")) is None
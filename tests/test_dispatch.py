@@ -0,0 +1,97 @@
+"""test compiled route dispatch"""
+import re
+
+import pytest
+
+from aiomicro.dispatch import Dispatcher, literal_prefix
+
+
+class Route:  # pylint: disable=too-few-public-methods
+    """mock route"""
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+
+
+@pytest.mark.parametrize(
+    'pattern,prefix,is_exact', (
+        ("/ping$", "/ping", True),
+        ("^/ping$", "/ping", True),
+        ("/ping", "/ping", False),
+        (r"/users/(\d+)$", "/users/", False),
+        (r"/a\.b$", "/a.b", True),
+        ("/abc?", "/ab", False),
+        ("/ab+", "/ab", False),
+        ("/ab{2}", "/a", False),
+        (r"/a\d", "/a", False),
+        ("/a|/b", "", False),
+        ("/x(/a|/b)$", "/x", False),
+        ("/x[|]", "/x", False),
+        (".*", "", False),
+    )
+)
+def test_literal_prefix(pattern, prefix, is_exact):
+    """test literal prefix extraction"""
+    assert literal_prefix(pattern) == (prefix, is_exact)
+
+
+ROUTES = (
+    "/ping$",
+    r"/users/(\d+)$",
+    r"/users/(\d+)/age$",
+    "/users/admin$",
+    r"/users/(\w+)$",
+    "/ping/more",
+    r"/(\w+)/(\d+)$",
+    "/files/(?P<name>.*)",
+    r"(/x)\1$",
+    "/a|/b",
+    "/static$",
+    "/ping$",
+    ".*",
+)
+
+
+@pytest.mark.parametrize(
+    'path', (
+        "/ping",
+        "/ping/more/stuff",
+        "/users/10",
+        "/users/10/age",
+        "/users/admin",
+        "/users/bob",
+        "/foo/123",
+        "/files/a/b/c",
+        "/x/x",
+        "/a",
+        "/b/1",
+        "/static",
+        "/nothing/here",
+        "",
+    )
+)
+def test_dispatch_order(path):
+    """test that dispatch matches a linear scan"""
+    routes = [Route(pattern) for pattern in ROUTES]
+    expect = None
+    for route in routes:
+        resource = route.pattern.match(path)
+        if resource:
+            expect = (route, resource.groups())
+            break
+    assert Dispatcher(routes).lookup(path) == expect
+
+
+def test_dispatch_not_found():
+    """test no matching route"""
+    routes = [Route(pattern) for pattern in ("/ping$", r"/users/(\d+)$")]
+    assert Dispatcher(routes).lookup("/users/abc") == (None, None)
+
+
+def test_dispatch_named_groups():
+    """test combined patterns with the same group names"""
+    routes = [Route(pattern) for pattern in (
+        r"(?P<id>\d+)$", r"(?P<id>\w+)$")]
+    dispatch = Dispatcher(routes)
+    assert dispatch.lookup("abc") == (routes[1], ("abc",))
+    assert dispatch.lookup("123") == (routes[0], ("123",))
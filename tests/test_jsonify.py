@@ -0,0 +1,36 @@
+"""test json backends"""
+import json
+
+import pytest
+
+from aiomicro.util import jsonify
+
+
+@pytest.fixture(autouse=True)
+def restore_backend(monkeypatch):
+    """put back the default backend after each test"""
+    # pylint: disable=protected-access
+    monkeypatch.setattr(jsonify, "_dumps", jsonify._dumps)
+
+
+@pytest.mark.parametrize('backend', sorted(jsonify.BACKENDS))
+def test_backend(backend):
+    """test backends produce the same compact json"""
+    value = dict(a=1, b=[True, None, 1.5], c="café")
+    jsonify.set_backend(backend)
+    result = jsonify.dumps(value)
+    assert isinstance(result, bytes)
+    assert json.loads(result) == value
+    assert b" " not in result
+
+
+def test_backend_callable():
+    """test a callable backend"""
+    jsonify.set_backend(lambda value: b"x")
+    assert jsonify.dumps({}) == b"x"
+
+
+def test_backend_unknown():
+    """test unknown backend name"""
+    with pytest.raises(ValueError):
+        jsonify.set_backend("yaml")
@@ -0,0 +1,111 @@
+"""test worker supervisor"""
+import asyncio
+import os
+import signal
+import socket
+import time
+
+import pytest
+
+from aiomicro import main
+
+
+def sleeper(defn, index, run_tasks, log_level):
+    """worker which records its pid and waits to be terminated"""
+    del run_tasks, log_level
+    with open(os.path.join(defn, str(index)), "a", encoding="utf-8") as out:
+        out.write(f"{os.getpid()}\n")
+    time.sleep(60)
+
+
+def crasher(defn, index, run_tasks, log_level):
+    """worker which fails to start"""
+    del defn, index, run_tasks, log_level
+    raise SystemExit(1)
+
+
+def _pids(path, index):
+    """pids started as worker index"""
+    try:
+        with open(os.path.join(path, str(index)), encoding="utf-8") as data:
+            return [int(pid) for pid in data.read().split()]
+    except FileNotFoundError:
+        return []
+
+
+async def _wait(test, timeout=10.0):
+    """wait until test() is true"""
+    end = time.monotonic() + timeout
+    while not test():
+        assert time.monotonic() < end
+        await asyncio.sleep(0.05)
+
+
+def _alive(pid):
+    """true if pid is still running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+def test_supervise(tmp_path, monkeypatch):
+    """test two workers start, restart and shut down"""
+    monkeypatch.setattr(main, "RESTART_DELAY", 0.0)
+    path = str(tmp_path)
+
+    async def _test():
+        task = asyncio.create_task(
+            main.supervise(path, 2, target=sleeper))
+        await _wait(lambda: _pids(path, 0) and _pids(path, 1))
+        first, = _pids(path, 0)
+        os.kill(first, signal.SIGKILL)
+        await _wait(lambda: len(_pids(path, 0)) == 2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(_test())
+    assert len(_pids(path, 1)) == 1
+    for pid in _pids(path, 0) + _pids(path, 1):
+        assert not _alive(pid)
+
+
+def test_supervise_sigterm(tmp_path):
+    """test SIGTERM stops the supervisor and its workers"""
+    path = str(tmp_path)
+
+    async def _test():
+        task = asyncio.create_task(
+            main.supervise(path, 2, target=sleeper))
+        await _wait(lambda: _pids(path, 0) and _pids(path, 1))
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(task, 10.0)
+
+    asyncio.run(_test())
+    for index in (0, 1):
+        pid, = _pids(path, index)
+        assert not _alive(pid)
+
+
+def test_start_failures(tmp_path, monkeypatch):
+    """test workers which keep failing to start stop the supervisor"""
+    monkeypatch.setattr(main, "RESTART_DELAY", 0.0)
+    monkeypatch.setattr(main, "START_FAILURES", 3)
+    with pytest.raises(Exception, match="failed to start 3 times"):
+        asyncio.run(main.supervise(str(tmp_path), 1, target=crasher))
+
+
+def test_check_reuse_port():
+    """test a free port can be shared and a used one can't"""
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        port = sock.getsockname()[1]
+    main.check_reuse_port(port)
+
+    with socket.socket() as sock:
+        sock.bind(("", 0))
+        sock.listen()
+        with pytest.raises(Exception, match="unable to share port"):
+            main.check_reuse_port(sock.getsockname()[1])
@@ -0,0 +1,112 @@
+"""test request metrics"""
+import asyncio
+
+from aiomicro import database
+from aiomicro.connection import HTTPConnection
+from aiomicro.metrics import BUCKETS, Histogram, RouteStats, render
+
+from tests.fake import Packet, connection, server
+
+
+async def ping(request):  # pylint: disable=unused-argument
+    """handler"""
+    return dict(content="pong", content_type="text/plain")
+
+
+def _server(metrics=" metrics=/metrics"):
+    return server(
+        f'SERVER test 1000{metrics}\n'
+        'ROUTE /ping$\n'
+        'GET tests.test_metrics.ping\n')
+
+
+def test_histogram():
+    """test bucket boundaries"""
+    histogram = Histogram()
+    for value in (0.0, BUCKETS[0], BUCKETS[0] * 1.01, 100.0):
+        histogram.observe(value)
+    assert histogram.counts[0] == 2
+    assert histogram.counts[1] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.count == 4
+
+
+def test_route_stats():
+    """test statuses and histograms"""
+    stats = RouteStats("/ping", "GET")
+    stats.observe(200, .002, 0.0, .0001)
+    stats.observe(200, .002, .001, .0001)
+    stats.observe(404, 0.0, 0.0, 0.0)
+    assert stats.statuses == {200: 2, 404: 1}
+    assert stats.handler.count == 3
+    assert stats.db.sum == .001
+
+
+def test_disabled():
+    """test metrics are off by default"""
+    service = _server("")
+    assert service.metrics is None
+    assert service.routes[0].methods["GET"].stats is None
+
+
+def test_endpoint(monkeypatch):
+    """test requests are counted and served as prometheus text"""
+    monkeypatch.setattr(
+        HTTPConnection, "on_http_exception", lambda self, exc: None)
+    service = _server()
+
+    async def _test():
+        con = connection(service)
+        await con.respond(Packet("/ping"), 1)
+        await con.respond(Packet("/ping"), 2)
+        await con.respond(Packet("/missing"), 3)
+        con.writer.data = b""
+        await con.respond(Packet("/metrics"), 4)
+        return con.writer.data.decode()
+    text = asyncio.run(_test())
+
+    assert "text/plain; version=0.0.4" in text
+    assert (
+        'aiomicro_requests_total{server="test",route="/ping$",method="GET",'
+        'status="200"} 2') in text
+    assert (
+        'aiomicro_requests_total{server="test",route="",method="",'
+        'status="404"} 1') in text
+    assert (
+        'aiomicro_handler_seconds_count{server="test",route="/ping$",'
+        'method="GET"} 2') in text
+    assert (
+        'aiomicro_handler_seconds_bucket{server="test",route="/ping$",'
+        'method="GET",le="+Inf"} 2') in text
+    assert 'aiomicro_inflight{server="test"} 1' in text  # this request
+    assert "aiomicro_access_log_dropped_total " in text
+    assert "aiomicro_connections " in text
+    assert "aiomicro_write_buffered_bytes " in text
+    assert "# TYPE aiomicro_write_drains_total counter" in text
+    assert service.metrics.inflight == 0
+
+
+def test_pool_metrics(monkeypatch):
+    """test pool counters are counters, and the rest are gauges"""
+    def _connector(database_type, *args, **kwargs):
+        # pylint: disable=unused-argument
+        async def cursor():
+            return "cursor"
+        return cursor
+    monkeypatch.setattr(database, "_setup", _connector)
+    dbs = database._DBS()  # pylint: disable=protected-access
+    dbs.add("db", "mysql")
+
+    async def _test():
+        await dbs.dbs["db"].init_pool(pool_size=2, min_size=1)
+        await dbs["db"]
+    asyncio.run(_test())
+
+    text = render(_server(), dbs)
+    labels = '{database="db",source="primary"}'
+    assert "# TYPE aiomicro_db_pool_checkouts_total counter" in text
+    assert f"aiomicro_db_pool_checkouts_total{labels} 1" in text
+    assert f"aiomicro_db_pool_created_total{labels} 1" in text
+    assert "# TYPE aiomicro_db_pool_wait_seconds_total counter" in text
+    assert "# TYPE aiomicro_db_pool_in_use gauge" in text
+    assert f"aiomicro_db_pool_in_use{labels} 1" in text
@@ -1,8 +1,9 @@
 """test micro parser"""
+import asyncio
 from io import StringIO
 import pytest
 
-from aiomicro.micro.parser import parse
+from aiomicro.micro.parser import ParseError, load, parse
 
 
 def test_database():
@@ -45,6 +46,33 @@ def function():
     return 'foo'
 
 
+async def generator(request):
+    """stream strings"""
+    yield request
+
+
+def test_stream():
+    """test async generator handler is awaitable"""
+    _, servers, _ = parse(StringIO(
+        'SERVER test 1000\n'
+        'ROUTE /test/ping\n'
+        'GET tests.test_parser.generator\n'
+    ))
+    handler = servers[0].routes[0].methods["GET"].handler
+    stream = asyncio.run(handler("foo"))
+    assert hasattr(stream, "__aiter__")
+
+
+def test_stream_coalesce():
+    """test coalesce is rejected for async generator handler"""
+    with pytest.raises(ParseError):
+        load(StringIO(
+            'SERVER test 1000\n'
+            'ROUTE /test/ping\n'
+            'GET tests.test_parser.generator coalesce=true\n'
+        ))
+
+
 def test_wrap():
     """test wrap directive"""
     _, servers, _ = parse(StringIO(
@@ -110,7 +138,7 @@ def test_response_json():
         'SERVER test 1000\n'
         'ROUTE /test/ping\n'
         'GET tests.test_parser.function\n'
-        "RESPONSE marshmallow path=tests.test_parser.function\n"
+        "RESPONSE marshmallow path=tests.test_rest.ResponseSchema\n"
     ))
     assert servers  # more to do here
 
@@ -125,3 +153,92 @@ def test_response_json_default():
             'RESPONSE json default=foo\n'
         ))
         assert servers  # more to do here
+
+
+def test_dispatch():
+    """test route dispatcher is compiled after parse"""
+    _, servers, _ = parse(StringIO(
+        'SERVER test 1000\n'
+        'ROUTE /test/ping$\n'
+        'GET tests.test_parser.function\n'
+        'ROUTE /test/(\\d+)$\n'
+        'GET tests.test_parser.function\n'
+    ))
+    server = servers[0]
+    assert server.dispatch.lookup('/test/ping') == (server.routes[0], ())
+    assert server.dispatch.lookup('/test/12') == (server.routes[1], ('12',))
+
+
+def test_workers():
+    """test workers directive"""
+    micro = load(StringIO(
+        'WORKERS 4 task_worker=2\n'
+        'SERVER test 1000\n'
+    ))
+    assert micro.workers == 4
+    assert micro.task_worker == 2
+
+
+@pytest.mark.parametrize(
+    'line', (
+        'WORKERS 0',
+        'WORKERS 2 task_worker=2',
+        'WORKERS 2\nWORKERS 2',
+    )
+)
+def test_workers_bad(line):
+    """test invalid workers directive"""
+    with pytest.raises(ParseError):
+        load(StringIO(line))
+
+
+def test_readonly():
+    """test readonly method option"""
+    _, servers, _ = parse(StringIO(
+        'DATABASE db mysql\n'
+        'DATABASE ro mysql readonly=true\n'
+        'SERVER test 1000\n'
+        'ROUTE /test/ping\n'
+        'GET tests.test_parser.function cursor=db readonly=true\n'
+        'PUT tests.test_parser.function cursor=db\n'
+        'POST tests.test_parser.function cursor=ro\n'
+        'DELETE tests.test_parser.function cursor=ro readonly=false\n'
+    ))
+    methods = servers[0].routes[0].methods
+    assert methods['GET'].readonly
+    assert not methods['PUT'].readonly
+    assert methods['POST'].readonly
+    assert not methods['DELETE'].readonly
+
+
+def test_cache():
+    """test cache directive"""
+    parser = load(StringIO(
+        'SERVER test 1000\n'
+        'ROUTE /test/ping\n'
+        'GET tests.test_parser.function\n'
+        'CACHE ttl=5 max=10 headers=accept\n'
+        'PUT tests.test_parser.function\n'
+        'CACHE name=test_parser_put\n'
+    ))
+    servers = parser.servers
+    methods = servers[0].routes[0].methods
+    assert methods['GET'].cache.name == 'GET /test/ping'
+    assert methods['GET'].cache.ttl == 5
+    assert methods['GET'].cache.max_size == 10
+    assert methods['GET'].cache.headers == ('accept',)
+    assert parser.caches['test_parser_put'] is methods['PUT'].cache
+    assert servers[0].caches is parser.caches
+
+
+def test_cache_duplicate():
+    """test cache names are unique"""
+    with pytest.raises(ParseError, match='duplicate cache name'):
+        parse(StringIO(
+            'SERVER test 1000\n'
+            'ROUTE /test/ping\n'
+            'GET tests.test_parser.function\n'
+            'CACHE name=ping\n'
+            'PUT tests.test_parser.function\n'
+            'CACHE name=ping\n'
+        ))
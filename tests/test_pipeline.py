@@ -0,0 +1,104 @@
+"""test pipelined request handling"""
+import asyncio
+import time
+
+from aiomicro.pipeline import Pipeline
+
+from tests.fake import Packet, connection
+
+
+def test_pipeline_order():
+    """test calls run concurrently and finish their turns in order"""
+    async def _test():
+        pipeline = Pipeline(3)
+        written = []
+
+        async def call(name, delay, turn):
+            await asyncio.sleep(delay)
+            if turn is not None:
+                await turn
+            written.append(name)
+
+        tasks = [
+            await pipeline.submit(lambda turn, n=n, d=d: call(n, d, turn))
+            for n, d in (("a", .03), ("b", .01), ("c", 0))]
+        assert len(pipeline) == 3
+        await asyncio.gather(*tasks)
+        assert written == ["a", "b", "c"]
+        assert not pipeline
+    asyncio.run(_test())
+
+
+def test_pipeline_limit():
+    """test submit waits for a free slot"""
+    async def _test():
+        pipeline = Pipeline(1)
+        release = asyncio.Event()
+
+        async def call(turn):  # pylint: disable=unused-argument
+            await release.wait()
+
+        await pipeline.submit(call)
+        second = asyncio.create_task(pipeline.submit(call))
+        await asyncio.sleep(0)
+        assert not second.done()
+        release.set()
+        await (await second)
+    asyncio.run(_test())
+
+
+def test_pipeline_cancel():
+    """test cancel stops calls in progress"""
+    async def _test():
+        pipeline = Pipeline(2)
+
+        async def call(turn):  # pylint: disable=unused-argument
+            await asyncio.sleep(10)
+
+        tasks = [await pipeline.submit(call) for _ in range(2)]
+        pipeline.cancel()
+        await pipeline.wait()
+        assert all(task.cancelled() for task in tasks)
+    asyncio.run(_test())
+
+
+def test_pipeline_cancel_before_start():
+    """test a call cancelled before it starts gives up its turn and slot"""
+    async def _test():
+        pipeline = Pipeline(1)
+
+        async def call(turn):
+            if turn is not None:
+                await turn
+            return "ran"
+
+        first = await pipeline.submit(call)
+        first.cancel()  # before the task has run at all
+        second = await asyncio.wait_for(pipeline.submit(call), 1)
+        assert await asyncio.wait_for(second, 1) == "ran"
+        assert first.cancelled()
+        assert not pipeline
+    asyncio.run(_test())
+
+
+async def sleep(request):
+    """handler"""
+    delay = request.http_resource.split("/")[-1]
+    await asyncio.sleep(float(delay))
+    return dict(content=delay, content_type="text/plain")
+
+
+def test_connection_pipeline():
+    """test pipelined responses are written in request order"""
+    async def _test():
+        con = connection(
+            'SERVER test 1000 pipeline=4\n'
+            'ROUTE /sleep/\n'
+            'GET tests.test_pipeline.sleep\n')
+        start = time.perf_counter()
+        for rid, delay in enumerate(("0.1", "0.05", "0.08")):
+            assert await con.handle(Packet(f"/sleep/{delay}"), rid) is True
+        await con.pipeline.wait()
+        assert time.perf_counter() - start < 0.2  # not 0.23
+        assert con.writer.bodies == [b"0.1", b"0.05", b"0.08"]
+    asyncio.run(_test())
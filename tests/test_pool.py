@@ -0,0 +1,188 @@
+"""test database connection pool"""
+import asyncio
+
+import pytest
+
+from aiomicro.pool import Pool
+
+
+class Cursor:
+    """mock cursor"""
+
+    def __init__(self, ident):
+        self.ident = ident
+        self.is_alive = True
+        self.closed = False
+
+    async def execute(self, query):  # pylint: disable=unused-argument
+        """fail unless alive"""
+        if not self.is_alive:
+            raise Exception("dead")
+
+    async def close(self):
+        """close"""
+        self.closed = True
+
+
+class Connector:  # pylint: disable=too-few-public-methods
+    """mock connector"""
+
+    def __init__(self):
+        self.cursors = []
+
+    async def __call__(self):
+        cursor = Cursor(len(self.cursors))
+        self.cursors.append(cursor)
+        return cursor
+
+
+def run(coro):
+    """run coroutine"""
+    return asyncio.run(coro)
+
+
+def test_reuse():
+    """test connection returned to the pool is reused"""
+    async def _test():
+        connector = Connector()
+        pool = await Pool.setup(connector, max_size=2)
+        cursor = await pool.cursor()
+        first = cursor.ident
+        await cursor.close()
+        assert cursor.is_closed
+        cursor = await pool.cursor()
+        assert cursor.ident == first
+        assert pool.metrics["created"] == 1
+        assert pool.metrics["in_use"] == 1
+    run(_test())
+
+
+def test_min_size():
+    """test pool is filled to min_size"""
+    async def _test():
+        connector = Connector()
+        pool = await Pool.setup(connector, min_size=3, max_size=5)
+        assert pool.metrics["size"] == 3
+        assert pool.metrics["idle"] == 3
+    run(_test())
+
+
+def test_max_size_wait():
+    """test checkout waits when the pool is exhausted"""
+    async def _test():
+        pool = await Pool.setup(Connector(), max_size=1)
+        cursor = await pool.cursor()
+        waiter = asyncio.create_task(pool.cursor())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        assert pool.metrics["waiting"] == 1
+        await cursor.close()
+        cursor = await waiter
+        assert pool.metrics["waits"] == 1
+        assert pool.metrics["size"] == 1
+        assert pool.metrics["wait_max"] > 0
+    run(_test())
+
+
+def test_ping():
+    """test dead connection is replaced on checkout"""
+    async def _test():
+        connector = Connector()
+        pool = await Pool.setup(connector, max_size=2, ping=True)
+        cursor = await pool.cursor()
+        await cursor.close()
+        connector.cursors[0].is_alive = False
+        cursor = await pool.cursor()
+        assert cursor.ident == 1
+        assert connector.cursors[0].closed
+        assert pool.metrics["failed_pings"] == 1
+        assert pool.metrics["destroyed"] == 1
+        assert pool.metrics["size"] == 1
+    run(_test())
+
+
+def test_max_lifetime():
+    """test expired connection is closed on release"""
+    async def _test():
+        connector = Connector()
+        pool = await Pool.setup(connector, max_lifetime=0.01)
+        cursor = await pool.cursor()
+        await asyncio.sleep(0.02)
+        await cursor.close()
+        assert connector.cursors[0].closed
+        assert pool.metrics["size"] == 0
+        await pool.close()
+    run(_test())
+
+
+def test_reap_idle():
+    """test idle connections above min_size are reaped"""
+    async def _test():
+        connector = Connector()
+        pool = Pool(connector, min_size=1, max_size=3, max_idle=0.01)
+        cursors = [await pool.cursor() for _ in range(3)]
+        for cursor in cursors:
+            await cursor.close()
+        await asyncio.sleep(0.02)
+        await pool.reap_once()
+        assert pool.metrics["size"] == 1
+        assert pool.metrics["destroyed"] == 2
+    run(_test())
+
+
+def test_discard():
+    """test discarded connection frees its slot"""
+    async def _test():
+        pool = Pool(Connector(), max_size=1)
+        cursor = await pool.cursor()
+        await cursor.discard()
+        assert pool.metrics["size"] == 0
+        assert pool.metrics["in_use"] == 0
+        with pytest.raises(Exception):
+            cursor.execute  # pylint: disable=pointless-statement
+    run(_test())
+
+
+def test_bad_size():
+    """test invalid pool sizes"""
+    with pytest.raises(ValueError):
+        Pool(Connector(), min_size=2, max_size=1)
+
+
+def test_leaks(caplog):
+    """test long-held connections are reported with their checkout site"""
+    async def _test():
+        pool = await Pool.setup(Connector(), max_size=2, leak_timeout=0.01)
+        held = await pool.cursor()
+        returned = await pool.cursor()
+        await returned.close()
+        assert pool.leaks(10) == []
+        await asyncio.sleep(0.02)
+        leaks = pool.leaks()
+        assert len(leaks) == 1
+        assert leaks[0]["age"] >= 0.01
+        assert "in _test" in leaks[0]["site"]
+        assert pool.metrics["held_max"] >= 0.01
+        pool.report_leaks()
+        pool.report_leaks()  # reported once
+        assert pool.metrics["leaks"] == 1
+        assert "pooled connection held" in caplog.text
+        await held.close()
+        assert pool.leaks(0) == []
+        await pool.close()
+    run(_test())
+
+
+def test_exhausted(caplog):
+    """test a waiting checkout logs the longest held connections"""
+    async def _test():
+        pool = await Pool.setup(Connector(), max_size=1, leak_timeout=10)
+        held = await pool.cursor()
+        waiter = asyncio.create_task(pool.cursor())
+        await asyncio.sleep(0)
+        assert "pool exhausted" in caplog.text
+        assert "in _test" in caplog.text
+        await held.close()
+        await (await waiter).close()
+        await pool.close()
+    run(_test())
@@ -0,0 +1,103 @@
+"""test per-request profiling"""
+import asyncio
+
+from aiomicro.connection import HTTPConnection
+from aiomicro.profiling import HEADER, RequestProfiler, is_allowed, is_local
+
+from tests.fake import Packet, Writer, connection, server
+
+
+def busy():
+    """something to find in a profile"""
+    return sum(range(1000))
+
+
+async def work(request):  # pylint: disable=unused-argument
+    """handler"""
+    busy()
+    return dict(content="done", content_type="text/plain")
+
+
+def _server(options=" profile=/profile profile_secret=s3cret"):
+    return server(
+        f'SERVER test 1000{options}\n'
+        'ROUTE /work$\n'
+        'GET tests.test_profiling.work\n')
+
+
+def test_is_local():
+    """test loopback, unknown and unix peers"""
+    assert is_local(("127.0.0.1", 1))
+    assert is_local(("::1", 1, 0, 0))
+    assert not is_local("")
+    assert not is_local("/tmp/socket")
+    assert not is_local(("10.0.0.1", 1))
+    assert not is_local(None)
+    assert not is_local(())
+
+
+def test_is_allowed():
+    """test an admin request needs a local peer, and the secret if set"""
+    packet = Packet("/", {HEADER: "s3cret"})
+    packet.peer = ("127.0.0.1", 1)
+    assert is_allowed(packet)
+    assert is_allowed(packet, "s3cret")
+    assert not is_allowed(packet, "other")
+    assert not is_allowed(Packet("/"), "s3cret")  # no peer
+    packet.http_headers = {HEADER: "s3cr\u00e9t"}
+    assert not is_allowed(packet, "s3cret")
+    packet.http_headers = {}
+    assert not is_allowed(packet, "s3cret")
+
+
+def test_wants():
+    """test secret header and rate"""
+    profiler = RequestProfiler(secret="s3cret")
+    assert profiler.wants(Packet("/", {HEADER: "s3cret"}))
+    assert not profiler.wants(Packet("/", {HEADER: "guess"}))
+    assert not profiler.wants(Packet("/"))
+    assert RequestProfiler(rate=1).wants(Packet("/"))
+    assert not RequestProfiler().wants(Packet("/"))
+
+
+def test_ring_buffer():
+    """test only the latest profiles are kept"""
+    profiler = RequestProfiler(size=2)
+    for rid in range(3):
+        profiler.stop(profiler.start(), 1, rid, "GET", "/", 0.0)
+    assert [profile["rid"] for profile in profiler.profiles] == [1, 2]
+    assert RequestProfiler.active is None
+
+
+def test_disabled():
+    """test profiling is off by default"""
+    assert _server("").profiler is None
+
+
+def test_profile(monkeypatch):
+    """test a request with the secret is profiled and reported locally"""
+    sent = []
+    monkeypatch.setattr(
+        HTTPConnection, "on_http_exception",
+        lambda self, exc: sent.append(exc.code))
+    service = _server()
+
+    async def _test(peer):
+        con = connection(service, writer=Writer(peer))
+        await con.respond(Packet("/work"), 1)
+        await con.respond(Packet("/work", {HEADER: "s3cret"}), 2)
+        con.writer.data = b""
+        await con.respond(Packet("/profile"), 3)  # no secret
+        await con.respond(Packet("/profile", {HEADER: "s3cret"}), 4)
+        return con.writer.data.decode()
+
+    text = asyncio.run(_test(("127.0.0.1", 5000)))
+    assert len(service.profiler.profiles) == 2  # /work, and the report
+    assert "rid=2 GET /work" in text
+    assert "busy" in text
+
+    assert sent == [404]
+
+    sent.clear()
+    assert not asyncio.run(_test(("10.0.0.1", 5000)))
+    assert sent == [404, 404]
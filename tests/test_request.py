@@ -0,0 +1,185 @@
+"""test request head parsing and streamed bodies"""
+import asyncio
+
+import pytest
+
+from aiohttp import HTTPException
+from aiomicro import connection
+from aiomicro.request import Body, Head, Replay, StreamRequest, read_head
+
+from tests import fake
+
+
+def _reader(data, limit=2 ** 16):
+    reader = asyncio.StreamReader(limit=limit)
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def test_head():
+    """test request line and headers"""
+    head = Head(
+        b"POST /a/b?x=1&y=2 HTTP/1.1\r\n"
+        b"Content-Length: 10\r\nX-A: 1\r\nx-a: 2\r\n\r\n")
+    assert head.method == "POST"
+    assert head.path == "/a/b"
+    assert head.query == "x=1&y=2"
+    assert head.headers == {"content-length": "10", "x-a": "1, 2"}
+    assert head.content_length == 10
+    assert head.is_keep_alive
+    assert not head.is_chunked
+
+
+@pytest.mark.parametrize(
+    "data", (
+        b"GET /\r\n\r\n",
+        b"GET / HTTP/1.1\r\nbad header\r\n\r\n",
+    )
+)
+def test_head_bad(data):
+    """test malformed head"""
+    with pytest.raises(HTTPException) as exc:
+        Head(data)
+    assert exc.value.code == 400
+
+
+def test_read_head():
+    """test read head, leaving the body"""
+    async def _test():
+        reader = _reader(b"\r\nGET / HTTP/1.0\r\n\r\nbody")
+        head = await read_head(reader)
+        assert head.method == "GET"
+        assert not head.is_keep_alive
+        assert await reader.read() == b"body"
+        assert await read_head(_reader(b"")) is None
+        with pytest.raises(HTTPException) as exc:
+            await read_head(_reader(b"GET / HTTP/1.1\r\n" + b"x" * 100, 64))
+        assert exc.value.code == 431
+    asyncio.run(_test())
+
+
+def test_replay():
+    """test replayed data is read before the reader"""
+    async def _test():
+        replay = Replay(b"a\r\nb\r\n\r\n", _reader(b"cdef\ng"))
+        assert await replay.readline() == b"a\r\n"
+        assert await replay.readuntil(b"\r\n\r\n") == b"b\r\n\r\n"
+        assert await replay.readexactly(2) == b"cd"
+        assert await replay.readline() == b"ef\n"
+        assert await replay.read() == b"g"
+        assert replay.at_eof()
+        replay.replay(b"h\r\n")
+        assert not replay.at_eof()
+        assert await replay.readline() == b"h\r\n"
+    asyncio.run(_test())
+
+
+def test_body():
+    """test body iteration stops at length"""
+    async def _test():
+        started = []
+        body = Body(_reader(b"0123456789next"), 10,
+                    lambda: started.append(True))
+        assert not started
+        assert await body.read() == b"0123456789"
+        assert body.is_complete
+        assert started == [True]
+        with pytest.raises(HTTPException):
+            await Body(_reader(b"short"), 10).read()
+    asyncio.run(_test())
+
+
+def _connection(data):
+    return fake.connection(
+        'SERVER test 1000 max_body=100\n'
+        'ROUTE /upload$\n'
+        'POST tests.test_request.handler stream=true max_body=1000\n'
+        'ROUTE /small$\n'
+        'POST tests.test_request.handler\n', _reader(data))
+
+
+async def handler(request):
+    """handler"""
+    return request
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """replace the full request parser"""
+    calls = []
+
+    async def _parse(reader):
+        calls.append(await reader.reader.read())
+        return calls[-1]
+    monkeypatch.setattr(connection, "parse", _parse)
+    return calls
+
+
+@pytest.mark.parametrize(
+    "data,code", (
+        (b"POST /upload HTTP/1.1\r\nContent-Length: 1001\r\n\r\n", 413),
+        (b"POST /upload HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n", 411),
+        (b"POST /small HTTP/1.1\r\nContent-Length: 101\r\n\r\n", 413),
+        (b"POST /other HTTP/1.1\r\nContent-Length: 101\r\n\r\n", 413),
+        (b"POST /small HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n"
+         b"1000\r\n" + b"x" * 4096 + b"\r\n0\r\n\r\n", 411),
+    )
+)
+def test_read_packet_limit(parsed, data, code):
+    """test body limits are checked before the body is read"""
+    async def _test():
+        await _connection(data + b"x" * 10).read_packet()
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(_test())
+    assert exc.value.code == code
+    assert not parsed
+
+
+def test_read_packet_stream(parsed):
+    """test stream method gets an unread body"""
+    async def _test():
+        con = _connection(
+            b"POST /upload?a=1 HTTP/1.1\r\nContent-Length: 500\r\n"
+            b"Expect: 100-continue\r\n\r\n" + b"x" * 500)
+        request = await con.read_packet()
+        assert isinstance(request, StreamRequest)
+        assert request.content == {"a": "1"}
+        assert not con.writer.data
+        assert await request.body.read() == b"x" * 500
+        assert con.writer.data == connection.CONTINUE
+    asyncio.run(_test())
+    assert not parsed
+
+
+def test_read_packet_parse(parsed):
+    """test other requests are parsed from the start"""
+    data = b"POST /small HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello"
+    async def _test():
+        await _connection(data).read_packet()
+    asyncio.run(_test())
+    assert parsed == [data]
+
+
+def test_read_packet_direct(monkeypatch):
+    """test requests are parsed directly without limits or streams"""
+    readers = []
+
+    async def _parse(reader):
+        readers.append(reader)
+        return await reader.reader.readuntil(b"\r\n\r\n")
+    monkeypatch.setattr(connection, "parse", _parse)
+    monkeypatch.setattr(
+        connection, "read_head", lambda reader: pytest.fail("head read"))
+    service = fake.server(
+        'SERVER test 1000\n'
+        'ROUTE /small$\n'
+        'POST tests.test_request.handler\n')
+    assert not service.head_first
+    data = b"GET /small HTTP/1.1\r\n\r\n"
+
+    async def _test():
+        con = fake.connection(service, _reader(data * 2))
+        return [await con.read_packet(), await con.read_packet()]
+    assert asyncio.run(_test()) == [data, data]
+    assert readers[0] is readers[1]  # one HTTPReader per connection
@@ -0,0 +1,94 @@
+"""test prepared responses"""
+import asyncio
+
+import pytest
+
+from aiomicro.response import Prepared, Stream, format_head, is_stream, prepare
+
+from tests.fake import Writer
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def test_format_head():
+    """test status line and headers"""
+    assert format_head(404, headers={"A": 1}) == (
+        b"HTTP/1.1 404 Not Found\r\nA: 1\r\n\r\n")
+
+
+def test_stream():
+    """test chunked transfer-encoding"""
+    writer = Writer()
+    stream = Stream(_chunks(b"abc", "", "déf" * 6), "text/plain")
+    asyncio.run(stream.write(writer))
+    head, *body = writer.writes
+    assert head.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert b"Content-Type: text/plain\r\n" in head
+    assert b"Transfer-Encoding: chunked\r\n" in head
+    assert b"".join(body) == (
+        b"3\r\nabc\r\n"
+        b"18\r\n" + "déf".encode() * 6 + b"\r\n"
+        b"0\r\n\r\n")
+    assert writer.drains == 2
+
+
+def test_stream_error():
+    """test failed iterator is closed and body is not terminated"""
+    closed = []
+
+    async def chunks():
+        try:
+            yield b"abc"
+            raise ValueError()
+        finally:
+            closed.append(True)
+
+    writer = Writer()
+    with pytest.raises(ValueError):
+        asyncio.run(Stream(chunks()).write(writer))
+    assert closed
+    assert writer.writes[-1] == b"\r\n"
+
+
+def test_is_stream():
+    """test stream detection"""
+    assert is_stream(_chunks())
+    assert is_stream(Stream(_chunks()))
+    assert not is_stream(b"abc")
+    assert not is_stream(dict(content="abc"))
+
+
+def test_prepared_write():
+    """test head and body are written without joining"""
+    writer = Writer()
+    asyncio.run(Prepared(b"head", b"body").write(writer))
+    assert writer.writes == [b"head", b"body"]
+    writer = Writer()
+    asyncio.run(Prepared(b"head").write(writer))
+    assert writer.writes == [b"head"]
+
+
+@pytest.mark.parametrize(
+    "response,body", (
+        (dict(content=b"{}", content_type="application/json"), b"{}"),
+        (dict(content="é", content_type="text/plain"), "é".encode()),
+        (dict(content=None, content_type="text/plain"), b""),
+        (dict(content="abc"), None),
+        (dict(content="abc", content_type="text/html", compress=True), None),
+        (dict(content=1, content_type="text/plain"), None),
+        ("abc", None),
+    )
+)
+def test_prepare(response, body):
+    """test simple responses are formatted here"""
+    result = prepare(response)
+    if body is None:
+        assert result is None
+    else:
+        assert result.body == body
+        assert result.head == format_head(headers={
+            "Content-Type": response["content_type"],
+            "Content-Length": len(body)})
@@ -1,10 +1,15 @@
 """test rest operations"""
+import asyncio
+import json
+
 import marshmallow as ma
 import pytest
 
 from aiohttp import HTTPException
 from aiomicro.micro import action
 from aiomicro import rest
+from aiomicro.cache import Cache
+from aiomicro.response import Stream
 
 
 class MyContent(ma.Schema):
@@ -81,9 +86,10 @@ class ResponseSchema(ma.Schema):
     class Meta:
         unknown = ma.EXCLUDE
 
-    a = ma.fields.String(missing=None)
-    b = ma.fields.Integer(missing=None)
-    c = ma.fields.Integer(missing=1)
+    a = ma.fields.String(default=None)
+    b = ma.fields.Integer(default=None)
+    c = ma.fields.Integer(default=1)
+    d = ma.fields.Integer(missing=2)  # load-side; not used by dump
 
 
 @pytest.mark.parametrize(
@@ -98,18 +104,64 @@ class ResponseSchema(ma.Schema):
         (None, {}, dict(a=None, b=None, c=1), None),
         ("a", {}, dict(a=None), None),
         ("a,c", dict(a="foo"), dict(a="foo", c=1), None),
-        # bad data
-        ("c", dict(c="akk"), None, {'c': ['Not a valid integer.']}),
+        # bad data (serialized, not validated)
+        ("c", dict(c="akk"), None, ValueError),
     )
 )
 def test_marshmallow_response(only, result, expect, exception):
     """test json response"""
     path = "tests.test_rest.ResponseSchema"
     res = action.MarshmallowResponse(path=path, only=only)
-    try:
-        assert res(result) == expect
-    except ma.exceptions.ValidationError as exc:
-        assert exc.messages == exception
+    if exception:
+        with pytest.raises(exception):
+            res(result)
+    else:
+        response = res(result)
+        assert response["content_type"] == "application/json"
+        assert json.loads(response["content"]) == expect
+
+
+class ResponseObject:  # pylint: disable=too-few-public-methods
+    """object result"""
+    a = "foo"
+    b = 10
+
+
+def test_marshmallow_response_object():
+    """test json response from an object's attributes"""
+    res = action.MarshmallowResponse(path="tests.test_rest.ResponseSchema")
+    assert json.loads(res(ResponseObject())["content"]) == dict(
+        a="foo", b=10, c=1)
+
+
+@pytest.mark.parametrize("result", ({}, dict(a="x"), dict(c=3, d=4)))
+def test_marshmallow_response_same_as_dump(result):
+    """test the compiled dump uses dump defaults, like schema.dump"""
+    res = action.MarshmallowResponse(path="tests.test_rest.ResponseSchema")
+    assert res.dump is not res.schema.dump
+    assert res.dump(result) == res.schema.dump(result)
+
+
+async def unserializable(request):  # pylint: disable=unused-argument
+    """handler with a result the response can't serialize"""
+    return dict(c="akk")
+
+
+def test_match_unserializable():
+    """test a result which can't be serialized is a 500"""
+    method = action.Method("tests.test_rest.unserializable")
+    method.response = action.MarshmallowResponse(
+        path="tests.test_rest.ResponseSchema")
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(rest._Match(method, [], {})(None))
+    assert exc.value.code == 500
+
+
+def test_marshmallow_response_default():
+    """test json response default is built once"""
+    res = action.MarshmallowResponse(path="tests.test_rest.ResponseSchema")
+    assert res.default is res.default
+    assert json.loads(res.default["content"]) == dict(a=None, b=None, c=1)
 
 
 @pytest.mark.parametrize(
@@ -126,3 +178,144 @@ def test_str_response(result, expect):
     resp = rest._Response(res)  # pylint: disable=protected-access
 
     assert resp(result) == expect
+
+
+CALLS = []
+
+
+async def counted(request, *args):  # pylint: disable=unused-argument
+    """handler which records calls"""
+    CALLS.append(args)
+    return len(CALLS)
+
+
+async def counted_dict(request, *args):  # pylint: disable=unused-argument
+    """handler which records calls and returns a dict"""
+    CALLS.append(args)
+    return dict(content=len(CALLS))
+
+
+def test_match_cache():
+    """test cached handler result"""
+    class Request:  # pylint: disable=too-few-public-methods
+        """mock request"""
+        http_headers = {}
+
+    method = action.Method("tests.test_rest.counted")
+    method.cache = Cache("test_match_cache")
+    CALLS.clear()
+
+    async def _test():
+        # pylint: disable=protected-access
+        assert await rest._Match(method, [1], {})(Request()) == 1
+        assert await rest._Match(method, [1], {})(Request()) == 1
+        assert await rest._Match(method, [2], {})(Request()) == 2
+    asyncio.run(_test())
+    assert CALLS == [(1,), (2,)]
+
+
+def test_match_cache_copy():
+    """test a cache hit can be changed without changing the cache"""
+    class Request:  # pylint: disable=too-few-public-methods
+        """mock request"""
+        http_headers = {}
+
+    method = action.Method("tests.test_rest.counted_dict")
+    method.cache = Cache("test_match_cache_copy")
+    CALLS.clear()
+
+    async def _test():
+        # pylint: disable=protected-access
+        first = await rest._Match(method, [1], {})(Request())
+        first["content"] = "changed"
+        return await rest._Match(method, [1], {})(Request())
+    assert asyncio.run(_test()) == dict(content=1)
+
+
+async def slow(request, *args):  # pylint: disable=unused-argument
+    """handler which records calls"""
+    CALLS.append(args)
+    await asyncio.sleep(0.01)
+    return len(CALLS)
+
+
+def test_match_coalesce():
+    """test concurrent identical requests share one handler call"""
+    method = action.Method("tests.test_rest.slow", coalesce="true")
+    CALLS.clear()
+
+    async def _test():
+        # pylint: disable=protected-access
+        return await asyncio.gather(
+            rest._Match(method, [1], {})(None),
+            rest._Match(method, [1], {})(None),
+            rest._Match(method, [2], {})(None))
+    assert asyncio.run(_test()) == [2, 2, 2]
+    assert sorted(CALLS) == [(1,), (2,)]
+
+
+async def streamed(request, *args):  # pylint: disable=unused-argument
+    """handler which returns an async iterator"""
+    CALLS.append(args)
+    await asyncio.sleep(0.01)
+
+    async def items():
+        for item in range(3):
+            yield item
+    return items()
+
+
+def test_match_coalesce_stream():
+    """test each coalesced request gets its own stream"""
+    method = action.Method("tests.test_rest.streamed", coalesce="true")
+    CALLS.clear()
+
+    async def _test():
+        async def _request():
+            # pylint: disable=protected-access
+            result = await rest._Match(method, [1], {})(None)
+            return [item async for item in result]
+        return await asyncio.gather(_request(), _request(), _request())
+    assert asyncio.run(_test()) == [[0, 1, 2]] * 3
+    assert CALLS == [(1,)] * 3
+
+
+@pytest.mark.parametrize(
+    "response,content_type", (
+        (action.StrResponse(), b"text/plain"),
+        (action.StrResponse(content_type="text/csv"), b"text/csv"),
+        (action.HtmlResponse(), b"text/html"),
+    )
+)
+def test_response_stream(response, content_type):
+    """test str and html responses stream an async iterator"""
+    async def results():
+        for item in ("<p>", 1, "</p>"):
+            yield item
+
+    async def body():
+        result = rest._Response(response)(results())
+        assert isinstance(result, Stream)
+        assert content_type in result.head
+        return [str(chunk) async for chunk in result.chunks]
+    assert asyncio.run(body()) == ["<p>", "1", "</p>"]
+
+
+def test_marshmallow_response_stream(monkeypatch):
+    """test json array response from an async iterator"""
+    async def results(count):
+        for index in range(count):
+            yield dict(a=str(index), b=index)
+
+    async def body(response):
+        assert isinstance(response, Stream)
+        assert b"application/json" in response.head
+        return [chunk async for chunk in response.chunks]
+
+    monkeypatch.setattr(action, "STREAM_CHUNK", 20)
+    res = action.MarshmallowResponse(path="tests.test_rest.ResponseSchema")
+    assert asyncio.run(body(res.stream(results(0)))) == [b"[]"]
+    chunks = asyncio.run(body(res.stream(results(3))))
+    assert len(chunks) > 1
+    assert json.loads(b"".join(chunks)) == [
+        dict(a=str(index), b=index, c=1) for index in range(3)]
@@ -0,0 +1,100 @@
+"""test stack sampler"""
+import asyncio
+from io import StringIO
+import threading
+import time
+
+import pytest
+
+from aiomicro.micro.parser import ParseError, load
+from aiomicro.profiling import HEADER
+from aiomicro.sampler import Sampler
+
+from tests.fake import Packet
+
+
+def spin(seconds):
+    """something to find in the samples"""
+    until = time.perf_counter() + seconds
+    while time.perf_counter() < until:
+        pass
+
+
+def test_sample():
+    """test a stack is recorded outermost first"""
+    sampler = Sampler()
+    sampler.thread_id = threading.get_ident()
+    sampler.sample()
+    assert sampler.samples == 1
+    (stack, count), = sampler.stacks.items()
+    assert count == 1
+    assert stack.split(";")[-1].startswith("Sampler.sample ")
+    assert "test_sample " in stack.split(";")[-2]
+
+
+def test_max_depth():
+    """test only the innermost frames are kept"""
+    sampler = Sampler(max_depth=2)
+    sampler.thread_id = threading.get_ident()
+    sampler.sample()
+    stack, = sampler.stacks
+    assert len(stack.split(";")) == 2
+
+
+def test_thread(tmp_path):
+    """test background sampling and folded output"""
+    sampler = Sampler(hz=500, dump=str(tmp_path / "{pid}.folded"))
+    sampler.start()
+    spin(0.2)
+    sampler.stop()
+    assert not sampler.is_running
+    assert sampler.samples > 10
+    folded = sampler.folded()
+    assert "spin (" in folded
+    stack, count = folded.splitlines()[0].rsplit(" ", 1)
+    assert int(count) > 0 and stack
+    with open(sampler.dump(), encoding="utf-8") as dump:
+        assert dump.read() == folded
+    sampler.clear()
+    assert not sampler.folded()
+
+
+def test_directive():
+    """test SAMPLER directive and server route"""
+    micro = load(StringIO(
+        'SAMPLER 50 max_depth=10\n'
+        'SERVER test 1000 sampler=/stacks\n'
+    ))
+    assert micro.sampler.hz == 50
+    assert micro.sampler.max_depth == 10
+    route, = micro.servers[0].routes
+    method = route.methods["GET"]
+    with pytest.raises(Exception):  # not local
+        asyncio.run(method.handler(None))
+
+
+def test_secret():
+    """test the sampler route requires the secret, if set"""
+    micro = load(StringIO(
+        'SAMPLER 50 secret=s3cret\n'
+        'SERVER test 1000 sampler=/stacks\n'
+    ))
+    method = micro.servers[0].routes[0].methods["GET"]
+    request = Packet("/stacks", {HEADER: "s3cret"})
+    request.peer = ("127.0.0.1", 5000)
+    assert asyncio.run(method.handler(request))["content"] == ""
+    request.http_headers = {}
+    with pytest.raises(Exception):
+        asyncio.run(method.handler(request))
+
+
+def test_default_rate():
+    """test SAMPLER hz defaults to 100"""
+    micro = load(StringIO('SAMPLER max_depth=10\n'))
+    assert micro.sampler.hz == 100
+
+
+def test_not_defined():
+    """test server sampler route requires SAMPLER"""
+    with pytest.raises(ParseError):
+        load(StringIO('SERVER test 1000 sampler=/stacks\n'))
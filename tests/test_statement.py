@@ -0,0 +1,83 @@
+"""test sql statements"""
+from collections import Counter
+import datetime
+import decimal
+
+import pytest
+
+from aiomicro.statement import Statement, StatementCache, escape
+
+_EST = datetime.timezone(datetime.timedelta(hours=-5))
+
+
+@pytest.mark.parametrize(
+    'value,expect', (
+        (None, "NULL"),
+        (True, "1"),
+        (False, "0"),
+        (10, "10"),
+        (1.5, "1.5"),
+        (decimal.Decimal("1.10"), "1.10"),
+        ("abc", "'abc'"),
+        ("it's", "'it\\'s'"),
+        ('a"b', "'a\\\"b'"),
+        ("a\\b", "'a\\\\b'"),
+        ("a\nb\0", "'a\\nb\\0'"),
+        (b"\x01\xff", "X'01ff'"),
+        (datetime.date(2020, 1, 2), "'2020-01-02'"),
+        (datetime.datetime(2020, 1, 2, 3, 4, 5), "'2020-01-02 03:04:05'"),
+        (datetime.datetime(2020, 1, 2, 3, 4, 5, tzinfo=_EST),
+         "'2020-01-02 08:04:05'"),
+        (datetime.time(3, 4, 5), "'03:04:05'"),
+        (datetime.time(3, 4, 5, tzinfo=_EST), "'08:04:05'"),
+        ((1, "a", None), "(1,'a',NULL)"),
+    )
+)
+def test_escape(value, expect):
+    """test mysql literals"""
+    assert escape(value) == expect
+
+
+@pytest.mark.parametrize(
+    'value', (float("nan"), float("inf"), object()),
+)
+def test_escape_bad(value):
+    """test unsupported values"""
+    with pytest.raises((TypeError, ValueError)):
+        escape(value)
+
+
+@pytest.mark.parametrize(
+    'query,kwargs,expect', (
+        ("SELECT 1", {}, "SELECT 1"),
+        ("SELECT %(a)s", dict(a=1), "SELECT 1"),
+        ("SELECT %(a)s, %(a)s", dict(a="x"), "SELECT 'x', 'x'"),
+        ("WHERE a LIKE 'x%%' AND b=%(b)s", dict(b=2),
+            "WHERE a LIKE 'x%' AND b=2"),
+        ("WHERE id IN %(ids)s", dict(ids=[1, 2]), "WHERE id IN (1,2)"),
+        ("%(a)s%(b)s", dict(a=1, b=2), "12"),
+    )
+)
+def test_bind(query, kwargs, expect):
+    """test parameter binding"""
+    assert Statement(query).bind(kwargs) == expect
+
+
+def test_bind_missing():
+    """test missing parameter"""
+    with pytest.raises(ValueError):
+        Statement("SELECT %(a)s").bind({})
+
+
+def test_cache():
+    """test statement lru"""
+    counters = Counter()
+    cache = StatementCache(2, counters)
+    first = cache.get("a")
+    assert cache.get("a") is first
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")  # evicts b
+    assert len(cache) == 2
+    cache.get("b")
+    assert counters == dict(hit=2, miss=4, evict=2)
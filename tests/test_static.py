@@ -0,0 +1,128 @@
+"""test static file responses"""
+import asyncio
+import gzip
+import zlib
+
+import pytest
+
+from aiomicro.micro.action import FileMethod
+from aiomicro.response import SendFile
+from aiomicro.static import StaticFile
+
+from tests.fake import Writer
+
+
+class Request:  # pylint: disable=too-few-public-methods
+    """mock request"""
+
+    def __init__(self, **headers):
+        self.http_headers = {
+            key.replace("_", "-"): value for key, value in headers.items()}
+
+
+DATA = "hello world\n" * 100
+
+
+@pytest.fixture(name="path")
+def _path(tmp_path):
+    path = tmp_path / "index.html"
+    path.write_text(DATA)
+    return str(path)
+
+
+def _split(response):
+    writer = Writer()
+    asyncio.run(response.write(writer))
+    head, body = writer.data.split(b"\r\n\r\n", 1)
+    lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in lines[1:])
+    return lines[0], headers, body
+
+
+def test_identity(path):
+    """test uncompressed response"""
+    static = StaticFile(path)
+    status, headers, body = _split(static(Request()))
+    assert status == "HTTP/1.1 200 OK"
+    assert headers["Content-Type"] == "text/html; charset=utf-8"
+    assert headers["Content-Length"] == str(len(DATA))
+    assert headers["ETag"] == static.etag
+    assert headers["Last-Modified"].endswith("GMT")
+    assert "Content-Encoding" not in headers
+    assert body == DATA.encode()
+
+
+@pytest.mark.parametrize(
+    'accept,coding', (
+        ("gzip", "gzip"),
+        ("deflate, gzip;q=0.5", "gzip"),
+        ("deflate", "deflate"),
+        ("gzip;q=0, deflate", "deflate"),
+        ("br", None),
+    )
+)
+def test_encoding(path, accept, coding):
+    """test compressed response"""
+    static = StaticFile(path)
+    _, headers, body = _split(static(Request(accept_encoding=accept)))
+    assert headers.get("Content-Encoding") == coding
+    assert headers["Content-Length"] == str(len(body))
+    suffix = f"-{coding}" if coding else ""
+    assert headers["ETag"] == f'{static.etag[:-1]}{suffix}"'
+    decode = dict(gzip=gzip.decompress, deflate=zlib.decompress).get(
+        coding, lambda data: data)
+    assert decode(body) == DATA.encode()
+
+
+def test_no_compress(path):
+    """test compress option"""
+    static = StaticFile(path, compress="false")
+    _, headers, _ = _split(static(Request(accept_encoding="gzip")))
+    assert "Content-Encoding" not in headers
+
+
+def test_not_modified(path):
+    """test conditional requests"""
+    static = StaticFile(path)
+    for request in (
+            Request(if_none_match=static.etag),
+            Request(if_none_match=f'"abc", W/{static.etag}'),
+            Request(if_none_match="*"),
+            Request(if_modified_since=static.last_modified)):
+        status, headers, body = _split(static(request))
+        assert status == "HTTP/1.1 304 Not Modified"
+        assert headers["ETag"] == static.etag
+        assert not body
+    status, _, _ = _split(static(Request(if_none_match='"abc"')))
+    assert status == "HTTP/1.1 200 OK"
+
+
+def test_large(path):
+    """test large file is sent from the file"""
+    static = StaticFile(path, content_type="text/plain", threshold=10)
+    response = static(Request(accept_encoding="gzip"))
+    assert isinstance(response, SendFile)
+    assert response.size == len(DATA)
+    assert static.etag == StaticFile(path).etag
+
+
+def test_not_modified_encoding(path):
+    """test If-None-Match is compared with the selected encoding's ETag"""
+    static = StaticFile(path)
+    gzip_etag = f'{static.etag[:-1]}-gzip"'
+    status, headers, _ = _split(static(Request(
+        accept_encoding="gzip", if_none_match=gzip_etag)))
+    assert status == "HTTP/1.1 304 Not Modified"
+    assert headers["ETag"] == gzip_etag
+    status, _, _ = _split(static(Request(
+        accept_encoding="gzip", if_none_match=static.etag)))
+    assert status == "HTTP/1.1 200 OK"
+    status, _, _ = _split(static(Request(if_none_match=gzip_etag)))
+    assert status == "HTTP/1.1 200 OK"
+
+
+def test_file_method_arguments(path):
+    """test a file method rejects arguments StaticFile doesn't take"""
+    FileMethod(path, content_type="text/plain", compress="false")
+    with pytest.raises(Exception, match="argument: code"):
+        FileMethod(path, code=201)
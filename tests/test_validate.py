@@ -0,0 +1,81 @@
+"""test compiled marshmallow loaders"""
+import marshmallow as ma
+import pytest
+
+from aiomicro.micro.validate import compile_loader
+
+
+class Simple(ma.Schema):
+    """simple schema"""
+    class Meta:  # pylint: disable=too-few-public-methods
+        ordered = True
+    a = ma.fields.Integer(required=True)
+    b = ma.fields.Boolean()
+    c = ma.fields.String(data_key="cee", validate=ma.validate.Length(max=3))
+    d = ma.fields.Float(missing=1.5)
+    e = ma.fields.String(attribute="ee", allow_none=True)
+
+
+class Exclude(Simple):
+    """schema which ignores unknown fields"""
+    class Meta:  # pylint: disable=too-few-public-methods
+        unknown = ma.EXCLUDE
+
+
+class Hooked(Simple):
+    """schema with a hook"""
+    @ma.post_load
+    def double(self, data, **kwargs):  # pylint: disable=no-self-use
+        """hook"""
+        # pylint: disable=unused-argument
+        data["a"] *= 2
+        return data
+
+
+class Nested(ma.Schema):
+    """schema with a container field"""
+    a = ma.fields.List(ma.fields.Integer())
+
+
+def _load(load, data):
+    try:
+        return load(data)
+    except ma.ValidationError as exc:
+        return exc.messages
+
+
+@pytest.mark.parametrize('schema', (Simple, Exclude, Hooked, Nested))
+@pytest.mark.parametrize(
+    'data', (
+        dict(a=1),
+        dict(a="2", b="true", cee="abc", d="2.5", e="x"),
+        dict(a=None, e=None),
+        dict(b="maybe", cee="abcd"),
+        dict(a="bad", d="bad"),
+        dict(a=1, zzz=1),
+        dict(a=[1, "x"]),
+        dict(),
+        [1, 2],
+        "string",
+    )
+)
+def test_same_as_load(schema, data):
+    """test compiled loader matches schema.load"""
+    instance = schema()
+    assert _load(compile_loader(instance), data) == _load(instance.load, data)
+
+
+@pytest.mark.parametrize(
+    'schema,is_compiled', (
+        (Simple(), True),
+        (Simple(only=("a", "b")), True),
+        (Exclude(), True),
+        (Simple(unknown=ma.INCLUDE), False),
+        (Simple(partial=True), False),
+        (Hooked(), False),
+        (Nested(), False),
+    )
+)
+def test_fallback(schema, is_compiled):
+    """test schemas which are not compiled use schema.load"""
+    assert (compile_loader(schema) != schema.load) == is_compiled